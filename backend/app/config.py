@@ -5,8 +5,12 @@ from pydantic import BaseModel, Field
 class Settings(BaseModel):
     openai_api_key: str | None = Field(default=None)
     openai_model: str = Field(default="gpt-5")
+    openai_base_url: str | None = Field(default=None, description="OpenAI-compatible API base URL (e.g. a local stub LLM)")
     grammar_path: str = Field(default="app/grammars/clickhouse_sql.bnf")
+    grammar_check_interval: float = Field(default=2.0, description="Seconds between grammar file mtime checks")
     mock_mode: bool = Field(default=True, description="If true, skip real OpenAI + ClickHouse calls")
+    mock_clickhouse: bool = Field(default=False, description="Serve queries from the mock engine even when MOCK_MODE=false")
+    mock_data_path: str | None = Field(default=None, description="CSV loaded by the mock engine (default sample_files/MOCK_DATA.csv)")
     clickhouse_host: str | None = None
     clickhouse_port: int | None = None
     clickhouse_user: str | None = None
@@ -14,13 +18,53 @@ class Settings(BaseModel):
     clickhouse_database: str | None = None
     clickhouse_secure: bool = Field(default=False, description="Use TLS (ClickHouse Cloud)")
     clickhouse_ca_cert: str | None = Field(default=None, description="Optional path to CA cert for ClickHouse Cloud")
+    llm_concurrency: int = Field(default=16, description="Max concurrent LLM calls per worker")
+    clickhouse_concurrency: int = Field(default=8, description="Threads (and max concurrent queries) per worker")
+    clickhouse_pool_size: int = Field(default=8, description="Pooled ClickHouse clients per worker")
+    clickhouse_pool_timeout: float = Field(default=10.0, description="Seconds to wait for a free pooled client")
+    clickhouse_health_interval: float = Field(default=30.0, description="Ping idle clients older than this before reuse")
+    llm_max_connections: int = Field(default=20, description="Keep-alive HTTP connections to the LLM API")
+    llm_stream: bool = Field(default=True, description="Stream LLM output and stop it once the SQL is finished or invalid")
+    llm_stream_retries: int = Field(default=1, description="New LLM attempts after a stream is aborted as invalid")
+    llm_deadline: float = Field(default=20.0, description="Seconds a request waits for its LLM translation (0 disables)")
+    llm_hedge: bool = Field(default=True, description="Answer with the heuristic at the deadline; the LLM result still fills the cache")
+    llm_breaker_threshold: int = Field(default=3, description="Consecutive LLM quota errors that open the circuit breaker")
+    llm_breaker_cooldown: float = Field(default=30.0, description="Seconds the breaker stays open before a trial call")
+    warmup: bool = Field(default=True, description="Pre-open connections and load the grammar at startup")
+    translation_cache_size: int = Field(default=1024, description="In-memory NL->SQL cache entries (0 disables)")
+    translation_cache_ttl: float = Field(default=86400.0, description="Seconds a cached translation stays valid")
+    translation_cache_path: str | None = Field(default=None, description="Optional SQLite file shared across workers")
+    semantic_cache_size: int = Field(default=10_000, description="Translated questions in the paraphrase index (0 disables)")
+    semantic_cache_threshold: float = Field(default=0.8, description="Minimum question similarity (0-1) for a paraphrase hit")
+    suggest_max_phrases: int = Field(default=5000, description="Questions kept for /suggest (0 disables it)")
+    suggest_snapshot_path: str | None = Field(default=None, description="JSON file /suggest phrases are saved to and loaded from")
+    suggest_snapshot_interval: float = Field(default=60.0, description="Seconds between /suggest snapshots")
+    query_max_rows: int = Field(default=10_000, description="LIMIT injected / clamped on row listings (0 disables)")
+    query_max_result_rows: int = Field(default=100_000, description="Row cap for GROUP BY results and ClickHouse max_result_rows")
+    query_max_execution_time: float = Field(default=10.0, description="ClickHouse max_execution_time per query (s)")
+    query_max_memory_usage: int = Field(default=2_000_000_000, description="ClickHouse max_memory_usage per query (bytes)")
+    query_rollups: bool = Field(default=True, description="Answer matching aggregates from the pre-aggregated rollup tables")
+    cursor_secret: str | None = Field(default=None, description="HMAC key for pagination cursors (random per process when unset)")
+    batch_max_questions: int = Field(default=50, description="Questions accepted per /nl-query/batch call")
+    batch_concurrency: int = Field(default=8, description="Translations/executions in flight per batch")
+    stream_max_rows: int = Field(default=100_000, description="Row cap for /nl-query/stream (0 disables)")
+    stream_block_rows: int = Field(default=1000, description="Rows per streamed NDJSON chunk")
+    result_cache_max_bytes: int = Field(default=64 * 1024 * 1024, description="Approximate memory budget for cached results")
+    result_cache_ttl_aggregate: float = Field(default=30.0, description="TTL (s) for aggregate / GROUP BY results (0 disables)")
+    result_cache_ttl_rows: float = Field(default=5.0, description="TTL (s) for row-listing results (0 disables)")
+    result_cache_version_check: bool = Field(default=False, description="Invalidate when the table row count / parts change")
+    result_cache_version_interval: float = Field(default=5.0, description="Seconds between table version probes")
 
 @lru_cache
 def get_settings() -> Settings:
     return Settings(
         openai_api_key=os.getenv("OPENAI_API_KEY"),
         openai_model=os.getenv("OPENAI_MODEL", "gpt-5"),
+        openai_base_url=os.getenv("OPENAI_BASE_URL") or None,
+        grammar_check_interval=float(os.getenv("GRAMMAR_CHECK_INTERVAL", "2.0")),
         mock_mode=os.getenv("MOCK_MODE", "true").lower() in {"1", "true", "yes"},
+        mock_clickhouse=os.getenv("MOCK_CLICKHOUSE", "false").lower() in {"1", "true", "yes"},
+        mock_data_path=os.getenv("MOCK_DATA_PATH") or None,
         clickhouse_host=os.getenv("CLICKHOUSE_HOST"),
         clickhouse_port=int(os.getenv("CLICKHOUSE_PORT", "0")) or None,
         clickhouse_user=os.getenv("CLICKHOUSE_USER"),
@@ -28,4 +72,40 @@ def get_settings() -> Settings:
         clickhouse_database=os.getenv("CLICKHOUSE_DATABASE"),
     clickhouse_secure=os.getenv("CLICKHOUSE_SECURE", "false").lower() in {"1", "true", "yes"},
     clickhouse_ca_cert=os.getenv("CLICKHOUSE_CA_CERT"),
+        llm_concurrency=int(os.getenv("LLM_CONCURRENCY", "16")),
+        clickhouse_concurrency=int(os.getenv("CLICKHOUSE_CONCURRENCY", "8")),
+        clickhouse_pool_size=int(os.getenv("CLICKHOUSE_POOL_SIZE", "8")),
+        clickhouse_pool_timeout=float(os.getenv("CLICKHOUSE_POOL_TIMEOUT", "10")),
+        clickhouse_health_interval=float(os.getenv("CLICKHOUSE_HEALTH_INTERVAL", "30")),
+        llm_max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+        llm_stream=os.getenv("LLM_STREAM", "true").lower() in {"1", "true", "yes"},
+        llm_stream_retries=int(os.getenv("LLM_STREAM_RETRIES", "1")),
+        llm_deadline=float(os.getenv("LLM_DEADLINE", "20")),
+        llm_hedge=os.getenv("LLM_HEDGE", "true").lower() in {"1", "true", "yes"},
+        llm_breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", "3")),
+        llm_breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        warmup=os.getenv("WARMUP", "true").lower() in {"1", "true", "yes"},
+        translation_cache_size=int(os.getenv("TRANSLATION_CACHE_SIZE", "1024")),
+        translation_cache_ttl=float(os.getenv("TRANSLATION_CACHE_TTL", "86400")),
+        translation_cache_path=os.getenv("TRANSLATION_CACHE_PATH") or None,
+        semantic_cache_size=int(os.getenv("SEMANTIC_CACHE_SIZE", "10000")),
+        semantic_cache_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.8")),
+        suggest_max_phrases=int(os.getenv("SUGGEST_MAX_PHRASES", "5000")),
+        suggest_snapshot_path=os.getenv("SUGGEST_SNAPSHOT_PATH") or None,
+        suggest_snapshot_interval=float(os.getenv("SUGGEST_SNAPSHOT_INTERVAL", "60")),
+        query_max_rows=int(os.getenv("QUERY_MAX_ROWS", "10000")),
+        query_max_result_rows=int(os.getenv("QUERY_MAX_RESULT_ROWS", "100000")),
+        query_max_execution_time=float(os.getenv("QUERY_MAX_EXECUTION_TIME", "10")),
+        query_max_memory_usage=int(os.getenv("QUERY_MAX_MEMORY_USAGE", "2000000000")),
+        query_rollups=os.getenv("QUERY_ROLLUPS", "true").lower() in {"1", "true", "yes"},
+        cursor_secret=os.getenv("CURSOR_SECRET") or None,
+        batch_max_questions=int(os.getenv("BATCH_MAX_QUESTIONS", "50")),
+        batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "8")),
+        stream_max_rows=int(os.getenv("STREAM_MAX_ROWS", "100000")),
+        stream_block_rows=int(os.getenv("STREAM_BLOCK_ROWS", "1000")),
+        result_cache_max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        result_cache_ttl_aggregate=float(os.getenv("RESULT_CACHE_TTL_AGGREGATE", "30")),
+        result_cache_ttl_rows=float(os.getenv("RESULT_CACHE_TTL_ROWS", "5")),
+        result_cache_version_check=os.getenv("RESULT_CACHE_VERSION_CHECK", "false").lower() in {"1", "true", "yes"},
+        result_cache_version_interval=float(os.getenv("RESULT_CACHE_VERSION_INTERVAL", "5")),
     )
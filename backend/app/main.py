@@ -1,12 +1,37 @@
+import asyncio
+import datetime
+import json
 import logging
 import os
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Annotated, Dict, Iterator, List, Literal, Optional, Tuple, Union
 from .config import get_settings
-from .services.nl_to_sql import nl_to_sql, LLMQuotaExceeded
-from .services.clickhouse_client import execute_sql
+from .services.nl_to_sql import atranslate, LLMQuotaExceeded, LLMTimeout, Translation, prompt_stats
+from .services.clickhouse_client import (
+    aexecute_arrow, aexecute_columnar, aexecute_sql, astream_rows, get_clickhouse_pool, invalidate_result_cache,
+)
+from .services.circuit_breaker import get_llm_breaker
+from .services.clients import close_async_llm_client, get_async_llm_client, get_llm_client, llm_pool_stats
+from .services import metrics
+from .services.concurrency import run_blocking
+from .services.guardrails import GuardedQuery, apply_guardrails
+from .services.mock_engine import get_mock_engine
+from .services.pagination import InvalidCursor, Page, first_page, next_page
+from .services.result_cache import get_result_cache
+from .services.singleflight import coalescing_stats
+from .services.result_formats import (
+    ARROW_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, FormatUnavailable, arrow_ipc, negotiate_format,
+)
+from .services.timing import StageTimer
+from .services.semantic_cache import get_semantic_cache
+from .services.suggest import MAX_PHRASE_CHARS, TOP_K, get_suggestion_trie
+from .services.translation_cache import get_translation_cache, normalize_question
+from .services.sql_parser import SqlSyntaxError, get_parser, validate_sql
 
 """Auth endpoint removed: no authentication required now."""
 
@@ -17,7 +42,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger("cfg_evals")
 
-app = FastAPI(title="cfg_evals Backend", version="0.1.0")
+
+def _warmup() -> None:
+    """Load the grammar/recognizer and pre-open upstream connections before traffic arrives."""
+    settings = get_settings()
+    get_parser()
+    get_suggestion_trie()  # seed from the eval dataset (and the last snapshot)
+    if settings.mock_mode or settings.mock_clickhouse:
+        try:
+            get_mock_engine()  # load the CSV into columnar arrays
+        except Exception:
+            logger.exception("Mock data load failed; queries will retry on demand")
+    else:
+        try:
+            opened = get_clickhouse_pool().warm()
+            logger.info("Warmed ClickHouse pool", extra={"opened": opened})
+        except Exception:
+            logger.exception("ClickHouse warmup failed; connections will open on demand")
+    if settings.openai_api_key and not settings.mock_mode:
+        get_llm_client()
+
+
+def _save_suggestions(path: str) -> None:
+    try:
+        get_suggestion_trie().save(path)
+    except OSError:
+        logger.exception("Suggestion snapshot failed", extra={"path": path})
+
+
+async def _snapshot_suggestions(path: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await run_blocking(_save_suggestions, path)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    if settings.warmup:
+        await run_blocking(_warmup)
+        if settings.openai_api_key and not settings.mock_mode:
+            get_async_llm_client()  # connection pool bound to this worker's loop
+    snapshots = None
+    if settings.suggest_snapshot_path:
+        snapshots = asyncio.create_task(
+            _snapshot_suggestions(settings.suggest_snapshot_path, settings.suggest_snapshot_interval)
+        )
+    yield
+    if snapshots is not None:
+        snapshots.cancel()
+        _save_suggestions(settings.suggest_snapshot_path)
+    await close_async_llm_client()
+    get_clickhouse_pool().close()
+
+
+app = FastAPI(title="cfg_evals Backend", version="0.1.0", lifespan=lifespan)
 
 # Allow local dev frontend (adjust origins as needed)
 app.add_middleware(
@@ -30,13 +109,73 @@ app.add_middleware(
 
 @app.get("/health", summary="Health Check")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "pools": {"clickhouse": get_clickhouse_pool().stats(), "llm": llm_pool_stats()},
+        "llm_breaker": get_llm_breaker().stats(),
+    }
 
 @app.get("/")
 async def root():
     return {"message": "Backend running"}
 
 
+@app.get("/cache/stats", summary="Translation/result cache, request coalescing and prompt statistics")
+async def cache_stats():
+    return {
+        "translation": get_translation_cache().stats(),
+        "semantic": get_semantic_cache().stats(),
+        "suggest": get_suggestion_trie().stats(),
+        "result": get_result_cache().stats(),
+        "coalescing": coalescing_stats(),
+        "prompt": prompt_stats(),
+    }
+
+
+@app.post("/cache/invalidate", summary="Drop cached query results")
+async def cache_invalidate():
+    invalidate_result_cache()
+    return {"status": "ok"}
+
+
+@app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/suggest", summary="Autocomplete a question from the ones users have asked")
+async def suggest(
+    response: Response,
+    prefix: Annotated[str, Query(max_length=MAX_PHRASE_CHARS)] = "",
+    k: Annotated[int, Query(ge=1, le=TOP_K)] = 5,
+):
+    """Most-asked known questions starting with ``prefix`` (case-insensitive)."""
+    with _observed("/suggest"):
+        suggestions = get_suggestion_trie().suggest(prefix, k)
+    # Sent on every keystroke; a repeated prefix (backspace) is answered by the browser.
+    response.headers["Cache-Control"] = "private, max-age=30"
+    return {"prefix": prefix, "suggestions": suggestions}
+
+
+def _gauges(prefix: str, help: str, stats: dict, **labels: str):
+    for key, value in stats.items():
+        if isinstance(value, (int, float)):
+            yield f"{prefix}_{key}", f"{help}: {key}", labels, float(value)
+
+
+@metrics.REGISTRY.collector
+def _service_gauges():
+    """Cache, pool and coalescing stats, read at scrape time."""
+    yield from _gauges("cfg_evals_translation_cache", "Translation cache", get_translation_cache().stats())
+    yield from _gauges("cfg_evals_semantic_cache", "Paraphrase translation cache", get_semantic_cache().stats())
+    yield from _gauges("cfg_evals_suggest", "/suggest trie", get_suggestion_trie().stats())
+    yield from _gauges("cfg_evals_result_cache", "Result cache", get_result_cache().stats())
+    yield from _gauges("cfg_evals_clickhouse_pool", "ClickHouse connection pool", get_clickhouse_pool().stats())
+    for name, stats in coalescing_stats().items():
+        yield from _gauges("cfg_evals_coalescing", "Single-flight coalescing", stats, call=name)
+    yield from _gauges("cfg_evals_llm_breaker", "LLM quota circuit breaker", get_llm_breaker().stats())
+
+
 class QueryRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000, description="User submitted query text")
     metadata: Optional[dict] = Field(default=None, description="Optional metadata payload")
@@ -50,12 +189,54 @@ class QueryResponse(BaseModel):
 
 class NLQueryRequest(BaseModel):
     question: str = Field(..., min_length=3, max_length=500)
+    format: Optional[Literal["rows", "columnar", "arrow"]] = Field(
+        default=None, description="Result encoding; overrides the Accept header (default rows)"
+    )
+    page_size: Optional[int] = Field(
+        default=None, ge=1, description="Rows per page for listings (at most QUERY_MAX_ROWS); see next_cursor"
+    )
+
+
+class NLQueryNextRequest(BaseModel):
+    cursor: str = Field(..., min_length=1, max_length=8192, description="next_cursor from the previous page")
+    format: Optional[Literal["rows", "columnar", "arrow"]] = Field(
+        default=None, description="Result encoding; overrides the Accept header (default rows)"
+    )
+
+
+class NLQueryStreamRequest(NLQueryRequest):
+    max_rows: Optional[int] = Field(default=None, ge=1, description="Row cap (at most STREAM_MAX_ROWS)")
 
 
 class NLQueryResponse(BaseModel):
     sql: str
     rows: list
     mocked: bool
+    cached: bool = False
+    truncated: bool = False  # rows were cut to the guardrail row cap
+    next_cursor: Optional[str] = None  # pass to /nl-query/next for the next page (page_size requests)
+    warning: Optional[str] = None
+
+
+class NLQueryBatchRequest(BaseModel):
+    questions: List[Annotated[str, Field(min_length=3, max_length=500)]] = Field(..., min_length=1)
+
+
+class NLQueryBatchItem(BaseModel):
+    question: str
+    sql: Optional[str] = None
+    rows: Optional[list] = None
+    mocked: bool = False
+    cached: bool = False
+    truncated: bool = False
+    status: int = 200  # HTTP status this question would get from /nl-query
+    error: Optional[str] = None
+
+
+class NLQueryBatchResponse(BaseModel):
+    results: List[NLQueryBatchItem]  # same order as the request
+    unique_questions: int
+    unique_sql: int
     warning: Optional[str] = None
 
 
@@ -70,34 +251,328 @@ async def submit_query(payload: QueryRequest):
     )
 
 
-@app.post("/nl-query", response_model=NLQueryResponse, summary="Natural language to SQL using CFG + GPT-5")
-async def natural_language_query(req: NLQueryRequest):
-    settings = get_settings()
-    logger.info("/nl-query received", extra={"question": req.question[:160]})
+async def _translate_checked(question: str, timer: Optional[StageTimer] = None) -> Tuple[str, Translation]:
+    """Translate and grammar-check ``question``; HTTP errors mirror /nl-query."""
+    timer = timer or StageTimer()
     try:
-        sql, mocked_translation = nl_to_sql(req.question)
-        logger.debug("Translation produced SQL", extra={"sql": sql})
+        with timer.stage("translate"):
+            translation = await atranslate(question)
+        logger.debug("Translation produced SQL", extra={"sql": translation.sql, "cached": translation.cached})
     except LLMQuotaExceeded as qe:
         logger.warning("LLM quota exceeded", extra={"error": str(qe)})
         raise HTTPException(status_code=503, detail=f"LLM quota exceeded: {qe}")
+    except LLMTimeout as te:
+        logger.warning("LLM deadline exceeded", extra={"error": str(te)})
+        raise HTTPException(status_code=504, detail=str(te))
     except Exception as e:
         logger.exception("Translation failed")
         raise HTTPException(status_code=500, detail=f"Translation failed: {e}")
 
-    # Basic safety: prevent non-select
-    if not sql.lower().strip().startswith("select"):
-        raise HTTPException(status_code=400, detail="Generated SQL not allowed (must be SELECT)")
+    # Grammar check: reject locally instead of spending a ClickHouse round trip
+    try:
+        with timer.stage("validate"):
+            sql = validate_sql(translation.sql)
+    except SqlSyntaxError as se:
+        metrics.SAFETY_REJECTIONS.inc(stage="validate")
+        raise HTTPException(status_code=400, detail=f"Generated SQL not allowed: {se}")
+    return sql, translation
+
+
+# HTTP status -> ``outcome`` label of the request/stage histograms
+_OUTCOMES = {400: "rejected", 406: "unavailable", 422: "invalid", 503: "quota", 504: "timeout"}
 
+
+@contextmanager
+def _observed(endpoint: str, timer: Optional[StageTimer] = None) -> Iterator[Dict[str, str]]:
+    """Record request latency (and ``timer``'s stages) by mocked / outcome.
+
+    Yields the label dict so the handler can set ``mocked`` once it is known.
+    """
+    timer = timer or StageTimer()
+    labels = {"mocked": str(get_settings().mock_mode).lower()}
+    outcome = "error"
+    start = time.perf_counter()
     try:
-        rows = execute_sql(sql)
-        logger.debug("SQL executed", extra={"row_count": len(rows) if isinstance(rows, list) else None})
+        with timer.bind():
+            yield labels
+        outcome = "ok"
+    except HTTPException as e:
+        outcome = _OUTCOMES.get(e.status_code, "error")
+        raise
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, outcome=outcome, **labels)
+        metrics.observe_stages(timer.stages, labels["mocked"], outcome)
+
+
+def _mock_warning() -> Optional[str]:
+    if get_settings().mock_mode:
+        return "Mock mode enabled: using heuristic translation + sample data"
+    return None
+
+
+def _page_size(requested: int) -> int:
+    cap = get_settings().query_max_rows
+    return min(requested, cap) if cap > 0 else requested
+
+
+async def _execute_encoded(
+    guarded: Union[GuardedQuery, Page], fmt: str, timer: StageTimer, mocked: bool, cached: bool,
+    page: Optional[Page] = None,
+) -> Tuple[Union[bytes, str], str, int]:
+    """Run ``guarded`` and encode the result as ``fmt``: (body, media type, row count)."""
+    sql = guarded.sql
+    try:
+        if fmt == "arrow":
+            with timer.stage("execute"):
+                table, truncated = guarded.trim(await aexecute_arrow(guarded.execute_sql))
+            with timer.stage("serialize"):
+                body = arrow_ipc(table, {
+                    "sql": sql,
+                    "mocked": mocked,
+                    "cached": cached,
+                    "truncated": truncated,
+                    "next_cursor": (page and page.next_cursor) or "",
+                    "warning": _mock_warning() or "",
+                })
+            return body, ARROW_MEDIA_TYPE, table.num_rows
+        if fmt == "columnar":
+            with timer.stage("execute"):
+                result, truncated = guarded.trim(await aexecute_columnar(guarded.execute_sql))
+            with timer.stage("serialize"):
+                body = json.dumps({
+                    "sql": sql,
+                    "columns": result.columns,
+                    "data": result.data,
+                    "mocked": mocked,
+                    "cached": cached,
+                    "truncated": truncated,
+                    "next_cursor": page and page.next_cursor,
+                    "warning": _mock_warning(),
+                }, default=_json_default, separators=(",", ":"))
+            return body, COLUMNAR_MEDIA_TYPE, len(result.data[0]) if result.data else 0
+        with timer.stage("execute"):
+            rows, truncated = guarded.trim(await aexecute_sql(guarded.execute_sql))
+        logger.debug("SQL executed", extra={"row_count": len(rows)})
+        with timer.stage("serialize"):
+            body = NLQueryResponse(
+                sql=sql,
+                rows=rows,
+                mocked=mocked,
+                cached=cached,
+                truncated=truncated,
+                next_cursor=page and page.next_cursor,
+                warning=_mock_warning(),
+            ).model_dump_json()
+        return body, "application/json", len(rows)
+    except FormatUnavailable as fu:
+        raise HTTPException(status_code=406, detail=str(fu))
     except Exception as e:
         logger.exception("Execution failed")
         raise HTTPException(status_code=500, detail=f"Execution failed: {e}")
 
-    warn = None
-    if settings.mock_mode:
-        warn = "Mock mode enabled: using heuristic translation + sample data"
 
-    logger.info("/nl-query success", extra={"mocked": settings.mock_mode or mocked_translation})
-    return NLQueryResponse(sql=sql, rows=rows, mocked=settings.mock_mode or mocked_translation, warning=warn)
+@app.post(
+    "/nl-query",
+    response_model=NLQueryResponse,
+    summary="Natural language to SQL using CFG + GPT-5",
+    responses={200: {"content": {COLUMNAR_MEDIA_TYPE: {}, ARROW_MEDIA_TYPE: {}}}},
+)
+async def natural_language_query(req: NLQueryRequest, accept: Optional[str] = Header(default=None)):
+    settings = get_settings()
+    logger.info("/nl-query received", extra={"question": req.question[:160]})
+    fmt = negotiate_format(req.format, accept)
+    timer = StageTimer()
+    with _observed("/nl-query", timer) as labels:
+        sql, translation = await _translate_checked(req.question, timer)
+        mocked = settings.mock_mode or translation.mocked
+        labels["mocked"] = str(mocked).lower()
+        with timer.stage("validate"):
+            page = first_page(sql, _page_size(req.page_size)) if req.page_size else None
+            guarded = page or apply_guardrails(sql)
+        body, media_type, row_count = await _execute_encoded(
+            guarded, fmt, timer, mocked=mocked, cached=translation.cached, page=page
+        )
+        metrics.ROWS_RETURNED.inc(row_count, endpoint="/nl-query")
+        metrics.RESPONSE_BYTES.inc(len(body), endpoint="/nl-query", format=fmt)
+    get_suggestion_trie().add(req.question)
+    logger.info("/nl-query success", extra={"mocked": mocked, "format": fmt, "row_count": row_count})
+    return Response(content=body, media_type=media_type, headers={"Server-Timing": timer.header()})
+
+
+@app.post(
+    "/nl-query/next",
+    response_model=NLQueryResponse,
+    summary="Next page of a paginated /nl-query listing",
+    responses={200: {"content": {COLUMNAR_MEDIA_TYPE: {}, ARROW_MEDIA_TYPE: {}}}},
+)
+async def natural_language_query_next(req: NLQueryNextRequest, accept: Optional[str] = Header(default=None)):
+    """Follow ``next_cursor`` from a ``page_size`` request. No translation runs,
+    and a page costs the same however deep the client has paged (``id > last``,
+    never OFFSET).
+    """
+    fmt = negotiate_format(req.format, accept)
+    timer = StageTimer()
+    with _observed("/nl-query/next", timer):
+        with timer.stage("validate"):
+            try:
+                page = next_page(req.cursor)
+            except InvalidCursor as ic:
+                raise HTTPException(status_code=400, detail=f"Invalid cursor: {ic}")
+        body, media_type, row_count = await _execute_encoded(
+            page, fmt, timer, mocked=get_settings().mock_mode, cached=False, page=page
+        )
+        metrics.ROWS_RETURNED.inc(row_count, endpoint="/nl-query/next")
+        metrics.RESPONSE_BYTES.inc(len(body), endpoint="/nl-query/next", format=fmt)
+    return Response(content=body, media_type=media_type, headers={"Server-Timing": timer.header()})
+
+
+@app.post("/nl-query/batch", response_model=NLQueryBatchResponse, summary="Several /nl-query questions in one call")
+async def natural_language_query_batch(req: NLQueryBatchRequest):
+    """Questions that normalize alike (case, whitespace and punctuation folded,
+    comparison operators kept) are translated once, and questions that
+    produce the same SQL share one execution. Translation and execution fan out
+    concurrently (at most ``BATCH_CONCURRENCY`` at a time), so the batch takes
+    about as long as its slowest question. A failing question is reported in its
+    own item; it does not fail the batch.
+    """
+    with _observed("/nl-query/batch"):
+        settings = get_settings()
+        if len(req.questions) > settings.batch_max_questions:
+            raise HTTPException(
+                status_code=422, detail=f"At most {settings.batch_max_questions} questions per batch"
+            )
+        logger.info("/nl-query/batch received", extra={"questions": len(req.questions)})
+        gate = asyncio.Semaphore(max(1, settings.batch_concurrency))
+
+        keys = [normalize_question(q) for q in req.questions]
+        first: Dict[str, str] = {}
+        for key, question in zip(keys, req.questions):
+            first.setdefault(key, question)
+
+        async def translate_one(question: str):
+            async with gate:
+                sql, translation = await _translate_checked(question)
+            return apply_guardrails(sql), translation
+
+        translated = dict(zip(first, await asyncio.gather(
+            *(translate_one(q) for q in first.values()), return_exceptions=True
+        )))
+
+        async def execute_one(execute_sql: str):
+            async with gate:
+                return await aexecute_sql(execute_sql)
+
+        statements = list(dict.fromkeys(
+            t[0].execute_sql for t in translated.values() if not isinstance(t, BaseException)
+        ))
+        executed = dict(zip(statements, await asyncio.gather(
+            *(execute_one(s) for s in statements), return_exceptions=True
+        )))
+
+        results = []
+        for key, question in zip(keys, req.questions):
+            outcome = translated[key]
+            if isinstance(outcome, BaseException):
+                results.append(_batch_error(question, outcome))
+                continue
+            guarded, translation = outcome
+            rows = executed[guarded.execute_sql]
+            if isinstance(rows, BaseException):
+                logger.error("Batch execution failed", exc_info=rows)
+                error = HTTPException(status_code=500, detail=f"Execution failed: {rows}")
+                results.append(_batch_error(question, error, sql=guarded.sql))
+                continue
+            rows, truncated = guarded.trim(rows)
+            results.append(NLQueryBatchItem(
+                question=question,
+                sql=guarded.sql,
+                rows=rows,
+                mocked=settings.mock_mode or translation.mocked,
+                cached=translation.cached,
+                truncated=truncated,
+            ))
+
+        body = NLQueryBatchResponse(
+            results=results, unique_questions=len(first), unique_sql=len(statements), warning=_mock_warning()
+        ).model_dump_json()
+        metrics.ROWS_RETURNED.inc(sum(len(r.rows) for r in results if r.rows), endpoint="/nl-query/batch")
+        metrics.RESPONSE_BYTES.inc(len(body), endpoint="/nl-query/batch", format="rows")
+        logger.info("/nl-query/batch success", extra={"unique_questions": len(first), "unique_sql": len(statements)})
+        return Response(content=body, media_type="application/json")
+
+
+def _batch_error(question: str, exc: BaseException, sql: Optional[str] = None) -> NLQueryBatchItem:
+    if not isinstance(exc, HTTPException):
+        logger.error("Batch item failed", exc_info=exc)
+        exc = HTTPException(status_code=500, detail=str(exc))
+    return NLQueryBatchItem(question=question, sql=sql, status=exc.status_code, error=exc.detail)
+
+
+def _ndjson(obj: dict) -> bytes:
+    return (json.dumps(obj, default=_json_default, separators=(",", ":")) + "\n").encode()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+@app.post("/nl-query/stream", summary="Like /nl-query, but streams rows as NDJSON")
+async def natural_language_query_stream(req: NLQueryStreamRequest):
+    """NDJSON lines: ``{"type": "meta", "sql": ...}``, then ``{"type": "rows", "rows": [...]}``
+    per block, then ``{"type": "end", "row_count": n, "truncated": bool}`` (or
+    ``{"type": "error", "detail": ...}`` if execution fails mid-stream).
+    """
+    settings = get_settings()
+    logger.info("/nl-query/stream received", extra={"question": req.question[:160]})
+    timer = StageTimer()
+    # The request histogram ends when streaming starts; the execute stage covers the stream.
+    with _observed("/nl-query/stream", timer) as labels:
+        sql, translation = await _translate_checked(req.question, timer)
+        mocked = settings.mock_mode or translation.mocked
+        labels["mocked"] = str(mocked).lower()
+        with timer.stage("validate"):
+            cap = req.max_rows
+            if settings.stream_max_rows > 0:  # 0 disables the server-side cap
+                cap = min(cap or settings.stream_max_rows, settings.stream_max_rows)
+            guarded = apply_guardrails(sql, max_rows=cap) if cap else GuardedQuery(sql, sql, None)
+    sql = guarded.sql
+
+    async def body():
+        yield _ndjson({
+            "type": "meta",
+            "sql": sql,
+            "mocked": mocked,
+            "cached": translation.cached,
+            "warning": _mock_warning(),
+            "max_rows": cap,
+        })
+        sent, truncated, outcome = 0, False, "error"
+        blocks = astream_rows(guarded.execute_sql, max_rows=cap or 0)
+        start = time.perf_counter()
+        try:
+            async for block in blocks:
+                if not block:
+                    continue
+                if cap and sent + len(block) > cap:
+                    block, truncated = block[:cap - sent], True
+                if block:
+                    sent += len(block)
+                    yield _ndjson({"type": "rows", "rows": block})
+                if truncated:
+                    break  # closes the upstream stream instead of draining it
+            outcome = "ok"
+        except Exception as e:
+            logger.exception("Streaming execution failed")
+            yield _ndjson({"type": "error", "detail": f"Execution failed: {e}"})
+            return
+        finally:
+            await blocks.aclose()
+            # Also reached when the client disconnects (outcome stays "error").
+            metrics.observe_stages({"execute": time.perf_counter() - start}, labels["mocked"], outcome)
+            metrics.ROWS_RETURNED.inc(sent, endpoint="/nl-query/stream")
+        logger.info("/nl-query/stream success", extra={"mocked": mocked, "row_count": sent, "truncated": truncated})
+        yield _ndjson({"type": "end", "row_count": sent, "truncated": truncated})
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
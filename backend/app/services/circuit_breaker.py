@@ -0,0 +1,92 @@
+"""Circuit breaker for an upstream that fails in streaks.
+
+After ``threshold`` consecutive failures the breaker opens and callers are
+turned away without touching the upstream for ``cooldown`` seconds. Then one
+trial call is let through (half open): success closes the breaker, another
+failure opens it for a new cool-down. A trial that never reports back (its
+task was cancelled) stops blocking others after another ``cooldown``.
+
+Used in front of the LLM, where a quota error (429 / insufficient_quota)
+means every following call fails the same way until the quota resets.
+"""
+from __future__ import annotations
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Union
+from app.config import get_settings
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int = 3, cooldown: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0  # consecutive
+        self._opened_at = 0.0
+        self._trial_at = 0.0
+        self._state = CLOSED
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (in half-open state: the trial call)."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            now = self._clock()
+            if self._state == OPEN and now - self._opened_at >= self.cooldown:
+                self._state = HALF_OPEN
+                self._trial_at = now
+                return True
+            if self._state == HALF_OPEN and now - self._trial_at >= self.cooldown:
+                self._trial_at = now  # the last trial never reported back
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call may go through (0 when closed)."""
+        if self._state == CLOSED:
+            return 0.0
+        since = self._opened_at if self._state == OPEN else self._trial_at
+        return max(0.0, since + self.cooldown - self._clock())
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._state = CLOSED
+
+    def failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.threshold:
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def stats(self) -> Dict[str, Union[str, int, float]]:
+        return {
+            "state": self._state,
+            "open": int(self._state != CLOSED),
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+
+@lru_cache
+def get_llm_breaker() -> CircuitBreaker:
+    """Process-wide breaker for LLM quota errors."""
+    settings = get_settings()
+    return CircuitBreaker("llm", settings.llm_breaker_threshold, settings.llm_breaker_cooldown)
@@ -1,16 +1,20 @@
 from __future__ import annotations
-from typing import Any, List, Dict, Optional
+import logging
+from typing import Any, AsyncIterator, Callable, Iterator, List, Dict, Optional, Tuple
 from functools import lru_cache
 from app.config import get_settings
+from app.services import metrics, rollups, singleflight
+from app.services.clients import ConnectionPool
+from app.services.concurrency import run_blocking
+from app.services.guardrails import query_settings
+from app.services.mock_engine import get_mock_engine
+from app.services.result_cache import get_result_cache, query_shape
+from app.services.result_formats import FORMATS, ColumnarResult, arrow_table
+from app.services.sql_parser import canonicalize_sql, get_parser
 
-SAMPLE_ROWS = [
-    {"order_id": 1, "amount": 120.50, "created_at": "2025-09-27T10:00:00"},
-    {"order_id": 2, "amount": 75.00, "created_at": "2025-09-27T18:30:00"},
-    {"order_id": 3, "amount": 310.10, "created_at": "2025-09-28T02:15:00"},
-]
+logger = logging.getLogger("cfg_evals.clickhouse")
 
-@lru_cache
-def _get_real_client():
+def _new_client():
     from clickhouse_connect import get_client  # local import to avoid dependency in mock mode
     settings = get_settings()
     if not (settings.clickhouse_host and settings.clickhouse_port and settings.clickhouse_database):
@@ -30,44 +34,194 @@ def _get_real_client():
     return get_client(**kwargs)
 
 
+@lru_cache
+def get_clickhouse_pool() -> ConnectionPool:
+    settings = get_settings()
+    return ConnectionPool(
+        _new_client,
+        size=settings.clickhouse_pool_size,
+        timeout=settings.clickhouse_pool_timeout,
+        health_interval=settings.clickhouse_health_interval,
+        health_check=lambda c: c.ping(),
+        close=lambda c: c.close(),
+    )
+
+
 def _safety_check(sql: str) -> Optional[str]:
-    l = sql.strip().lower()
-    if not l.startswith("select"):
-        return "Only SELECT statements allowed"
-    if ";" in l:
-        return "Semicolons not permitted"
-    # Restrict to expected table reference
-    if "mock_data" not in l:
-        return "Query must reference MOCK_DATA"
-    # Disallow system tables / dangerous keywords
-    forbidden = ["insert", "alter", "drop", "truncate", "optimize", "attach", "detach", "rename", "grant", "revoke"]
-    if any(f in l for f in forbidden):
-        return "Disallowed keyword present"
-    return None
+    # The grammar only admits single read-only SELECTs over MOCK_DATA with
+    # whitelisted columns/functions, so a successful parse is the safety check.
+    return get_parser().validate(sql.strip())
+
+
+def _use_mock_engine() -> bool:
+    settings = get_settings()
+    return settings.mock_mode or settings.mock_clickhouse
+
+
+def table_version() -> tuple:
+    """Cheap change signal for default.MOCK_DATA (used to invalidate the result cache)."""
+    if _use_mock_engine():
+        return get_mock_engine().version
+    with get_clickhouse_pool().connection() as client:
+        result = client.query(
+            "SELECT sum(rows), max(modification_time) FROM system.parts "
+            "WHERE database = 'default' AND table = 'MOCK_DATA' AND active"
+        )
+    return tuple(result.result_rows[0])
+
+
+def invalidate_result_cache(sql: Optional[str] = None) -> None:
+    """Manual invalidation hook: drop one query's cached result, or all of them."""
+    cache = get_result_cache()
+    if sql is None:
+        cache.invalidate()
+        return
+    for fmt in FORMATS:
+        cache.invalidate(_cache_key(sql, fmt))
+
+
+def _cache_key(sql: str, fmt: str = "rows") -> str:
+    key = canonicalize_sql(sql)
+    return key if fmt == "rows" else f"{fmt}:{key}"
+
+
+def _checked_cache_lookup(sql: str, fmt: str = "rows") -> Tuple[str, Optional[Any]]:
+    """Safety check (real mode) then result cache lookup; returns (cache key, cached result)."""
+    if not get_settings().mock_mode:
+        err = _safety_check(sql)
+        if err:
+            metrics.SAFETY_REJECTIONS.inc(stage="execute")
+            raise ValueError(f"Safety check failed: {err}")
+    key = _cache_key(sql, fmt)
+    return key, get_result_cache().get(key)
 
 
 def execute_sql(sql: str) -> List[Dict[str, Any]]:
+    key, rows = _checked_cache_lookup(sql)
+    if rows is not None:
+        return rows
+
+    def run() -> List[Dict[str, Any]]:
+        rows = _execute_uncached(sql)
+        get_result_cache().put(key, rows, shape=query_shape(sql))
+        return rows
+
+    # Identical SQL already running shares that query.
+    return singleflight.executions.call(key, run)
+
+
+async def _aexecute(sql: str, fmt: str, execute: Callable[[str], Any]) -> Any:
+    key, result = _checked_cache_lookup(sql, fmt)
+    if result is not None:
+        return result
+
+    async def run() -> Any:
+        result = await run_blocking(execute, sql)
+        get_result_cache().put(key, result, shape=query_shape(sql))
+        return result
+
+    # Concurrent requests for the same SQL (and format) await one query.
+    return await singleflight.executions.acall(key, run)
+
+
+async def aexecute_sql(sql: str) -> List[Dict[str, Any]]:
+    """Async :func:`execute_sql`; the blocking driver call runs on the bounded ClickHouse pool."""
+    return await _aexecute(sql, "rows", _execute_uncached)
+
+
+async def aexecute_columnar(sql: str) -> ColumnarResult:
+    """Like :func:`aexecute_sql` but one list per column (``query(column_oriented=True)``)."""
+    return await _aexecute(sql, "columnar", _execute_columnar_uncached)
+
+
+async def aexecute_arrow(sql: str):
+    """Result as a pyarrow.Table, built from columnar blocks without Python row objects."""
+    return await _aexecute(sql, "arrow", _execute_arrow_uncached)
+
+
+def iter_rows(
+    sql: str, block_rows: Optional[int] = None, max_rows: Optional[int] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield result rows block by block instead of materializing the whole result.
+
+    Real mode uses clickhouse_connect's row block stream, so only the block
+    being converted is held in memory. ClickHouse stops after ``max_rows`` + 1
+    rows (default ``STREAM_MAX_ROWS``; 0 disables the budget). Closing the
+    generator early (row cap, client disconnect) closes the HTTP response and
+    returns the client to the pool. Streams bypass the result cache.
+    """
     settings = get_settings()
-    if settings.mock_mode:
-        # Return filtered or aggregated mock results based on trivial patterns
-        # NOTE: These sample rows still reflect legacy 'orders' shape; left for simple testing.
-        l = sql.lower()
-        if l.startswith("select count"):
-            return [{"count": len(SAMPLE_ROWS)}]
-        if l.startswith("select sum"):
-            total = sum(r["amount"] for r in SAMPLE_ROWS)
-            return [{"sum": round(total, 2)}]
-        if l.startswith("select avg"):
-            total = sum(r["amount"] for r in SAMPLE_ROWS)
-            return [{"avg": round(total / len(SAMPLE_ROWS), 2)}]
-        return SAMPLE_ROWS
-
-    # Real execution path
+    block_rows = block_rows or settings.stream_block_rows
+    max_rows = settings.stream_max_rows if max_rows is None else max_rows
+    if _use_mock_engine():
+        yield from get_mock_engine().iter_blocks(sql, block_rows)
+        return
     err = _safety_check(sql)
     if err:
+        metrics.SAFETY_REJECTIONS.inc(stage="execute")
         raise ValueError(f"Safety check failed: {err}")
+    with get_clickhouse_pool().connection() as client:
+        stream_settings = {**query_settings(max_rows), "max_block_size": block_rows}
+        with client.query_row_block_stream(sql, settings=stream_settings) as stream:
+            names = stream.source.column_names
+            for block in stream:
+                yield [dict(zip(names, row)) for row in block]
+
 
-    client = _get_real_client()
-    result = client.query(sql)
+async def astream_rows(
+    sql: str, block_rows: Optional[int] = None, max_rows: Optional[int] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Async :func:`iter_rows`: the next block is fetched only after the consumer took the previous one."""
+    blocks = iter_rows(sql, block_rows, max_rows)
+    try:
+        while True:
+            block = await run_blocking(next, blocks, None)
+            if block is None:
+                break
+            yield block
+    finally:
+        await run_blocking(blocks.close)
+
+
+def _query(method: str, sql: str, **kwargs: Any) -> Any:
+    """``client.<method>(sql)`` on a pooled client, answered from a rollup when one matches.
+
+    A failing rollup query (e.g. rollup tables not created yet) is rerun on
+    default.MOCK_DATA, so enabling rollups never loses an answer.
+    """
+    rewrite = rollups.rewrite(sql)
+    with get_clickhouse_pool().connection() as client:
+        run = getattr(client, method)
+        if rewrite is not None:
+            try:
+                return run(rewrite.sql, settings=query_settings(), **kwargs)
+            except Exception:
+                metrics.ROLLUP_FALLBACKS.inc(rollup=rewrite.rollup.name)
+                logger.warning(
+                    "Rollup query failed; running the original", exc_info=True, extra={"rollup": rewrite.rollup.name}
+                )
+        return run(sql, settings=query_settings(), **kwargs)
+
+
+def _execute_uncached(sql: str) -> List[Dict[str, Any]]:
+    if _use_mock_engine():
+        # In-process columnar engine over sample_files/MOCK_DATA.csv (or MOCK_DATA_PATH)
+        return get_mock_engine().execute(sql, rollups.rewrite(sql))
+
+    # Real execution path (safety already checked by execute_sql)
+    result = _query("query", sql)
     # Build list of dict rows
     return [dict(zip(result.column_names, row)) for row in result.result_rows]
+
+
+def _execute_columnar_uncached(sql: str) -> ColumnarResult:
+    if _use_mock_engine():
+        return ColumnarResult(*get_mock_engine().execute_lists(sql, rollups.rewrite(sql)))
+    result = _query("query", sql, column_oriented=True)
+    return ColumnarResult(list(result.column_names), [list(c) for c in result.result_columns])
+
+
+def _execute_arrow_uncached(sql: str):
+    if _use_mock_engine():
+        return arrow_table(*get_mock_engine().execute_columns(sql, rollups.rewrite(sql)))
+    return _query("query_arrow", sql)
@@ -0,0 +1,232 @@
+"""Long-lived upstream clients.
+
+* :class:`ConnectionPool` keeps a fixed number of ClickHouse clients (each
+  clickhouse_connect client is one HTTP session and must not run two queries
+  at once). Idle clients are health-checked before reuse and replaced when a
+  check or a query fails.
+* ``get_llm_client`` / ``get_async_llm_client`` share one keep-alive HTTP
+  connection pool for all OpenAI calls instead of a new client per request.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, Optional
+from app.config import get_settings
+
+logger = logging.getLogger("cfg_evals.clients")
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class ConnectionPool:
+    """Fixed-size, thread-safe pool of clients produced by ``factory``."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int = 8,
+        timeout: float = 10.0,
+        health_interval: float = 30.0,
+        health_check: Optional[Callable[[Any], bool]] = None,
+        close: Optional[Callable[[Any], None]] = None,
+    ):
+        self.factory = factory
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.health_check = health_check
+        self._close = close
+        self._idle: "queue.LifoQueue[tuple]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.in_use = 0
+        self.reconnects = 0
+        self.waits = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        conn = self._acquire()
+        discarded = False
+        try:
+            yield conn
+        except Exception:
+            # The session may be broken (timeout, reset); don't hand it out again.
+            discarded = True
+            self._discard(conn)
+            raise
+        finally:
+            # Also reached on GeneratorExit / CancelledError / KeyboardInterrupt,
+            # e.g. when a generator holding the connection is closed early.
+            if not discarded:
+                self._release(conn)
+
+    def warm(self, count: Optional[int] = None) -> int:
+        """Open up to ``count`` (default: all) connections ahead of traffic."""
+        target = self.size if count is None else min(count, self.size)
+        opened = 0
+        while True:
+            with self._lock:
+                if self._created >= target:
+                    break
+                self._created += 1
+            try:
+                conn = self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            self._idle.put((conn, time.monotonic()))
+            opened += 1
+        return opened
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_conn(conn)
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "open": self._created,
+            "in_use": self.in_use,
+            "idle": self._idle.qsize(),
+            "utilization": round(self.in_use / self.size, 4),
+            "reconnects": self.reconnects,
+            "waits": self.waits,
+        }
+
+    def _acquire(self) -> Any:
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    conn = self.factory()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                last_used = time.monotonic()
+            else:
+                self.waits += 1
+                try:
+                    conn, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeout(f"No connection available within {self.timeout}s")
+        if self.health_check is not None and time.monotonic() - last_used > self.health_interval:
+            conn = self._checked(conn)
+        with self._lock:
+            self.in_use += 1
+        return conn
+
+    def _checked(self, conn: Any) -> Any:
+        try:
+            healthy = self.health_check(conn)
+        except Exception:
+            healthy = False
+        if healthy:
+            return conn
+        logger.warning("Pooled connection failed health check; reconnecting")
+        self._close_conn(conn)
+        self.reconnects += 1
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, conn: Any) -> None:
+        with self._lock:
+            self.in_use -= 1
+        self._idle.put((conn, time.monotonic()))
+
+    def _discard(self, conn: Any) -> None:
+        self._close_conn(conn)
+        with self._lock:
+            self.in_use -= 1
+            self._created -= 1
+        self.reconnects += 1
+
+    def _close_conn(self, conn: Any) -> None:
+        if self._close is not None:
+            try:
+                self._close(conn)
+            except Exception:
+                pass
+
+
+# --- LLM clients ---------------------------------------------------------------
+
+def _httpx_limits():
+    import httpx
+    settings = get_settings()
+    return httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_connections,
+        keepalive_expiry=60.0,
+    )
+
+
+@lru_cache
+def get_llm_client():
+    """Process-wide OpenAI client with a persistent keep-alive connection pool."""
+    import httpx
+    from openai import OpenAI
+    settings = get_settings()
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url,
+        http_client=httpx.Client(limits=_httpx_limits()),
+    )
+
+
+_async_llm_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def get_async_llm_client():
+    """AsyncOpenAI client shared by every request on the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_llm_clients.get(loop)
+    if client is None:
+        import httpx
+        from openai import AsyncOpenAI
+        settings = get_settings()
+        client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=httpx.AsyncClient(limits=_httpx_limits()),
+        )
+        _async_llm_clients[loop] = client
+    return client
+
+
+async def close_async_llm_client() -> None:
+    client = _async_llm_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def llm_pool_stats() -> Dict[str, Any]:
+    return {
+        "max_connections": get_settings().llm_max_connections,
+        "async_clients": len(_async_llm_clients),
+        "sync_client": get_llm_client.cache_info().currsize > 0,
+    }
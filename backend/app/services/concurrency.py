@@ -0,0 +1,50 @@
+"""Concurrency helpers shared by the async request path.
+
+* ``limiter(name, limit)`` returns an asyncio.Semaphore per event loop (test
+  clients and uvicorn workers each run their own loop, and asyncio primitives
+  must not be shared between loops).
+* ``run_blocking(fn, *args)`` runs blocking driver calls (clickhouse_connect)
+  on a bounded thread pool so they never stall the event loop.
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+from app.config import get_settings
+
+T = TypeVar("T")
+
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def limiter(name: str, limit: int) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    per_loop = _semaphores.setdefault(loop, {})
+    sem = per_loop.get(name)
+    if sem is None:
+        sem = per_loop[name] = asyncio.Semaphore(max(1, limit))
+    return sem
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, get_settings().clickhouse_concurrency),
+                    thread_name_prefix="clickhouse",
+                )
+    return _executor
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(fn, *args, **kwargs))
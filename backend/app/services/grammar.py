@@ -0,0 +1,482 @@
+"""Grammar registry: parses the BNF files in app/grammars once into structured,
+in-memory objects and hands them out to the translator / validators.
+
+Files are re-read only when their mtime (checked at most every
+``grammar_check_interval`` seconds) changes, and re-parsed only when their
+content hash changes.
+"""
+from __future__ import annotations
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from app.config import get_settings
+
+
+class GrammarError(ValueError):
+    """Raised when a BNF file cannot be parsed."""
+
+
+# --- Expression AST ---------------------------------------------------------
+
+@dataclass(frozen=True)
+class Literal:
+    text: str
+
+
+@dataclass(frozen=True)
+class CharClass:
+    pattern: str  # regex source, e.g. "[0-9]"
+
+
+@dataclass(frozen=True)
+class AnyChar:
+    pass
+
+
+@dataclass(frozen=True)
+class Ref:
+    name: str
+
+
+@dataclass(frozen=True)
+class Sequence:
+    items: Tuple["Expr", ...]
+
+
+@dataclass(frozen=True)
+class Choice:
+    options: Tuple["Expr", ...]
+
+
+@dataclass(frozen=True)
+class Repeat:
+    item: "Expr"
+    min: int
+    max: Optional[int]  # None = unbounded
+
+
+Expr = Union[Literal, CharClass, AnyChar, Ref, Sequence, Choice, Repeat]
+
+
+@dataclass(frozen=True)
+class Production:
+    name: str
+    expr: Expr
+    source: str  # comment-free rule body, whitespace collapsed
+
+    def render(self) -> str:
+        return f"{self.name} ::= {self.source} ;"
+
+
+@dataclass(frozen=True, eq=False)
+class Grammar:
+    name: str
+    path: str
+    digest: str
+    start: str
+    productions: Dict[str, Production]
+    terminals: frozenset
+    columns: Tuple[str, ...]
+    functions: Tuple[str, ...]
+
+    def references(self, name: str) -> List[str]:
+        """Names of productions referenced directly by ``name`` (in order, unique)."""
+        return _ref_names(self.productions[name].expr)
+
+    def render(self, names: Optional[List[str]] = None) -> str:
+        names = list(self.productions) if names is None else names
+        return "\n".join(self.productions[n].render() for n in names)
+
+
+# --- BNF parsing -------------------------------------------------------------
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<comment>\#[^\n]*)
+  | (?P<define>::=)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<cclass>\[(?:[^\]\\]|\\.)*\])
+  | (?P<count>\{\d+(?:,\d*)?\})
+  | (?P<escape>\\.)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>[()|?*+;.])
+    """,
+    re.VERBOSE,
+)
+
+_STRING_ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+
+def _tokenize_bnf(text: str) -> Tuple[List[Tuple[str, str]], List[bool]]:
+    """Return (kind, value) tokens plus, per token, whether whitespace preceded it."""
+    tokens: List[Tuple[str, str]] = []
+    spaced: List[bool] = []
+    gap = False
+    pos = 0
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            line = text.count("\n", 0, pos) + 1
+            raise GrammarError(f"Unexpected character {text[pos]!r} on line {line}")
+        kind = m.lastgroup
+        if kind in ("ws", "comment"):
+            gap = True
+        else:
+            tokens.append((kind, m.group()))
+            spaced.append(gap)
+            gap = False
+        pos = m.end()
+    return tokens, spaced
+
+
+def _unescape(body: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _STRING_ESCAPES.get(m.group(1), m.group(1)), body)
+
+
+class _BnfParser:
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else ("eof", "")
+
+    def take(self) -> Tuple[str, str]:
+        tok = self.peek()
+        self.pos += 1
+        return tok
+
+    def expect(self, kind: str, value: Optional[str] = None) -> Tuple[str, str]:
+        tok = self.take()
+        if tok[0] != kind or (value is not None and tok[1] != value):
+            raise GrammarError(f"Expected {value or kind}, got {tok[1] or 'end of file'!r}")
+        return tok
+
+    def rules(self) -> List[Tuple[str, Expr, int, int]]:
+        out = []
+        while self.peek()[0] != "eof":
+            name = self.expect("name")[1]
+            self.expect("define")
+            start = self.pos
+            expr = self.choice()
+            end = self.pos
+            self.expect("op", ";")
+            out.append((name, expr, start, end))
+        return out
+
+    def choice(self) -> Expr:
+        options = [self.sequence()]
+        while self.peek() == ("op", "|"):
+            self.take()
+            options.append(self.sequence())
+        return options[0] if len(options) == 1 else Choice(tuple(options))
+
+    def sequence(self) -> Expr:
+        items = []
+        while self.peek()[0] in ("string", "cclass", "escape", "name") or self.peek()[1] in ("(", "."):
+            items.append(self.postfix())
+        if not items:
+            raise GrammarError(f"Empty alternative before {self.peek()[1] or 'end of file'!r}")
+        return items[0] if len(items) == 1 else Sequence(tuple(items))
+
+    def postfix(self) -> Expr:
+        expr = self.atom()
+        while True:
+            kind, value = self.peek()
+            if value == "?":
+                expr = Repeat(expr, 0, 1)
+            elif value == "*":
+                expr = Repeat(expr, 0, None)
+            elif value == "+":
+                expr = Repeat(expr, 1, None)
+            elif kind == "count":
+                lo, comma, hi = value[1:-1].partition(",")
+                if not comma:
+                    expr = Repeat(expr, int(lo), int(lo))
+                else:
+                    expr = Repeat(expr, int(lo), int(hi) if hi else None)
+            else:
+                return expr
+            self.take()
+
+    def atom(self) -> Expr:
+        kind, value = self.take()
+        if kind == "string":
+            return Literal(_unescape(value[1:-1]))
+        if kind == "cclass":
+            return CharClass(value)
+        if kind == "escape":
+            return Literal(_unescape(value))
+        if kind == "name":
+            return Ref(value)
+        if value == ".":
+            return AnyChar()
+        if value == "(":
+            expr = self.choice()
+            self.expect("op", ")")
+            return expr
+        raise GrammarError(f"Unexpected token {value!r}")
+
+
+def _collect_refs(expr: Expr, out: List[str]) -> None:
+    if isinstance(expr, Ref):
+        if expr.name not in out:
+            out.append(expr.name)
+    elif isinstance(expr, Sequence):
+        for item in expr.items:
+            _collect_refs(item, out)
+    elif isinstance(expr, Choice):
+        for option in expr.options:
+            _collect_refs(option, out)
+    elif isinstance(expr, Repeat):
+        _collect_refs(expr.item, out)
+
+
+def _ref_names(expr: Expr) -> List[str]:
+    out: List[str] = []
+    _collect_refs(expr, out)
+    return out
+
+
+def _collect_literals(expr: Expr, out: List[str]) -> None:
+    if isinstance(expr, Literal):
+        if expr.text not in out:
+            out.append(expr.text)
+    elif isinstance(expr, Sequence):
+        for item in expr.items:
+            _collect_literals(item, out)
+    elif isinstance(expr, Choice):
+        for option in expr.options:
+            _collect_literals(option, out)
+    elif isinstance(expr, Repeat):
+        _collect_literals(expr.item, out)
+
+
+def parse_grammar(text: str, name: str = "grammar", path: str = "<string>") -> Grammar:
+    """Parse BNF source into a :class:`Grammar`.
+
+    The first rule is the start symbol. Column / function whitelists are taken
+    from the literal alternatives of ``column_ref`` and of ``func_name`` /
+    ``*_func`` productions respectively.
+    """
+    tokens, spaced = _tokenize_bnf(text)
+    productions: Dict[str, Production] = {}
+    for rule_name, expr, start, end in _BnfParser(tokens).rules():
+        if rule_name in productions:
+            raise GrammarError(f"Duplicate production {rule_name!r}")
+        source = "".join(
+            (" " if spaced[i] and i > start else "") + tokens[i][1] for i in range(start, end)
+        )
+        productions[rule_name] = Production(rule_name, expr, source)
+    if not productions:
+        raise GrammarError("Grammar has no productions")
+
+    for prod in productions.values():
+        for ref in _ref_names(prod.expr):
+            if ref not in productions:
+                raise GrammarError(f"Production {prod.name!r} references undefined {ref!r}")
+
+    return _make_grammar(
+        name, path, hashlib.sha256(text.encode("utf-8")).hexdigest(), next(iter(productions)), productions,
+    )
+
+
+def _make_grammar(name: str, path: str, digest: str, start: str, productions: Dict[str, Production]) -> Grammar:
+    terminals: List[str] = []
+    columns: List[str] = []
+    functions: List[str] = []
+    for prod in productions.values():
+        _collect_literals(prod.expr, terminals)
+        if prod.name == "column_ref":
+            _collect_literals(prod.expr, columns)
+        elif prod.name == "func_name" or prod.name.endswith("_func"):
+            _collect_literals(prod.expr, functions)
+
+    return Grammar(
+        name=name,
+        path=path,
+        digest=digest,
+        start=start,
+        productions=productions,
+        terminals=frozenset(terminals),
+        columns=tuple(columns),
+        functions=tuple(functions),
+    )
+
+
+# --- Pruning -----------------------------------------------------------------
+
+def render_expr(expr: Expr) -> str:
+    """BNF source for ``expr`` (the inverse of parsing, modulo whitespace)."""
+    if isinstance(expr, Literal):
+        return '"' + expr.text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    if isinstance(expr, CharClass):
+        return expr.pattern
+    if isinstance(expr, AnyChar):
+        return "."
+    if isinstance(expr, Ref):
+        return expr.name
+    if isinstance(expr, Choice):
+        return " | ".join(render_expr(o) for o in expr.options)
+    if isinstance(expr, Sequence):
+        return " ".join(
+            f"({render_expr(i)})" if isinstance(i, Choice) else render_expr(i) for i in expr.items
+        )
+    item = render_expr(expr.item)
+    if isinstance(expr.item, (Sequence, Choice)):
+        item = f"({item})"
+    suffix = {(0, 1): "?", (0, None): "*", (1, None): "+"}.get((expr.min, expr.max))
+    if suffix is None:
+        suffix = f"{{{expr.min}}}" if expr.min == expr.max else f"{{{expr.min},{expr.max or ''}}}"
+    return item + suffix
+
+
+_EMPTY = Sequence(())  # an expression that now only matches the empty string
+
+
+def _without(expr: Expr, removed: frozenset) -> Optional[Expr]:
+    """``expr`` with every path through a ``removed`` production cut, or None if none is left."""
+    if isinstance(expr, Ref):
+        return None if expr.name in removed else expr
+    if isinstance(expr, Sequence):
+        items = []
+        for item in expr.items:
+            kept = _without(item, removed)
+            if kept is None:
+                return None
+            if kept is not _EMPTY:
+                items.append(kept)
+        if not items:
+            return _EMPTY
+        return items[0] if len(items) == 1 else Sequence(tuple(items))
+    if isinstance(expr, Choice):
+        options = [o for o in (_without(o, removed) for o in expr.options) if o is not None]
+        if not options:
+            return None
+        optional = _EMPTY in options
+        options = [o for o in options if o is not _EMPTY]
+        if not options:
+            return _EMPTY
+        kept = options[0] if len(options) == 1 else Choice(tuple(options))
+        return Repeat(kept, 0, 1) if optional else kept
+    if isinstance(expr, Repeat):
+        item = _without(expr.item, removed)
+        if item is None or item is _EMPTY:
+            return _EMPTY if expr.min == 0 else item
+        return expr if item == expr.item else Repeat(item, expr.min, expr.max)
+    return expr
+
+
+def prune_grammar(grammar: Grammar, drop) -> Grammar:
+    """The closed subset of ``grammar`` left after removing the ``drop`` productions.
+
+    Alternatives and optional parts that go through a dropped production are
+    cut; a production left with nothing to match is dropped in turn, and so on
+    to a fixpoint. Only productions still reachable from the start symbol are
+    kept, so every reference in the result is defined. Rules that changed are
+    re-rendered; the others keep their source text.
+    """
+    removed = frozenset(drop)
+    exprs: Dict[str, Optional[Expr]] = {}
+    while True:
+        exprs = {n: _without(p.expr, removed) for n, p in grammar.productions.items() if n not in removed}
+        empty = frozenset(n for n, e in exprs.items() if e is None or e is _EMPTY)
+        if not empty:
+            break
+        removed |= empty
+    if grammar.start in removed:
+        raise GrammarError(f"Dropping {sorted(drop)} leaves nothing of {grammar.start!r}")
+
+    reachable: List[str] = []
+    pending = [grammar.start]
+    while pending:
+        name = pending.pop()
+        if name not in reachable:
+            reachable.append(name)
+            pending.extend(_ref_names(exprs[name]))
+    productions: Dict[str, Production] = {}
+    for name, prod in grammar.productions.items():
+        if name in reachable:
+            expr = exprs[name]
+            productions[name] = prod if expr == prod.expr else Production(name, expr, render_expr(expr))
+    return _make_grammar(grammar.name, grammar.path, grammar.digest, grammar.start, productions)
+
+
+def load_grammar_text(path: str) -> str:
+    p = Path(path)
+    return p.read_text(encoding="utf-8")
+
+
+# --- Registry ------------------------------------------------------------------
+
+@dataclass
+class _Entry:
+    path: str
+    grammar: Optional[Grammar] = None
+    mtime: float = -1.0
+    checked_at: float = field(default=float("-inf"))
+
+
+class GrammarRegistry:
+    """Named grammars, parsed once and refreshed when their file changes."""
+
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.loads = 0  # number of (re)parses, handy for tests / monitoring
+
+    def register(self, name: str, path: str) -> None:
+        with self._lock:
+            self._entries[name] = _Entry(path=str(path))
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def get(self, name: str) -> Grammar:
+        entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown grammar {name!r}")
+        now = time.monotonic()
+        if entry.grammar is not None and now - entry.checked_at < self.check_interval:
+            return entry.grammar
+        with self._lock:
+            if entry.grammar is None or now - entry.checked_at >= self.check_interval:
+                self._refresh(name, entry, now)
+        return entry.grammar
+
+    def _refresh(self, name: str, entry: _Entry, now: float) -> None:
+        mtime = Path(entry.path).stat().st_mtime
+        entry.checked_at = now
+        if entry.grammar is not None and mtime == entry.mtime:
+            return
+        text = load_grammar_text(entry.path)
+        entry.mtime = mtime
+        if entry.grammar is not None and hashlib.sha256(text.encode("utf-8")).hexdigest() == entry.grammar.digest:
+            return  # touched but unchanged
+        entry.grammar = parse_grammar(text, name=name, path=entry.path)
+        self.loads += 1
+
+
+@lru_cache
+def get_registry() -> GrammarRegistry:
+    """Process-wide registry with every ``*.bnf`` next to ``settings.grammar_path``."""
+    settings = get_settings()
+    registry = GrammarRegistry(check_interval=settings.grammar_check_interval)
+    default = Path(settings.grammar_path)
+    if default.parent.is_dir():
+        for p in sorted(default.parent.glob("*.bnf")):
+            registry.register(p.stem, str(p))
+    registry.register(default.stem, str(default))
+    return registry
+
+
+def get_grammar(name: Optional[str] = None) -> Grammar:
+    """Return the named grammar (default: the one configured by ``grammar_path``)."""
+    return get_registry().get(name or Path(get_settings().grammar_path).stem)
@@ -0,0 +1,87 @@
+"""Guardrail stage between translation and execution.
+
+* Row listings get a LIMIT of at most ``QUERY_MAX_ROWS`` and GROUP BY results
+  at most ``QUERY_MAX_RESULT_ROWS`` (injected, or clamped when larger). One
+  extra row is fetched so the response can say whether the result was cut.
+* Every ClickHouse query carries per-query budgets (``max_execution_time``,
+  ``max_result_rows``, ``max_memory_usage``, ``readonly``).
+
+Scalar aggregates (no GROUP BY) return one row and are left untouched.
+"""
+from __future__ import annotations
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from app.config import get_settings
+from app.services.result_formats import ColumnarResult
+from app.services.sql_parser import Node, get_parser
+
+
+class GuardedQuery(NamedTuple):
+    sql: str  # shown to the caller: LIMIT <= row_cap
+    execute_sql: str  # sent to the database: one row more than row_cap
+    row_cap: Optional[int]  # None when the query cannot exceed its own LIMIT
+
+    def trim(self, result: Any) -> Tuple[Any, bool]:
+        """Cut ``result`` (rows, columnar result or Arrow table) to ``row_cap``; return (result, truncated)."""
+        return truncate(result, self.row_cap)
+
+
+def _limit_count(limit: Node) -> Node:
+    """The row-count integer of ``LIMIT n`` / ``LIMIT offset, n``."""
+    return [c for c in limit.children if isinstance(c, Node)][-1]
+
+
+def apply_guardrails(sql: str, max_rows: Optional[int] = None) -> GuardedQuery:
+    """Inject or clamp LIMIT on ``sql`` (grammar-valid, as returned by ``validate_sql``)."""
+    settings = get_settings()
+    tree = get_parser().parse(sql)
+    grouped = tree.find("group_clause") is not None
+    if not grouped and tree.find("aggregate_expr") is not None:
+        return GuardedQuery(sql, sql, None)
+    cap = max_rows or (settings.query_max_result_rows if grouped else settings.query_max_rows)
+    if cap <= 0:
+        return GuardedQuery(sql, sql, None)
+    limit = tree.find("limit_clause")
+    if limit is None:
+        return GuardedQuery(f"{sql} LIMIT {cap}", f"{sql} LIMIT {cap + 1}", cap)
+    count = _limit_count(limit)
+    if int(sql[count.start:count.end]) <= cap:
+        return GuardedQuery(sql, sql, None)
+    head, tail = sql[:count.start], sql[count.end:]
+    return GuardedQuery(f"{head}{cap}{tail}", f"{head}{cap + 1}{tail}", cap)
+
+
+def truncate(result: Any, cap: Optional[int]) -> Tuple[Any, bool]:
+    if cap is None:
+        return result, False
+    if isinstance(result, ColumnarResult):
+        if result.data and len(result.data[0]) > cap:
+            return ColumnarResult(result.columns, [c[:cap] for c in result.data]), True
+        return result, False
+    if hasattr(result, "num_rows"):  # pyarrow.Table
+        return (result.slice(0, cap), True) if result.num_rows > cap else (result, False)
+    if len(result) > cap:
+        return result[:cap], True
+    return result, False
+
+
+def query_settings(max_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Per-query ClickHouse settings enforcing the configured budgets (0 disables one).
+
+    ``max_rows`` replaces the configured row budget, e.g. with a stream's own cap.
+    """
+    settings = get_settings()
+    out: Dict[str, Any] = {
+        # readonly=2: reads only, but per-query settings (these ones) may still be applied
+        "readonly": 2,
+    }
+    if settings.query_max_execution_time > 0:
+        out["max_execution_time"] = settings.query_max_execution_time
+    if max_rows is None and settings.query_max_result_rows > 0:
+        max_rows = max(settings.query_max_result_rows, settings.query_max_rows)
+    if max_rows:
+        # LIMIT keeps results below this; "break" returns what was read instead of failing
+        out["max_result_rows"] = max_rows + 1
+        out["result_overflow_mode"] = "break"
+    if settings.query_max_memory_usage > 0:
+        out["max_memory_usage"] = settings.query_max_memory_usage
+    return out
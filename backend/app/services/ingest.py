@@ -0,0 +1,172 @@
+"""Bulk loading of ``default.MOCK_DATA``: CSV exports or synthetic rows.
+
+Both sources yield column batches (``{column: typed NumPy array}`` in
+``SCHEMA`` order) of a fixed number of rows, so memory stays flat however
+large the input. :func:`insert_batches` hands each batch to clickhouse_connect
+as one column-oriented insert. The mock engine can take the same batches
+(``Table.from_columns``).
+
+* :func:`iter_csv` reads an export with a header row. Header spellings are
+  mapped (``subscription_planve``) and ``MM/DD/YYYY`` dates parsed.
+* :func:`synthetic_batches` generates realistic rows deterministically: the
+  same ``seed`` and ``anchor`` give the same data for any batch size, so a
+  10M-row and a 1B-row table share their first 10M rows.
+"""
+from __future__ import annotations
+import csv
+import itertools
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+import numpy as np
+from app.services.mock_engine import HEADER_ALIASES, SCHEMA, MockEngineError, parse_column
+
+Batch = Dict[str, np.ndarray]
+
+TABLE = "default.MOCK_DATA"
+
+# Shapes of sample_files/MOCK_DATA.csv, so synthetic data filters and groups alike.
+COUNTRIES = {
+    "China": 18, "Indonesia": 11, "Russia": 7, "Philippines": 5, "Brazil": 4, "Poland": 4, "France": 3,
+    "Portugal": 3, "Sweden": 3, "Thailand": 2, "Czech Republic": 2, "Peru": 2, "United States": 2,
+    "Japan": 2, "Greece": 2, "Ukraine": 2, "Colombia": 2, "Argentina": 2, "Nigeria": 1, "Canada": 1,
+}
+PLANS = {"Basic": 36, "Free": 35, "Premium": 29}
+FIRST_NAMES = (
+    "Alice", "Amalita", "Ann", "Ben", "Cara", "Charo", "Dan", "Dora", "Eve", "Ezra", "Finn", "Greta", "Gus",
+    "Hal", "Helsa", "Ivy", "Jo", "Kai", "Lena", "Liam", "Mara", "Milo", "Nia", "Omar", "Pia", "Quinn", "Rosa",
+    "Sam", "Tess", "Ugo", "Vera", "Will", "Xena", "Yara", "Zane",
+)
+LAST_NAMES = (
+    "Abbott", "Baker", "Chen", "Diaz", "Ellison", "Fischer", "Garcia", "Hansen", "Ito", "Jensen", "Kowalski",
+    "Lopez", "Munton", "Novak", "Okafor", "Petrov", "Quist", "Riches", "Santos", "Tanaka", "Umar", "Varga",
+    "Walsh", "Xu", "Young", "Zielinski", "Anderson", "Benson", "Carlson", "Dawson",
+)
+DOMAINS = (
+    "example.com", "blinklist.com", "mayoclinic.com", "mail.org", "uni.edu", "news.co.uk", "agency.gov",
+    "shop.com", "cloud.io", "web.net",
+)
+SIGNUP_SPAN = 5 * 365 * 86400  # signups over the five years before ``anchor``
+# Rows per generator block. Blocks are seeded by (seed, block number), which is
+# what keeps the data independent of ``batch_rows``.
+SYNTHETIC_BLOCK = 65_536
+
+
+_NAMES = np.array([f"{f} {l}" for f in FIRST_NAMES for l in LAST_NAMES])
+_HANDLES = np.array([f"{f[0]}{l}".lower() for f in FIRST_NAMES for l in LAST_NAMES])
+
+
+class IngestError(ValueError):
+    """Raised when an input file does not have the MOCK_DATA columns."""
+
+
+def iter_csv(path: Union[str, Path], batch_rows: int = 100_000) -> Iterator[Batch]:
+    """Typed batches from a MOCK_DATA export (header row required)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [HEADER_ALIASES.get(h.strip(), h.strip()) for h in next(reader, [])]
+        missing = [c for c in SCHEMA if c not in header]
+        if missing:
+            raise IngestError(f"{path}: missing columns {missing}")
+        index = [header.index(c) for c in SCHEMA]
+        while True:
+            rows = list(itertools.islice(reader, batch_rows))
+            if not rows:
+                return
+            raw = list(zip(*rows))
+            try:
+                yield {name: parse_column(raw[i], kind) for i, (name, kind) in zip(index, SCHEMA.items())}
+            except (MockEngineError, ValueError) as e:
+                raise IngestError(f"{path}: {e}") from e
+
+
+def _choice(rng: np.random.Generator, weighted: Dict[str, int], n: int) -> np.ndarray:
+    values = np.array(list(weighted))
+    weights = np.array(list(weighted.values()), dtype=float)
+    return values[rng.choice(len(values), n, p=weights / weights.sum())]
+
+
+def _synthetic_block(block: int, rows: int, seed: int, anchor: np.datetime64) -> Batch:
+    rng = np.random.default_rng([seed, block])
+    ids = np.arange(block * SYNTHETIC_BLOCK + 1, block * SYNTHETIC_BLOCK + rows + 1)
+    person = rng.integers(0, len(_NAMES), rows)  # index into every first x last name pair
+    email = np.strings.add(np.strings.add(_HANDLES[person], (ids % 1000).astype(str)), "@")
+    signup = anchor - rng.integers(0, SIGNUP_SPAN, rows).astype("timedelta64[s]")
+    since_signup = (anchor - signup).astype(np.int64)
+    return {
+        "id": ids,
+        "name": _NAMES[person],
+        "email": np.strings.add(email, np.array(DOMAINS)[rng.integers(0, len(DOMAINS), rows)]),
+        "age": rng.integers(12, 101, rows),
+        "signup_date": signup,
+        "country": _choice(rng, COUNTRIES, rows),
+        "is_active": rng.random(rows) < 0.5,
+        "subscription_plane": _choice(rng, PLANS, rows),
+        "last_login": signup + (rng.random(rows) * since_signup).astype("timedelta64[s]"),
+        "balance": rng.integers(10, 10_000, rows),
+    }
+
+
+def synthetic_batches(
+    rows: int, batch_rows: int = 1_000_000, seed: int = 0, anchor: Optional[np.datetime64] = None,
+) -> Iterator[Batch]:
+    """``rows`` realistic MOCK_DATA rows with ids 1..rows, ``batch_rows`` at a time.
+
+    Dates fall in the five years before ``anchor`` (default: today, midnight
+    UTC), with ``last_login`` after ``signup_date``.
+    """
+    anchor = np.datetime64("today", "s") if anchor is None else np.datetime64(anchor, "s")
+    pending: List[Batch] = []
+    pending_rows = 0
+    for block in range((rows + SYNTHETIC_BLOCK - 1) // SYNTHETIC_BLOCK):
+        size = min(SYNTHETIC_BLOCK, rows - block * SYNTHETIC_BLOCK)
+        pending.append(_synthetic_block(block, size, seed, anchor))
+        pending_rows += size
+        while pending_rows >= batch_rows:
+            batch = _concat(pending)
+            yield {c: a[:batch_rows] for c, a in batch.items()}
+            pending = [{c: a[batch_rows:] for c, a in batch.items()}]
+            pending_rows -= batch_rows
+    if pending_rows:
+        yield _concat(pending)
+
+
+def _concat(parts: List[Batch]) -> Batch:
+    if len(parts) == 1:
+        return parts[0]
+    return {c: np.concatenate([p[c] for p in parts]) for c in SCHEMA}
+
+
+def insert_columns(batch: Batch) -> List[list]:
+    """Column lists in ``SCHEMA`` order, as clickhouse_connect's column-oriented insert takes them.
+
+    DateTime columns go as epoch seconds, which the driver writes without
+    converting each value through ``datetime``.
+    """
+    out = []
+    for name, kind in SCHEMA.items():
+        values = batch[name]
+        if kind == "datetime":
+            values = values.astype("datetime64[s]").astype(np.int64)
+        out.append(values.tolist())
+    return out
+
+
+def insert_batches(
+    client: Any,
+    batches: Iterable[Batch],
+    table: str = TABLE,
+    progress: Optional[Callable[[int, float], None]] = None,
+) -> int:
+    """Insert every batch (one column-oriented insert each); returns the row count.
+
+    ``progress(rows_so_far, seconds)`` is called after each insert.
+    """
+    start = time.perf_counter()
+    total = 0
+    for batch in batches:
+        client.insert(table, insert_columns(batch), column_names=list(SCHEMA), column_oriented=True)
+        total += len(batch["id"])
+        if progress is not None:
+            progress(total, time.perf_counter() - start)
+    return total
@@ -0,0 +1,204 @@
+"""In-process Prometheus metrics.
+
+A small registry of counters and histograms rendered in the Prometheus text
+format (``GET /metrics``). Recording is one lock, a bisect and two additions,
+so it stays on in production. Collectors add gauges computed at scrape time
+(cache, pool and coalescing stats) without touching the request path.
+
+Request metrics:
+
+* ``cfg_evals_request_seconds{endpoint,mocked,outcome}``: whole request;
+* ``cfg_evals_stage_seconds{stage,mocked,outcome}``: the stages timed by
+  :class:`~app.services.timing.StageTimer`. ``grammar`` (prompt build) and
+  ``llm`` are nested inside ``translate``.
+"""
+from __future__ import annotations
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+GaugeSample = Tuple[str, str, Dict[str, str], float]  # name, help, labels, value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_label_text(self.label_names, key)} {_number(v)}" for key, v in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}  # per-bucket counts + [sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 3)
+            series[i] += 1  # index len(buckets) is the +Inf overflow
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[-1]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0.0
+            for edge, n in zip(self.buckets + (math.inf,), series):
+                cumulative += n
+                le = _label_text(self.label_names, key, f'le="{_number(edge)}"')
+                lines.append(f"{self.name}_bucket{le} {_number(cumulative)}")
+            labels = _label_text(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_number(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[GaugeSample]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[GaugeSample]]) -> Callable[[], Iterable[GaugeSample]]:
+        """Register ``fn`` (usable as a decorator); its samples are rendered as gauges."""
+        self._collectors.append(fn)
+        return fn
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing  # module reloads in tests
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        gauges: Dict[str, Tuple[str, List[str]]] = {}
+        for fn in self._collectors:
+            for name, help, labels, value in fn():
+                _, samples = gauges.setdefault(name, (help, []))
+                samples.append(f"{name}{_label_text(list(labels), list(labels.values()))} {_number(value)}")
+        for name, (help, samples) in gauges.items():
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", *samples]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "cfg_evals_request_seconds", "Request latency by endpoint", ("endpoint", "mocked", "outcome"),
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "cfg_evals_stage_seconds", "/nl-query stage latency", ("stage", "mocked", "outcome"),
+)
+LLM_FALLBACKS = REGISTRY.counter(
+    "cfg_evals_llm_fallbacks_total", "LLM translations replaced by mock_translate", ("reason",),
+)
+LLM_QUOTA_ERRORS = REGISTRY.counter("cfg_evals_llm_quota_errors_total", "LLMQuotaExceeded raised")
+LLM_DEADLINES = REGISTRY.counter(
+    "cfg_evals_llm_deadline_exceeded_total", "Translations that missed LLM_DEADLINE", ("action",),
+)
+LLM_BREAKER_REJECTIONS = REGISTRY.counter(
+    "cfg_evals_llm_breaker_rejections_total", "LLM calls skipped because the quota circuit breaker was open",
+)
+LLM_CALLS_AVOIDED = REGISTRY.counter(
+    "cfg_evals_llm_calls_avoided_total", "Translations served from a cache instead of the LLM", ("cache",),
+)
+LLM_STREAMS = REGISTRY.counter(
+    "cfg_evals_llm_streams_total", "Streamed LLM completions by how they ended", ("result",),
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "cfg_evals_prompt_tokens_total",
+    "Estimated system prompt tokens sent to the LLM, and saved by grammar pruning", ("kind",),
+)
+SAFETY_REJECTIONS = REGISTRY.counter(
+    "cfg_evals_safety_rejections_total", "SQL rejected by the grammar check", ("stage",),
+)
+ROLLUP_REWRITES = REGISTRY.counter(
+    "cfg_evals_rollup_rewrites_total", "Queries answered from a pre-aggregated rollup", ("rollup",),
+)
+ROLLUP_FALLBACKS = REGISTRY.counter(
+    "cfg_evals_rollup_fallbacks_total", "Rollup queries that failed and were rerun on default.MOCK_DATA", ("rollup",),
+)
+ROWS_RETURNED = REGISTRY.counter("cfg_evals_rows_returned_total", "Result rows returned", ("endpoint",))
+RESPONSE_BYTES = REGISTRY.counter(
+    "cfg_evals_response_bytes_total", "Response body bytes for query results", ("endpoint", "format"),
+)
+
+
+def observe_stages(stages: Dict[str, float], mocked: str, outcome: str) -> None:
+    for stage, seconds in stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage, mocked=mocked, outcome=outcome)
@@ -0,0 +1,801 @@
+"""In-process columnar stand-in for ClickHouse (mock mode, tests, benchmarks).
+
+``default.MOCK_DATA`` is loaded once from CSV into typed NumPy arrays (string
+columns dictionary-encoded with sorted categories) and queries accepted by the
+grammar are evaluated over the parse tree from :mod:`app.services.sql_parser`
+with vectorized operations:
+
+* WHERE: comparisons, AND / OR / parentheses, LIKE / ILIKE, IN, BETWEEN and
+  relative time (``30 HOURS AGO``, ``subtractHours(now(), 30)``);
+* GROUP BY / HAVING with count, sum, avg, min, max;
+* projections with arithmetic, CASE and toHour / toDay / toDate;
+* ORDER BY and LIMIT [offset,] n (row queries are sorted and limited before
+  any projection is materialized).
+
+Queries routed to a rollup (:mod:`app.services.rollups`) run over an
+in-memory copy of that rollup, built from the table on first use.
+
+Result column names follow ClickHouse (``count()``, ``sum(balance)``, alias).
+Non-finite floats (avg over no rows, division by zero) are returned as ``None``.
+"""
+from __future__ import annotations
+import csv
+import operator
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+import numpy as np
+from app.config import get_settings
+from app.services.rollups import Measure, Rewrite, Rollup
+from app.services.sql_parser import Node, Token, get_parser, validate_sql
+
+SCHEMA: Dict[str, str] = {
+    "id": "int",
+    "name": "str",
+    "email": "str",
+    "age": "int",
+    "signup_date": "datetime",
+    "country": "str",
+    "is_active": "bool",
+    "subscription_plane": "str",
+    "last_login": "datetime",
+    "balance": "int",
+}
+# Header spellings found in exported CSVs (sample_files/MOCK_DATA.csv has the typo).
+HEADER_ALIASES = {"subscription_planve": "subscription_plane"}
+
+_DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d", "%m/%d/%Y %H:%M:%S")
+_TRUE = ("true", "1", "t", "yes")
+
+_OPS: Dict[str, Callable[[Any, Any], Any]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+_ARITH = {"+": np.add, "-": np.subtract, "/": np.true_divide}
+_UNITS = {
+    "HOUR": "h", "HOURS": "h", "subtractHours": "h",
+    "DAY": "D", "DAYS": "D", "subtractDays": "D",
+    "MINUTE": "m", "MINUTES": "m", "subtractMinutes": "m",
+}
+_COLUMN_RULES = frozenset({"column_ref", "numeric_column", "dt_column"})
+_WRAPPERS = frozenset({"projection", "arithmetic_expr", "arithmetic_term", "numeric_leaf", "having_metric"})
+
+
+class MockEngineError(ValueError):
+    """Query is accepted by the grammar but cannot be evaluated (e.g. ungrouped column)."""
+
+
+class Dictionary:
+    """Dictionary-encoded string column: sorted ``categories`` plus per-row ``codes``.
+
+    Categories are sorted, so codes order like the strings (ORDER BY, min/max
+    work on codes) and predicates run once per distinct value.
+    """
+
+    __slots__ = ("categories", "codes", "_cache")
+
+    def __init__(self, categories: np.ndarray, codes: np.ndarray, cache: Optional[dict] = None):
+        self.categories = categories
+        self.codes = codes
+        self._cache = {} if cache is None else cache
+
+    @classmethod
+    def encode(cls, values: Sequence[str]) -> "Dictionary":
+        arr = np.asarray(values)
+        if arr.dtype.kind not in "US":
+            arr = arr.astype(str)
+        categories, codes = np.unique(arr, return_inverse=True)
+        return cls(categories.astype(object), codes.reshape(-1).astype(np.int32))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def take(self, positions: np.ndarray) -> "Dictionary":
+        return Dictionary(self.categories, self.codes[positions], self._cache)
+
+    def values(self) -> np.ndarray:
+        return self.categories[self.codes]
+
+    def strings(self, lower: bool = False) -> np.ndarray:
+        """Categories as a NumPy unicode array (optionally lower-cased), computed once."""
+        hit = self._cache.get(lower)
+        if hit is None:
+            hit = self.categories.astype(str) if len(self.categories) else np.array([], dtype=str)
+            if lower:
+                hit = np.strings.lower(hit)
+            self._cache[lower] = hit
+        return hit
+
+    def select(self, category_mask: np.ndarray) -> np.ndarray:
+        return np.asarray(category_mask, dtype=bool)[self.codes]
+
+
+Column = Union[np.ndarray, Dictionary]
+
+
+@dataclass
+class Table:
+    columns: Dict[str, Column]
+    n_rows: int
+    source: str = ""
+
+    @classmethod
+    def from_columns(cls, data: Mapping[str, Sequence[Any]], source: str = "") -> "Table":
+        """Build a table from per-column values (strings, ints, bools, datetimes)."""
+        columns: Dict[str, Column] = {}
+        for name, kind in SCHEMA.items():
+            if name not in data:
+                raise MockEngineError(f"Missing column {name!r}")
+            columns[name] = _typed(data[name], kind)
+        sizes = {len(c) for c in columns.values()}
+        if len(sizes) > 1:
+            raise MockEngineError("Columns have different lengths")
+        return cls(columns, sizes.pop() if sizes else 0, source)
+
+
+def _typed(values: Sequence[Any], kind: str) -> Column:
+    if kind == "str":
+        return Dictionary.encode(values)
+    return parse_column(values, kind)
+
+
+def parse_column(values: Sequence[Any], kind: str) -> np.ndarray:
+    """Plain typed array for one column of ``SCHEMA`` kind ``kind`` (CSV text or values)."""
+    if kind == "str":
+        arr = np.asarray(values)
+        return arr if arr.dtype.kind in "US" else arr.astype(str)
+    if kind == "int":
+        return np.asarray(values).astype(np.int64)
+    if kind == "bool":
+        arr = np.asarray(values)
+        if arr.dtype.kind in "US":
+            return np.isin(np.strings.lower(arr.astype(str)), _TRUE)
+        return arr.astype(bool)
+    if kind == "datetime":
+        arr = np.asarray(values)
+        if arr.dtype.kind not in "US":
+            return arr.astype("datetime64[s]")
+        # Parse each distinct string once; exports repeat dates heavily.
+        distinct, inverse = np.unique(arr, return_inverse=True)
+        parsed = np.array([_parse_datetime(s) for s in distinct], dtype="datetime64[s]")
+        return parsed[inverse]
+    raise MockEngineError(f"Unknown column type {kind!r}")
+
+
+def _parse_datetime(text: str) -> np.datetime64:
+    for fmt in _DATE_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(text, fmt), "s")
+        except ValueError:
+            continue
+    raise MockEngineError(f"Unrecognized date {text!r}")
+
+
+def load_csv(path: Union[str, Path]) -> Table:
+    """Load a MOCK_DATA export (header row required) into typed arrays."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [HEADER_ALIASES.get(h.strip(), h.strip()) for h in next(reader)]
+        missing = [c for c in SCHEMA if c not in header]
+        if missing:
+            raise MockEngineError(f"{path}: missing columns {missing}")
+        raw = list(zip(*reader))
+    data = {name: raw[header.index(name)] if raw else () for name in SCHEMA}
+    return Table.from_columns(data, source=str(path))
+
+
+# --- query evaluation -----------------------------------------------------------------
+
+def _text(node: Union[Node, Token]) -> str:
+    if isinstance(node, Token):
+        return node.text
+    return "".join(t.text for t in node.tokens())
+
+
+def _nodes(node: Node) -> List[Node]:
+    return [c for c in node.children if isinstance(c, Node)]
+
+
+def _unwrap(node: Node) -> Node:
+    while node.name in _WRAPPERS:
+        inner = _nodes(node)
+        if len(inner) != 1 or len(node.children) != 1:
+            break
+        node = inner[0]
+    return node
+
+
+def _literal(node: Union[Node, Token]) -> Union[int, float, str]:
+    tok = node if isinstance(node, Token) else node.tokens()[0]
+    if tok.kind == "number":
+        return float(tok.text) if "." in tok.text else int(tok.text)
+    if tok.kind == "string":
+        return re.sub(r"\\(.)", r"\1", tok.text[1:-1])
+    raise MockEngineError(f"Expected a literal, found {tok.text!r}")
+
+
+def _take(values: Any, positions: Optional[np.ndarray]) -> Any:
+    if positions is None:
+        return values
+    if isinstance(values, Dictionary):
+        return values.take(positions)
+    if isinstance(values, np.ndarray) and values.ndim:
+        return values[positions]
+    return values
+
+
+def _materialize(values: Any, n: int) -> np.ndarray:
+    if isinstance(values, Dictionary):
+        return values.values()
+    arr = np.asarray(values)
+    if arr.ndim == 0:
+        return np.full(n, arr.item(), dtype=arr.dtype if arr.dtype.kind != "U" else object)
+    return arr
+
+
+def _to_list(values: np.ndarray) -> list:
+    if values.dtype.kind == "f":
+        finite = np.isfinite(values)
+        if not finite.all():
+            out = values.astype(object)
+            out[~finite] = None
+            return out.tolist()
+    return values.tolist()
+
+
+def _compare(values: Any, op: str, value: Any) -> np.ndarray:
+    fn = _OPS[op]
+    if isinstance(values, Dictionary):
+        if not isinstance(value, str):
+            raise MockEngineError(f"Cannot compare a string column with {value!r}")
+        return values.select(fn(values.categories, value))
+    arr = np.asarray(values)
+    if arr.dtype.kind == "M":
+        if isinstance(value, str):
+            value = _parse_datetime(value)
+        elif not isinstance(value, np.datetime64):
+            raise MockEngineError(f"Cannot compare a DateTime column with {value!r}")
+    elif isinstance(value, str) and arr.dtype.kind != "O":
+        raise MockEngineError(f"Cannot compare a numeric column with {value!r}")
+    return np.asarray(fn(arr, value), dtype=bool)
+
+
+def _like_mask(strings: np.ndarray, pattern: str) -> np.ndarray:
+    core = pattern.strip("%")
+    if "_" not in pattern and "\\" not in pattern and "%" not in core:
+        if not core:
+            return np.ones(len(strings), dtype=bool)
+        lead, trail = pattern.startswith("%"), pattern.endswith("%")
+        if lead and trail:
+            return np.strings.find(strings, core) >= 0
+        if trail:
+            return np.strings.startswith(strings, core)
+        if lead:
+            return np.strings.endswith(strings, core)
+        return strings == core
+    parts = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        parts.append(".*" if ch == "%" else "." if ch == "_" else re.escape(ch))
+        i += 1
+    rx = re.compile("".join(parts), re.DOTALL)
+    return np.fromiter((rx.fullmatch(s) is not None for s in strings), dtype=bool, count=len(strings))
+
+
+def _sort_key(values: Any, descending: bool) -> np.ndarray:
+    if isinstance(values, Dictionary):
+        key = values.codes.astype(np.int64)
+    else:
+        arr = np.asarray(values)
+        if arr.dtype.kind == "M":
+            key = arr.view(np.int64)
+        elif arr.dtype.kind == "b":
+            key = arr.astype(np.int64)
+        elif arr.dtype.kind in "OUS":
+            key = np.unique(arr.astype(str), return_inverse=True)[1].astype(np.int64)
+        else:
+            key = arr
+    return -key if descending else key
+
+
+def _dense(codes: np.ndarray, size: int) -> Tuple[np.ndarray, int]:
+    """Renumber codes in ``[0, size)`` to ``[0, distinct)`` keeping their order."""
+    present = np.zeros(size, dtype=bool)
+    present[codes] = True
+    mapping = np.cumsum(present) - 1
+    return mapping[codes], int(present.sum())
+
+
+def _top(keys: List[np.ndarray], k: Optional[int]) -> np.ndarray:
+    """Stable ORDER BY permutation; with a LIMIT only the first ``k`` entries are exact.
+
+    For a small ``k`` the primary key is partitioned first and only rows that
+    can reach the top ``k`` (ties included) are fully sorted.
+    """
+    n = len(keys[0])
+    if k is not None and 0 < k < n // 4:
+        primary = keys[0]
+        kth = np.partition(primary, k - 1)[k - 1]
+        if kth == kth:  # not NaN
+            candidates = np.flatnonzero(primary <= kth)
+            return candidates[np.lexsort([key[candidates] for key in reversed(keys)])]
+    return np.lexsort(keys[::-1])
+
+
+def _group_ids(columns: List[Column]) -> Tuple[np.ndarray, np.ndarray]:
+    """Dense group id per row plus the first row index of every group (groups in key order)."""
+    combined: Optional[np.ndarray] = None
+    width = 1
+    for col in columns:
+        if isinstance(col, Dictionary):
+            codes, size = col.codes.astype(np.int64), len(col.categories)
+        else:
+            distinct, codes = np.unique(col, return_inverse=True)
+            codes, size = codes.reshape(-1).astype(np.int64), len(distinct)
+        if combined is None:
+            combined, width = codes, max(size, 1)
+        else:
+            combined = combined * size + codes
+            width *= max(size, 1)
+        if width > 1 << 24:  # keep the key space small enough for a dense lookup table
+            distinct, combined = np.unique(combined, return_inverse=True)
+            combined, width = combined.reshape(-1).astype(np.int64), max(len(distinct), 1)
+    gid, n_groups = _dense(combined, width)
+    first = np.empty(n_groups, dtype=np.int64)
+    first[gid[::-1]] = np.arange(len(gid) - 1, -1, -1)  # last write wins -> first occurrence
+    return gid, first
+
+
+class _RowFrame:
+    """Rows of the table selected by ``idx`` (``None`` = all rows)."""
+
+    def __init__(self, table: Table, idx: Optional[np.ndarray]):
+        self.table = table
+        self.idx = idx
+        self.n = table.n_rows if idx is None else len(idx)
+        self._columns: Dict[str, Column] = {}
+
+    def column(self, name: str) -> Column:
+        col = self._columns.get(name)
+        if col is None:
+            col = self._columns[name] = _take(self.table.columns[name], self.idx)
+        return col
+
+    def aggregate(self, func: str, arg: str) -> np.ndarray:
+        raise MockEngineError(f"Aggregate function {func}() outside an aggregation")
+
+    def subset(self, positions: np.ndarray) -> "_RowFrame":
+        return _RowFrame(self.table, positions if self.idx is None else self.idx[positions])
+
+
+class _GroupFrame:
+    """One row per group of ``keys`` (a single group when there is no GROUP BY)."""
+
+    def __init__(self, rows: _RowFrame, keys: List[str]):
+        self.rows = rows
+        self.keys = keys
+        if keys:
+            self.gid, self.first = _group_ids([rows.column(k) for k in keys])
+            self.n = len(self.first)
+        else:
+            self.gid = np.zeros(rows.n, dtype=np.int64)
+            self.first = None
+            self.n = 1
+        self.counts = np.bincount(self.gid, minlength=self.n)
+        self._aggregates: Dict[Tuple[str, str], Any] = {}
+
+    def column(self, name: str) -> Column:
+        if name not in self.keys:
+            raise MockEngineError(f"Column {name} is not under an aggregate function and not in GROUP BY")
+        return _take(self.rows.column(name), self.first)
+
+    def aggregate(self, func: str, arg: str) -> Any:
+        key = (func, arg)
+        if key not in self._aggregates:
+            self._aggregates[key] = self._compute(func, arg)
+        return self._aggregates[key]
+
+    def _compute(self, func: str, arg: str) -> Any:
+        if func == "count":
+            return self.counts
+        values = self.rows.column(arg)
+        if func in ("sum", "avg"):
+            if isinstance(values, Dictionary) or values.dtype.kind == "M":
+                raise MockEngineError(f"{func}() needs a numeric column, got {arg}")
+            sums = np.bincount(self.gid, weights=values.astype(np.float64), minlength=self.n)
+            if func == "avg":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    return sums / self.counts
+            return np.rint(sums).astype(np.int64) if values.dtype.kind in "iub" else sums
+        if func in ("min", "max"):
+            if self.rows.n == 0:
+                return np.full(self.n, np.nan)
+            reduce = np.minimum if func == "min" else np.maximum
+            data = values.codes if isinstance(values, Dictionary) else values
+            view = data.view(np.int64) if data.dtype.kind == "M" else data
+            out = np.empty(self.n, dtype=view.dtype)
+            out[self.gid[::-1]] = view[::-1]  # seed every group with one of its values
+            reduce.at(out, self.gid, view)
+            if isinstance(values, Dictionary):
+                return Dictionary(values.categories, out, values._cache)
+            return out.view(data.dtype) if data.dtype.kind == "M" else out
+        raise MockEngineError(f"Unsupported aggregate {func}()")
+
+
+class _Query:
+    def __init__(self, table: Table, sql: str, stmt: Node, now: np.datetime64):
+        self.table = table
+        self.sql = sql
+        self.now = now
+        self.clauses = {c.name: c for c in _nodes(stmt)}
+
+    def run(self) -> Tuple[List[str], List[np.ndarray]]:
+        rows = _RowFrame(self.table, None)
+        where = self.clauses.get("where_clause")
+        if where is not None:
+            rows = _RowFrame(self.table, np.flatnonzero(self._condition(where.find("or_expr"), rows)))
+        projections = _nodes(self.clauses["select_list"])
+        outputs = self._outputs(projections)
+        grouped = (
+            "group_clause" in self.clauses
+            or "having_clause" in self.clauses
+            or any(p.find("aggregate_expr") is not None for p in projections)
+        )
+        if not grouped:
+            return self._finish(rows, outputs, None)
+        group = self.clauses.get("group_clause")
+        keys = [_text(c) for c in _nodes(group.find("group_list"))] if group is not None else []
+        frame = self._group(rows, keys)
+        positions = None
+        having = self.clauses.get("having_clause")
+        if having is not None:
+            metric, op, number = _nodes(having.find("having_condition"))
+            positions = np.flatnonzero(_compare(self._expr(metric, frame), _text(op), _literal(number)))
+        return self._finish(frame, outputs, positions)
+
+    def _group(self, rows: _RowFrame, keys: List[str]) -> _GroupFrame:
+        return _GroupFrame(rows, keys)
+
+    # --- projections / ORDER BY / LIMIT --------------------------------------------
+
+    def _outputs(self, projections: List[Node]) -> List[Tuple[str, Optional[Node]]]:
+        """(output name, expression) per result column; ``None`` expression = table column."""
+        outputs: List[Tuple[str, Optional[Node]]] = []
+        for projection in projections:
+            first = projection.children[0]
+            if isinstance(first, Token):  # SELECT *
+                outputs.extend((name, None) for name in SCHEMA)
+                continue
+            if first.name == "named_projection":
+                expr, alias = _nodes(first)
+                outputs.append((_text(alias), expr))
+                continue
+            outputs.append((self._name(projection), projection))
+        return outputs
+
+    def _name(self, node: Node) -> str:
+        node = _unwrap(node)
+        if node.name in _COLUMN_RULES:
+            return _text(node)
+        if node.name == "aggregate_expr":
+            func, arg = _nodes(node)
+            arg_text = _text(arg)
+            return f"{_text(func)}({'' if arg_text == '*' else arg_text})"
+        return " ".join(self.sql[node.start:node.end].split())
+
+    def _finish(self, frame, outputs, positions: Optional[np.ndarray]) -> Tuple[List[str], List[np.ndarray]]:
+        evaluated: Dict[int, Any] = {}
+
+        def value(i: int) -> Any:
+            if i not in evaluated:
+                name, expr = outputs[i]
+                evaluated[i] = frame.column(name) if expr is None else self._expr(expr, frame)
+            return evaluated[i]
+
+        offset, count = 0, None
+        limit = self.clauses.get("limit_clause")
+        if limit is not None:
+            numbers = [int(_text(n)) for n in _nodes(limit)]
+            offset, count = (0, numbers[0]) if len(numbers) == 1 else (numbers[0], numbers[1])
+
+        order = self.clauses.get("order_clause")
+        if order is not None:
+            by_name = {name: i for i, (name, _) in reversed(list(enumerate(outputs)))}
+            keys = []
+            for item in _nodes(order.find("order_list")):
+                parts = _nodes(item)
+                name = _text(parts[0])
+                descending = len(parts) > 1 and _text(parts[1]).upper() == "DESC"
+                values = value(by_name[name]) if name in by_name else frame.column(name)
+                if not isinstance(values, Dictionary):
+                    values = _materialize(values, frame.n)
+                keys.append(_sort_key(_take(values, positions), descending))
+            ordering = _top(keys, None if count is None else offset + count)
+            positions = ordering if positions is None else positions[ordering]
+
+        if count is not None:
+            if positions is None:
+                positions = np.arange(min(frame.n, offset), min(frame.n, offset + count))
+            else:
+                positions = positions[offset:offset + count]
+
+        n = frame.n if positions is None else len(positions)
+        names = [name for name, _ in outputs]
+        if isinstance(frame, _RowFrame) and positions is not None:
+            # Project only the rows that survive ORDER BY / LIMIT.
+            sub = frame.subset(positions)
+            columns = [
+                _materialize(sub.column(name) if expr is None else self._expr(expr, sub), n)
+                for name, expr in outputs
+            ]
+        else:
+            columns = [_materialize(_take(value(i), positions), n) for i in range(len(outputs))]
+        return names, columns
+
+    # --- expressions -----------------------------------------------------------------
+
+    def _expr(self, node: Node, frame) -> Any:
+        node = _unwrap(node)
+        name = node.name
+        if name in _COLUMN_RULES:
+            return frame.column(_text(node))
+        if name in ("number_literal", "scalar_value"):
+            return _literal(node)
+        if name == "aggregate_expr":
+            func, arg = _nodes(node)
+            return frame.aggregate(_text(func), _text(arg))
+        if name == "arithmetic_expr":
+            parts = _nodes(node)
+            result = self._numeric(self._expr(parts[0], frame))
+            for op, term in zip(parts[1::2], parts[2::2]):
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = _ARITH[_text(op)](result, self._numeric(self._expr(term, frame)))
+            return result
+        if name == "date_trunc_expr":
+            func, column = _nodes(node)
+            values = np.asarray(frame.column(_text(column)))
+            days = values.astype("datetime64[D]")
+            func = _text(func)
+            if func == "toHour":
+                return ((values - days) // np.timedelta64(1, "h")).astype(np.int64)
+            if func == "toDate":
+                return days
+            return days.astype("datetime64[s]")  # toDay: start of day
+        if name == "case_expr":
+            conditions, choices = [], []
+            default: Any = None
+            has_else = False
+            for clause in _nodes(node):
+                parts = _nodes(clause)
+                if clause.name == "case_when_clause":
+                    conditions.append(self._condition(parts[0], frame))
+                    choices.append(_literal(parts[1]))
+                else:
+                    default, has_else = _literal(parts[0]), True
+            results = choices + [default] if has_else else choices
+            # Without ELSE unmatched rows are NULL, like ClickHouse.
+            dtype = object
+            if has_else and all(isinstance(v, (int, float)) for v in results):
+                dtype = np.float64 if any(isinstance(v, float) for v in results) else np.int64
+            return np.select(
+                conditions, [np.full(frame.n, v, dtype=dtype) for v in choices], default=np.array(default, dtype=dtype)
+            )
+        raise MockEngineError(f"Unsupported expression {name!r}")
+
+    @staticmethod
+    def _numeric(values: Any) -> Any:
+        if isinstance(values, (Dictionary, str)):
+            raise MockEngineError("Arithmetic on a string value")
+        return values
+
+    # --- conditions ------------------------------------------------------------------
+
+    def _condition(self, node: Node, frame) -> np.ndarray:
+        name = node.name
+        parts = _nodes(node)
+        if name == "or_expr":
+            return np.logical_or.reduce([self._condition(p, frame) for p in parts])
+        if name == "and_expr":
+            return np.logical_and.reduce([self._condition(p, frame) for p in parts])
+        if name in ("base_condition", "paren_cond"):
+            return self._condition(parts[0], frame)
+        column = frame.column(_text(parts[0]))
+        if name == "comparison":
+            return _compare(column, _text(parts[1]), _literal(parts[2]))
+        if name == "bool_is":
+            return _compare(column, "=", _text(parts[1]) == "true")
+        if name == "time_range":
+            return _compare(np.asarray(column), _text(parts[1]), self._relative_time(parts[2]))
+        if name == "between_time":
+            low, high = (_parse_datetime(_literal(p)) for p in parts[1:3])
+            arr = np.asarray(column)
+            return (arr >= low) & (arr <= high)
+        if name == "in_list":
+            values = [_literal(p) for p in parts[1:]]
+            if isinstance(column, Dictionary):
+                return column.select(np.isin(column.categories, [v for v in values if isinstance(v, str)]))
+            arr = np.asarray(column)
+            if arr.dtype.kind == "M":
+                values = [_parse_datetime(v) for v in values if isinstance(v, str)]
+            return np.isin(arr, values)
+        if name == "like_condition":
+            insensitive = _text(parts[1]).upper() == "ILIKE"
+            pattern = _literal(parts[2])
+            if not isinstance(column, Dictionary):
+                raise MockEngineError(f"{_text(parts[1]).upper()} needs a string column, got {_text(parts[0])}")
+            if insensitive:
+                pattern = pattern.lower()
+            return column.select(_like_mask(column.strings(lower=insensitive), pattern))
+        raise MockEngineError(f"Unsupported condition {name!r}")
+
+    def _relative_time(self, node: Node) -> np.datetime64:
+        amount = int(_text(node.find("integer")))
+        unit_node = node.find("relative_time_func") or node.find("time_unit")
+        unit = _text(unit_node)
+        return self.now - np.timedelta64(amount, _UNITS.get(unit, _UNITS.get(unit.upper(), "s")))
+
+
+# --- rollups ------------------------------------------------------------------------
+
+class _RollupGroupFrame(_GroupFrame):
+    """Groups of rollup rows: count and sum add up the stored partial aggregates."""
+
+    def __init__(self, rows: _RowFrame, keys: List[str], rollup: Rollup):
+        super().__init__(rows, keys)
+        self.rollup = rollup
+        self.counts = self._merged(rollup.measure("count", "*"))
+
+    def _merged(self, measure: Measure) -> np.ndarray:
+        values = self.rows.column(measure.name).astype(np.float64)
+        return np.rint(np.bincount(self.gid, weights=values, minlength=self.n)).astype(np.int64)
+
+    def _compute(self, func: str, arg: str) -> Any:
+        if func == "count":
+            return self.counts
+        measure = self.rollup.measure("sum", arg) if func in ("sum", "avg") else None
+        if measure is None:
+            raise MockEngineError(f"Rollup {self.rollup.name} cannot answer {func}({arg})")
+        sums = self._merged(measure)
+        if func == "avg":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return sums / self.counts
+        return sums
+
+
+class _RollupQuery(_Query):
+    """The original query evaluated over a rollup table (keys keep their column names)."""
+
+    def __init__(self, table: Table, sql: str, stmt: Node, now: np.datetime64, rollup: Rollup):
+        super().__init__(table, sql, stmt, now)
+        self.rollup = rollup
+
+    def _group(self, rows: _RowFrame, keys: List[str]) -> _GroupFrame:
+        return _RollupGroupFrame(rows, keys, self.rollup)
+
+
+def materialize_rollup(table: Table, rollup: Rollup) -> Table:
+    """What the rollup's materialized view holds after inserting ``table`` (fully merged)."""
+    keys = []
+    for key in rollup.keys:
+        values = table.columns[key.column]
+        if key.bucket == "hour":
+            values = np.asarray(values).astype("datetime64[h]").astype("datetime64[s]")
+        keys.append(values)
+    if table.n_rows:
+        gid, first = _group_ids(keys)
+    else:
+        gid, first = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    columns: Dict[str, Column] = {key.name: _take(values, first) for key, values in zip(rollup.keys, keys)}
+    for measure in rollup.measures:
+        if measure.func == "count":
+            columns[measure.name] = np.bincount(gid, minlength=len(first)).astype(np.int64)
+        else:
+            weights = np.asarray(table.columns[measure.column]).astype(np.float64)
+            columns[measure.name] = np.rint(np.bincount(gid, weights=weights, minlength=len(first))).astype(np.int64)
+    return Table(columns, len(first), source=f"{table.source}#{rollup.name}")
+
+
+class MockEngine:
+    """Runs grammar-valid SQL against an in-memory :class:`Table`."""
+
+    def __init__(self, table: Table, clock: Optional[Callable[[], np.datetime64]] = None):
+        self.table = table
+        self.clock = clock or (lambda: np.datetime64("now", "s"))
+        self._rollups: Dict[str, Table] = {}
+
+    @property
+    def version(self) -> tuple:
+        return (self.table.n_rows, self.table.source)
+
+    def rollup_table(self, rollup: Rollup) -> Table:
+        table = self._rollups.get(rollup.name)
+        if table is None:
+            table = self._rollups[rollup.name] = materialize_rollup(self.table, rollup)
+        return table
+
+    def execute_columns(self, sql: str, rewrite: Optional[Rewrite] = None) -> Tuple[List[str], List[np.ndarray]]:
+        """Column names and one NumPy array per result column.
+
+        With a ``rewrite`` (from :func:`app.services.rollups.rewrite`) the query
+        is answered from the in-memory copy of that rollup, as ClickHouse would.
+        """
+        text = validate_sql(sql)
+        stmt = get_parser().parse(text).find("select_stmt")
+        now = np.datetime64(self.clock(), "s")
+        if rewrite is None:
+            return _Query(self.table, text, stmt, now).run()
+        rollup = rewrite.rollup
+        if any(key.bucket for key in rollup.keys):
+            return self._window(text, stmt, now, rollup)
+        return _RollupQuery(self.rollup_table(rollup), text, stmt, now, rollup).run()
+
+    def _window(self, sql: str, stmt: Node, now: np.datetime64, rollup: Rollup) -> Tuple[List[str], List[np.ndarray]]:
+        """count / sum over ``signup_date >= <relative time>``: whole hours from the rollup, the first from the rows."""
+        query = _Query(self.table, sql, stmt, now)
+        column, op, bound = _nodes(stmt.find("time_range"))
+        start = query._relative_time(bound)
+        cut = start.astype("datetime64[h]").astype("datetime64[s]")
+        buckets = self.rollup_table(rollup)
+        (key,) = rollup.keys
+        whole = np.asarray(buckets.columns[key.name]) > cut
+        signups = np.asarray(self.table.columns[_text(column)])
+        edge = _compare(signups, _text(op), start) & (signups < cut + np.timedelta64(1, "h"))
+        names, columns = [], []
+        for name, expr in query._outputs(_nodes(query.clauses["select_list"])):
+            func, arg = (_text(n) for n in _nodes(_unwrap(expr)))
+            measure = rollup.measure(func, arg)
+            if measure is None:
+                raise MockEngineError(f"Rollup {rollup.name} cannot answer {func}({arg})")
+            stored = int(np.asarray(buckets.columns[measure.name])[whole].sum())
+            rows = int(edge.sum()) if func == "count" else int(np.asarray(self.table.columns[arg])[edge].sum())
+            names.append(name)
+            columns.append(np.array([stored + rows], dtype=np.int64))
+        return names, columns
+
+    def execute_lists(self, sql: str, rewrite: Optional[Rewrite] = None) -> Tuple[List[str], List[list]]:
+        """Column names and one Python list per column (JSON-ready, NaN as None)."""
+        names, columns = self.execute_columns(sql, rewrite)
+        return names, [_to_list(c) for c in columns]
+
+    def execute(self, sql: str, rewrite: Optional[Rewrite] = None) -> List[Dict[str, Any]]:
+        names, columns = self.execute_columns(sql, rewrite)
+        return [dict(zip(names, row)) for row in zip(*(_to_list(c) for c in columns))]
+
+    def iter_blocks(self, sql: str, block_rows: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Result rows in blocks; only one block at a time is converted to Python objects."""
+        names, columns = self.execute_columns(sql)
+        n = len(columns[0]) if columns else 0
+        for start in range(0, n, max(1, block_rows)):
+            chunk = [_to_list(c[start:start + block_rows]) for c in columns]
+            yield [dict(zip(names, row)) for row in zip(*chunk)]
+
+
+def default_data_path() -> Path:
+    """``MOCK_DATA_PATH`` or sample_files/MOCK_DATA.csv (repo checkout or Docker image)."""
+    configured = get_settings().mock_data_path
+    if configured:
+        return Path(configured)
+    here = Path(__file__).resolve()
+    for root in (here.parents[3], here.parents[2]):
+        candidate = root / "sample_files" / "MOCK_DATA.csv"
+        if candidate.exists():
+            return candidate
+    raise MockEngineError("sample_files/MOCK_DATA.csv not found; set MOCK_DATA_PATH")
+
+
+@lru_cache
+def get_mock_engine() -> MockEngine:
+    """Process-wide engine; the CSV is loaded on first use."""
+    return MockEngine(load_csv(default_data_path()))
@@ -1,188 +1,579 @@
 from __future__ import annotations
+import asyncio
 import logging
-from pathlib import Path
-from typing import Tuple
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, NamedTuple, Optional, Tuple
 from app.config import get_settings
+from app.services.clients import get_async_llm_client, get_llm_client
+from app.services import metrics, singleflight
+from app.services.circuit_breaker import CircuitBreaker, get_llm_breaker
+from app.services.concurrency import limiter, run_blocking
+from app.services.grammar import Grammar, get_grammar, load_grammar_text, prune_grammar  # noqa: F401 (re-export)
+from app.services.sql_parser import SqlSyntaxError, StreamingSqlCheck, validate_sql
+from app.services.timing import stage
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import cache_key, get_translation_cache
+
+logger = logging.getLogger("cfg_evals.nl_to_sql")
+
 
 class LLMQuotaExceeded(Exception):
     """Raised when the upstream LLM returns an insufficient_quota / 429 error."""
 
+
+class LLMTimeout(Exception):
+    """Raised when the LLM misses ``llm_deadline`` and hedging is off."""
+
 INSTRUCTION = """You are a translator that converts natural language analytics requests into STRICT SQL matching the provided grammar.\nRules:\n1. Output ONLY SQL, no commentary.\n2. Prefer listing rows (SELECT *) when the user asks to 'find', 'list', 'show' entities.\n3. Use aggregates only when user explicitly asks for count/sum/avg/min/max.\n4. Preserve safe simplicity: avoid unnecessary columns.\nSQL:"""
 
-def load_grammar_text(path: str) -> str:
-    p = Path(path)
-    return p.read_text(encoding="utf-8")
+# Character budget for the grammar excerpt embedded in the system prompt. The
+# full grammar fits; the budget is a backstop for larger grammars.
+PROMPT_GRAMMAR_BUDGET = 4000
+
+# Optional grammar features, the productions that implement them, and the
+# question keywords that ask for them. A question that mentions none of a
+# feature's keywords gets a prompt grammar without its productions (and
+# without whatever only they reach). Keywords err on the side of keeping a
+# feature: a missing rule costs a worse translation, an extra one a few tokens.
+PROMPT_FEATURES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "case": (
+        ("case_expr",),
+        ("case", "categor", "bucket", "label", "tier", "band", "classif", "segment", "flag", " if ",
+         "otherwise", "else"),
+    ),
+    "date_trunc": (
+        ("date_trunc_expr",),
+        ("hourly", "daily", "weekly", "monthly", "per hour", "per day", "by hour", "by day", "by date",
+         "each hour", "each day", "trend", "over time", "bucket", "trunc"),
+    ),
+    "arithmetic": (
+        ("arithmetic_expr",),
+        ("+", " - ", "/", "ratio", "divid", "plus", "minus", "differen", "percent", "share", "rate",
+         "subtract", "add ", "times"),
+    ),
+    "time_filter": (
+        ("between_time", "time_range"),
+        ("last", "past", "recent", "ago", "since", "between", "before", "after", "today", "yesterday",
+         "hour", "day", "week", "month", "minute", "date", "signup", "signed up", "login", "logged", "joined"),
+    ),
+    "pattern": (
+        ("like_condition",),
+        ("start", "begin", "end", "contain", "like", "match", "domain", "prefix", "suffix", "pattern", "@"),
+    ),
+    "grouping": (
+        ("group_clause", "having_clause"),
+        ("per ", "by ", "each", "group", "breakdown", "break down", "distribution", "having", "across"),
+    ),
+    "ordering": (
+        ("order_clause",),
+        ("order", "sort", "top", "highest", "lowest", "largest", "smallest", "most", "least", "rank",
+         "oldest", "newest", "youngest", "latest", "earliest", "first", "descending", "ascending"),
+    ),
+}
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def prompt_features(question: str) -> FrozenSet[str]:
+    """The intent class of ``question``: the optional grammar features it may need."""
+    q = f" {question.lower()} "
+    return frozenset(name for name, (_, keywords) in PROMPT_FEATURES.items() if any(k in q for k in keywords))
+
+
+@lru_cache(maxsize=256)
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count: words and punctuation marks (no tokenizer dependency)."""
+    return len(_TOKEN_RE.findall(text))
+
+
+@lru_cache(maxsize=256)
+def build_system_prompt(grammar: Grammar, features: Optional[FrozenSet[str]] = None) -> str:
+    """System prompt for ``grammar``; cached per parsed grammar object and intent class.
+
+    With ``features`` (see :func:`prompt_features`) the grammar is pruned to
+    the closed subset those features need; ``None`` keeps every production.
+    Whole productions are included in file order until the budget is reached,
+    so a rule is never cut off mid-definition.
+    """
+    if features is not None:
+        drop = [p for name, (prods, _) in PROMPT_FEATURES.items() if name not in features for p in prods]
+        grammar = prune_grammar(grammar, [p for p in drop if p in grammar.productions])
+    rules = []
+    used = 0
+    for prod in grammar.productions.values():
+        line = prod.render()
+        if used + len(line) + 1 > PROMPT_GRAMMAR_BUDGET:
+            break
+        rules.append(line)
+        used += len(line) + 1
+    return (
+        INSTRUCTION
+        + "\nYou MUST conform to this restricted SQL grammar (subset shown):\n" + "\n".join(rules)
+        + "\nConstraints: only SELECT, table default.MOCK_DATA, no other tables, no DDL, no JOIN."
+        + "\nAllowed columns: " + ", ".join(grammar.columns)
+        + ". Allowed functions: " + ", ".join(grammar.functions) + "."
+    )
+
+
+def system_prompt_for(question: str) -> Tuple[str, int]:
+    """(system prompt, estimated tokens saved against the full grammar) for ``question``."""
+    grammar = get_grammar()
+    prompt = build_system_prompt(grammar, prompt_features(question))
+    saved = estimate_tokens(build_system_prompt(grammar)) - estimate_tokens(prompt)
+    metrics.PROMPT_TOKENS.inc(estimate_tokens(prompt), kind="sent")
+    metrics.PROMPT_TOKENS.inc(saved, kind="saved")
+    return prompt, saved
+
+
+def prompt_stats() -> dict:
+    info = build_system_prompt.cache_info()
+    return {
+        "classes": info.currsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "tokens_sent": int(metrics.PROMPT_TOKENS.value(kind="sent")),
+        "tokens_saved": int(metrics.PROMPT_TOKENS.value(kind="saved")),
+    }
+
+# --- Heuristic translator ---------------------------------------------------------
+#
+# mock_translate carries real traffic whenever the LLM is unavailable, so it is
+# table driven: every pattern is compiled once at import, and each intent lists
+# literal keywords that must be present before its pattern is even tried, so a
+# question that matches nothing costs a few substring tests rather than a dozen
+# regex searches.
+
+TABLE = "default.MOCK_DATA"
+FALLBACK_SQL = f"SELECT count(*) FROM {TABLE}"
+
+_LIMIT_RE = re.compile(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)")
+_WINDOW_RE = re.compile(r"last\s+(\d{1,3})\s+(hour|hours|day|days)")
+
+
+def _limit(q: str) -> str:
+    """`` LIMIT n`` when the question asks for the first/top N rows, else ``""``."""
+    m = _LIMIT_RE.search(q)
+    return f" LIMIT {m.group(2)}" if m else ""
+
+
+def _window(q: str) -> str:
+    """``WHERE signup_date >= subtractHours/Days(now(), n)`` for 'last N hours/days'."""
+    m = _WINDOW_RE.search(q)
+    if not m:
+        return ""
+    func = "subtractHours" if "hour" in m.group(2) else "subtractDays"
+    return f" WHERE signup_date >= {func}(now(), {m.group(1)})"
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    build: Callable[[Optional["re.Match[str]"], str], str]
+    # Every group needs at least one of its keywords in the question (substring
+    # match). For intents with a pattern these are cheap necessary conditions.
+    requires: Tuple[Tuple[str, ...], ...] = ()
+    pattern: Optional["re.Pattern[str]"] = None
+    examples: Tuple[str, ...] = ()
+
+
+# Evaluated in order; the first intent whose keywords and pattern match wins.
+INTENTS: Tuple[Intent, ...] = (
+    Intent(
+        "count_users",
+        lambda m, q: FALLBACK_SQL,
+        requires=(("count", "how many"), ("user", "record", "rows", "entries")),
+        examples=("Count all users", "How many users are there"),
+    ),
+    Intent(
+        "avg_age",
+        lambda m, q: f"SELECT avg(age) FROM {TABLE}",
+        requires=(("average", "avg"), ("age",)),
+        examples=("What is the average age of users?",),
+    ),
+    Intent(
+        "sum_balance",
+        lambda m, q: f"SELECT sum(balance) FROM {TABLE}{_window(q)}",
+        requires=(("sum", "total"), ("balance",)),
+        examples=("Sum total balance in the last 30 hours", "Total balance in the last 7 days"),
+    ),
+    Intent(
+        "active_users",
+        lambda m, q: f"SELECT count(*) FROM {TABLE} WHERE is_active = true",
+        requires=(("active",), ("user",)),
+        examples=("Active users",),
+    ),
+    Intent(
+        "count_by_country",
+        lambda m, q: f"SELECT country, count(*) AS cnt FROM {TABLE} GROUP BY country ORDER BY cnt DESC",
+        requires=(("count", "number"), ("country",), ("per", "by")),
+        examples=("Count per country",),
+    ),
+    Intent(
+        "name_prefix",
+        lambda m, q: f"SELECT * FROM {TABLE} WHERE name ILIKE '{m.group(2).upper()}%'{_limit(q)}",
+        requires=(("name",), ("with",)),
+        pattern=re.compile(r"name\s+(starts|starting|begins)\s+with\s+([a-z])"),
+        examples=("Find all users whose name starts with A", "First 10 users whose name starts with a"),
+    ),
+    Intent(
+        "name_contains",
+        lambda m, q: f"SELECT * FROM {TABLE} WHERE name ILIKE '%{m.group(1)}%'{_limit(q)}",
+        requires=(("contains",),),
+        pattern=re.compile(r"name\s+contains\s+([a-z0-9]+)"),
+        examples=("Find users where name contains ali", "Show 5 users where name contains ali"),
+    ),
+    Intent(
+        "name_suffix",
+        lambda m, q: f"SELECT * FROM {TABLE} WHERE name ILIKE '%{m.group(1)}'{_limit(q)}",
+        requires=(("ends",),),
+        pattern=re.compile(r"name\s+ends\s+with\s+([a-z]+)"),
+        examples=("List users whose name ends with son",),
+    ),
+    Intent(
+        "users_from_country",
+        lambda m, q: f"SELECT * FROM {TABLE} WHERE country = '{m.group(3).upper()}'",
+        requires=(("user",), ("from", "in")),
+        pattern=re.compile(r"(users|user).*\b(from|in)\s+([a-z]{2})\b"),
+        examples=("Show users from US",),
+    ),
+    Intent(
+        "subscription_plan",
+        lambda m, q: f"SELECT * FROM {TABLE} WHERE subscription_plane = '{m.group(4)}'",
+        requires=(("plan",),),
+        pattern=re.compile(r"(subscription\s+plan|plan)(\s+(is|=))?\s+([a-z]+)"),
+        examples=("List users where subscription plan pro",),
+    ),
+    Intent(
+        "email_domain",
+        lambda m, q: f"SELECT * FROM {TABLE} WHERE email ILIKE '%@{m.group(3)}'",
+        requires=(("email",), ("domain",)),
+        pattern=re.compile(r"email(s)?\s+(with|having)?\s*domain\s+([a-z0-9\.-]+)"),
+        examples=("Emails with domain gmail.com",),
+    ),
+    Intent(
+        "first_n",
+        lambda m, q: f"SELECT * FROM {TABLE} LIMIT {m.group(2)}",
+        requires=(("first", "top", "show"), ("user", "rows", "records")),
+        pattern=_LIMIT_RE,
+        examples=("Show the first 5 users",),
+    ),
+    Intent(
+        "recent_signups",
+        lambda m, q: f"SELECT count(*) FROM {TABLE} WHERE signup_date >= subtractDays(now(), 7)",
+        requires=(("recent", "last week"), ("signup", "sign ups")),
+        examples=("Recent signups",),
+    ),
+    Intent(
+        "avg_balance_by_plan",
+        lambda m, q: (
+            f"SELECT subscription_plane, avg(balance) AS avg_balance FROM {TABLE} "
+            "GROUP BY subscription_plane ORDER BY avg_balance DESC"
+        ),
+        requires=(("average", "avg"), ("balance",), ("plan", "subscription")),
+        examples=("Avg balance per plan",),
+    ),
+)
+
+# Flattened once so the hot loop avoids attribute lookups.
+_TABLE = tuple((intent.requires, intent.pattern, intent.build) for intent in INTENTS)
+
 
 def mock_translate(nl: str) -> str:
     """Heuristic NL -> SQL for the MOCK_DATA table matching our restricted grammar.
 
-    Supports a handful of analytic intents so the frontend + eval harness work
-    without a real model. All outputs MUST conform to grammar constraints:
+    Supports the analytic intents in ``INTENTS`` so the frontend + eval harness
+    work without a real model. All outputs MUST conform to grammar constraints:
       - Only references table default.MOCK_DATA
       - Uses allowed aggregates / columns
     """
     q = nl.lower()
-
-    # Count users
-    if ("count" in q or "how many" in q) and ("user" in q or "record" in q or "rows" in q or "entries" in q):
-        return "SELECT count(*) FROM default.MOCK_DATA"
-
-    # Average age
-    if ("average" in q or "avg" in q) and "age" in q:
-        return "SELECT avg(age) FROM default.MOCK_DATA"
-
-    # Sum / total balance
-    if ("sum" in q or "total" in q) and ("balance" in q or "balances" in q):
-        # Normalize time window phrases to ClickHouse syntax using subtractHours/Days(now())
-        import re
-        # Match 'last N hours' or 'last N days'
-        m = re.search(r"last\s+(\d{1,3})\s+(hour|hours|day|days)", q)
-        if m:
-            n = m.group(1)
-            unit = m.group(2)
-            if 'hour' in unit:
-                return f"SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractHours(now(), {n})"
+    for requires, pattern, build in _TABLE:
+        for group in requires:
+            for keyword in group:
+                if keyword in q:
+                    break
             else:
-                return f"SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractDays(now(), {n})"
-        return "SELECT sum(balance) FROM default.MOCK_DATA"
-
-    # Active users count
-    if ("active" in q and ("users" in q or "user" in q)) or "active user" in q:
-        return "SELECT count(*) FROM default.MOCK_DATA WHERE is_active = true"
-
-    # Group by country counts
-    if ("count" in q or "number" in q) and "country" in q and ("per" in q or "by" in q):
-        return "SELECT country, count(*) AS cnt FROM default.MOCK_DATA GROUP BY country ORDER BY cnt DESC"
-
-    # Pattern-related heuristics
-    import re
-
-    # Name starts with letter pattern
-    m = re.search(r"name\s+(starts|starting|begins)\s+with\s+([a-z])", q)
-    if m:
-        letter = m.group(2).upper()
-        limit_m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
-        if limit_m:
-            n = limit_m.group(2)
-            return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '{letter}%' LIMIT {n}"
-        return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '{letter}%'"
-
-    # Name contains substring
-    m = re.search(r"name\s+contains\s+([a-z0-9]+)", q)
-    if m:
-        part = m.group(1)
-        limit_m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
-        if limit_m:
-            n = limit_m.group(2)
-            return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{part}%' LIMIT {n}"
-        return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{part}%'"
-
-    # Name ends with letter(s)
-    m = re.search(r"name\s+ends\s+with\s+([a-z]+)", q)
-    if m:
-        suffix = m.group(1)
-        limit_m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
-        if limit_m:
-            n = limit_m.group(2)
-            return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{suffix}' LIMIT {n}"
-        return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{suffix}'"
-
-    # Users from a specific country (phrases: users from US / users in US / country = US)
-    m = re.search(r"(users|user).*\b(from|in)\s+([a-z]{2})\b", q)
-    if m:
-        country = m.group(3).upper()
-        return f"SELECT * FROM default.MOCK_DATA WHERE country = '{country}'"
-
-    # Filter by subscription plan
-    # Subscription plan words often appear like: subscription plan pro / plan is pro / plan = pro
-    m = re.search(r"(subscription\s+plan|plan)(\s+(is|=))?\s+([a-z]+)", q)
-    if m:
-        plan = m.group(4)
-        return f"SELECT * FROM default.MOCK_DATA WHERE subscription_plane = '{plan}'"
-
-    # Email domain queries: emails with domain gmail.com
-    m = re.search(r"email(s)?\s+(with|having)?\s*domain\s+([a-z0-9\.-]+)", q)
-    if m:
-        domain = m.group(3)
-        return f"SELECT * FROM default.MOCK_DATA WHERE email ILIKE '%@{domain}'"
-
-    # LIMIT detection (show first 10 users)
-    m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
-    if m:
-        n = m.group(2)
-        # Basic list projection with LIMIT
-        return f"SELECT * FROM default.MOCK_DATA LIMIT {n}"
-
-    # Recent signups (default to last 7 days)
-    if ("recent" in q or "last week" in q) and ("signup" in q or "sign ups" in q or "signups" in q):
-        return "SELECT count(*) FROM default.MOCK_DATA WHERE signup_date >= subtractDays(now(), 7)"
-
-    # Average balance by subscription plan
-    if ("average" in q or "avg" in q) and ("balance" in q) and ("plan" in q or "subscription" in q):
-        return "SELECT subscription_plane, avg(balance) AS avg_balance FROM default.MOCK_DATA GROUP BY subscription_plane ORDER BY avg_balance DESC"
-
-    # Fallback
-    return "SELECT count(*) FROM default.MOCK_DATA"
+                break
+        else:
+            if pattern is None:
+                return build(None, q)
+            m = pattern.search(q)
+            if m is not None:
+                return build(m, q)
+    return FALLBACK_SQL
+
+
+class Translation(NamedTuple):
+    sql: str
+    mocked: bool
+    cached: bool = False
+
+
+def _use_mock() -> bool:
+    settings = get_settings()
+    # Mock mode or missing API key => fallback
+    return settings.mock_mode or not settings.openai_api_key
+
+
+def _cache_key(nl_query: str) -> str:
+    return cache_key(nl_query, get_settings().openai_model, get_grammar().digest)
+
+
+def _namespace() -> str:
+    """Model and grammar a paraphrase-cache entry is valid for."""
+    return f"{get_settings().openai_model}\x00{get_grammar().digest}"
+
+
+def _from_cache(nl_query: str, key: str) -> Optional[Translation]:
+    """The cached translation, else a cached paraphrase refilled with this question's literals."""
+    cache = get_translation_cache()
+    sql = cache.get(key)
+    if sql is not None:
+        metrics.LLM_CALLS_AVOIDED.inc(cache="exact")
+        return Translation(sql, False, cached=True)
+    hit = get_semantic_cache().lookup(nl_query, _namespace())
+    if hit is None:
+        return None
+    metrics.LLM_CALLS_AVOIDED.inc(cache="semantic")
+    logger.debug("Paraphrase cache hit", extra={"similarity": hit.similarity, "paraphrase_of": hit.question})
+    cache.put(key, hit.sql)
+    return Translation(hit.sql, False, cached=True)
+
+
+def _remember(nl_query: str, key: str, sql: str) -> None:
+    get_translation_cache().put(key, sql)
+    get_semantic_cache().add(nl_query, sql, _namespace())
+
+
+async def _afrom_cache(nl_query: str, key: str) -> Optional[Translation]:
+    if get_translation_cache().has_disk_tier:  # SQLite reads must not block the event loop
+        return await run_blocking(_from_cache, nl_query, key)
+    return _from_cache(nl_query, key)
+
+
+async def _aremember(nl_query: str, key: str, sql: str) -> None:
+    if get_translation_cache().has_disk_tier:
+        await run_blocking(_remember, nl_query, key, sql)
+    else:
+        _remember(nl_query, key, sql)
+
+
+def _llm_breaker() -> CircuitBreaker:
+    """The LLM circuit breaker, or :class:`LLMQuotaExceeded` while it is open."""
+    breaker = get_llm_breaker()
+    if not breaker.allow():
+        metrics.LLM_BREAKER_REJECTIONS.inc()
+        raise LLMQuotaExceeded(
+            f"LLM calls paused after repeated quota errors; next attempt in {breaker.retry_after():.0f}s"
+        )
+    return breaker
+
+
+def _past_deadline(nl_query: str, deadline: float) -> Translation:
+    if get_settings().llm_hedge:
+        metrics.LLM_DEADLINES.inc(action="hedged")
+        logger.warning("LLM missed the deadline; answering with the heuristic", extra={"deadline": deadline})
+        return Translation(mock_translate(nl_query), True)
+    metrics.LLM_DEADLINES.inc(action="timeout")
+    raise LLMTimeout(f"LLM did not answer within {deadline:g}s")
+
+
+def translate(nl_query: str) -> Translation:
+    """Translate ``nl_query`` to SQL, serving repeated and paraphrased questions from the cache."""
+    if _use_mock():
+        return Translation(mock_translate(nl_query), True)
+
+    key = _cache_key(nl_query)
+    cached = _from_cache(nl_query, key)
+    if cached is not None:
+        return cached
+
+    def run() -> Tuple[str, bool]:
+        breaker = _llm_breaker()
+        try:
+            sql, mocked = _llm_translate(nl_query)
+        except LLMQuotaExceeded:
+            breaker.failure()
+            raise
+        if not mocked:  # heuristic fallbacks are cheap and must not shadow a later LLM answer
+            breaker.success()  # only an actual LLM answer closes a half-open breaker
+            _remember(nl_query, key, sql)
+        return sql, mocked
+
+    # Identical questions already being translated share that LLM call.
+    return Translation(*singleflight.translations.call(key, run))
+
+
+async def atranslate(nl_query: str) -> Translation:
+    """Async :func:`translate`: the LLM call never blocks the event loop.
+
+    A translation that takes longer than ``llm_deadline`` is answered by the
+    heuristic (``llm_hedge``) or :class:`LLMTimeout`; the LLM call keeps
+    running in the background and caches its answer for the next request.
+    """
+    if _use_mock():
+        return Translation(mock_translate(nl_query), True)
+
+    key = _cache_key(nl_query)
+    cached = await _afrom_cache(nl_query, key)
+    if cached is not None:
+        return cached
+
+    async def run() -> Tuple[str, bool]:
+        breaker = _llm_breaker()
+        try:
+            async with limiter("llm", get_settings().llm_concurrency):
+                sql, mocked = await _allm_translate(nl_query)
+        except LLMQuotaExceeded:
+            breaker.failure()
+            raise
+        if not mocked:
+            breaker.success()
+            await _aremember(nl_query, key, sql)
+        return sql, mocked
+
+    # The shared call runs as its own task, so timing out here does not cancel it.
+    shared = singleflight.translations.acall(key, run)
+    deadline = get_settings().llm_deadline
+    if deadline <= 0:
+        return Translation(*await shared)
+    try:
+        return Translation(*await asyncio.wait_for(shared, deadline))
+    except asyncio.TimeoutError:
+        return _past_deadline(nl_query, deadline)
+
 
 def nl_to_sql(nl_query: str) -> Tuple[str, bool]:
+    t = translate(nl_query)
+    return t.sql, t.mocked
+
+
+def _chat_request(nl_query: str) -> dict:
     settings = get_settings()
-    grammar = load_grammar_text(settings.grammar_path)
+    # Grammar is parsed once by the registry; the prompt is cached per grammar
+    # version and intent class, pruned to the productions the question needs.
+    with stage("grammar"):
+        system_msg, saved = system_prompt_for(nl_query)
+    logger.debug(
+        "Dispatching LLM request",
+        extra={"system_len": len(system_msg), "prompt_tokens_saved": saved, "query_len": len(nl_query)},
+    )
+    return dict(
+        model=settings.openai_model,
+        messages=[{"role": "system", "content": system_msg}, {"role": "user", "content": nl_query}],
+        temperature=1,
+        max_completion_tokens=1024,
+        response_format={"type": "text"},
+    )
 
-    # Mock mode or missing API key => fallback
-    if settings.mock_mode or not settings.openai_api_key:
-        return mock_translate(nl_query), True
 
-    logger = logging.getLogger("cfg_evals.nl_to_sql")
+def _accept_completion(chat) -> Tuple[str, bool]:
+    sql = chat.choices[0].message.content or ""
+    try:
+        return validate_sql(sql), False
+    except Exception as ve:
+        logger.warning("Validation failed; raising for outer handler", extra={"error": str(ve)})
+        raise
+
+
+def _handle_llm_error(e: Exception, nl_query: str) -> Tuple[str, bool]:
+    # Inspect for quota error signature
+    msg = str(e)
+    if 'insufficient_quota' in msg or 'You exceeded your current quota' in msg or '429' in msg:
+        metrics.LLM_QUOTA_ERRORS.inc()
+        raise LLMQuotaExceeded(msg)
+    metrics.LLM_FALLBACKS.inc(reason="invalid_sql" if isinstance(e, SqlSyntaxError) else "error")
+    logger.exception("LLM path failed; falling back to heuristic", extra={"error": msg})
+    return mock_translate(nl_query), True
+
+
+def _delta(chunk) -> str:
+    return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+
+def _stream_sql(stream) -> str:
+    """SQL from a streamed completion, closing the stream as soon as the outcome is known."""
+    check = StreamingSqlCheck()
+    with stream:
+        try:
+            for chunk in stream:
+                sql = check.feed(_delta(chunk))
+                if sql is not None:
+                    metrics.LLM_STREAMS.inc(result="stopped")
+                    return sql
+            sql = check.finish()
+        except SqlSyntaxError:
+            metrics.LLM_STREAMS.inc(result="aborted")
+            raise
+    metrics.LLM_STREAMS.inc(result="ended")
+    return sql
+
+
+async def _astream_sql(stream) -> str:
+    check = StreamingSqlCheck()
+    async with stream:
+        try:
+            async for chunk in stream:
+                sql = check.feed(_delta(chunk))
+                if sql is not None:
+                    metrics.LLM_STREAMS.inc(result="stopped")
+                    return sql
+            sql = check.finish()
+        except SqlSyntaxError:
+            metrics.LLM_STREAMS.inc(result="aborted")
+            raise
+    metrics.LLM_STREAMS.inc(result="ended")
+    return sql
+
+
+def _retry_aborted(e: SqlSyntaxError, attempt: int) -> None:
+    """Re-raise ``e`` once the stream retries are used up."""
+    if attempt >= get_settings().llm_stream_retries:
+        raise e
+    logger.info("LLM stream aborted; retrying", extra={"error": str(e), "attempt": attempt + 1})
+
+
+def _llm_translate(nl_query: str) -> Tuple[str, bool]:
     logger.debug("Attempting LLM translation", extra={"query_preview": nl_query[:120]})
 
     # Real call (updated) - emulate grammar constraints via prompt since API does not support direct 'grammar' param.
     try:
-        from openai import OpenAI  # lazy import; adjust if different package name
-        client = OpenAI(api_key=settings.openai_api_key)
-        # Embed a truncated grammar segment (to keep token usage low) for model guidance.
-        truncated_grammar = '\n'.join(
-            line for line in grammar.splitlines() if line.strip() and not line.strip().startswith('#')
-        )[:2000]
-        system_msg = (
-            INSTRUCTION
-            + "\nYou MUST conform to this restricted SQL grammar (subset shown):\n" + truncated_grammar
-            + "\nConstraints: only SELECT, table default.MOCK_DATA, no other tables, no DDL, no JOIN."
-        )
+        client = get_llm_client()  # shared keep-alive connection pool
+        request = _chat_request(nl_query)
+        if not get_settings().llm_stream:
+            with stage("llm"):
+                chat = client.chat.completions.create(**request)
+            return _accept_completion(chat)
+        attempt = 0
+        while True:
+            try:
+                with stage("llm"):
+                    return _stream_sql(client.chat.completions.create(**request, stream=True)), False
+            except SqlSyntaxError as e:
+                _retry_aborted(e, attempt)
+                attempt += 1
+    except Exception as e:
+        return _handle_llm_error(e, nl_query)
 
-        def validate_sql(candidate: str) -> str:
-            c = candidate.strip().rstrip(';')
-            lc = c.lower()
-            if not lc.startswith('select '):
-                raise ValueError('Not a SELECT')
-            if 'mock_data' not in lc:
-                raise ValueError('Missing table reference')
-            forbidden = [' insert ', ' update ', ' delete ', ' drop ', ' alter ', ' truncate ', ' optimize ']
-            if any(f in (' ' + lc + ' ') for f in forbidden):
-                raise ValueError('Disallowed keyword detected')
-            return c
-
-        logger.debug(
-            "Dispatching LLM request", extra={"system_len": len(system_msg), "query_len": len(nl_query)}
-        )
 
-        chat = client.chat.completions.create(
-            model=settings.openai_model,
-            messages=[{"role": "system", "content": system_msg}, {"role": "user", "content": nl_query}],
-            temperature=1,
-            max_completion_tokens=1024,
-            response_format={"type": "text"},
-        )
-        sql = chat.choices[0].message.content or ""
-        try:
-            sql_validated = validate_sql(sql)
-            return sql_validated, False
-        except Exception as ve:
-            logger.warning("Validation failed; raising for outer handler", extra={"error": str(ve)})
-            raise
+async def _allm_translate(nl_query: str) -> Tuple[str, bool]:
+    logger.debug("Attempting async LLM translation", extra={"query_preview": nl_query[:120]})
+    try:
+        client = get_async_llm_client()
+        request = _chat_request(nl_query)
+        if not get_settings().llm_stream:
+            with stage("llm"):
+                chat = await client.chat.completions.create(**request)
+            return _accept_completion(chat)
+        attempt = 0
+        while True:
+            try:
+                with stage("llm"):
+                    return await _astream_sql(await client.chat.completions.create(**request, stream=True)), False
+            except SqlSyntaxError as e:
+                _retry_aborted(e, attempt)
+                attempt += 1
     except Exception as e:
-        # Inspect for quota error signature
-        msg = str(e)
-        if 'insufficient_quota' in msg or 'You exceeded your current quota' in msg or '429' in msg:
-            raise LLMQuotaExceeded(msg)
-        logger.exception("LLM path failed; falling back to heuristic", extra={"error": msg})
-        return mock_translate(nl_query), True
+        return _handle_llm_error(e, nl_query)
@@ -0,0 +1,192 @@
+"""Keyset pagination for row listings (``page_size`` on ``/nl-query``, ``/nl-query/next``).
+
+A page is the listing restricted to ids after the last one already returned
+and ordered by ``id``, the table's sort key::
+
+    SELECT * FROM default.MOCK_DATA WHERE (country = 'US') AND id > 5012 ORDER BY id LIMIT 51
+
+ClickHouse reads that as a primary key range, so every page costs the same
+however deep the client goes (no OFFSET). One extra row is fetched to tell
+whether another page follows.
+
+The cursor is opaque to clients. It holds the validated SQL, the last id, the
+page size and, for a listing with its own LIMIT, the rows still owed. It is
+signed with HMAC-SHA256 under ``CURSOR_SECRET``. When that is unset a random
+per-process key is used, so cursors then only work on the process that issued
+them. Following a cursor needs no translation. Listings that aggregate, use
+``LIMIT offset, n`` or order by anything but ``id`` are not paginated.
+"""
+from __future__ import annotations
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+from typing import Any, List, Optional, Tuple
+from app.config import get_settings
+from app.services.result_formats import ColumnarResult
+from app.services.sql_parser import Node, SqlSyntaxError, Token, get_parser, validate_sql
+
+CURSOR_VERSION = 1
+_PROCESS_KEY = secrets.token_bytes(32)
+
+
+class InvalidCursor(ValueError):
+    """The cursor is malformed, was signed with another key, or was altered."""
+
+
+def _nodes(node: Node) -> List[Node]:
+    return [c for c in node.children if isinstance(c, Node)]
+
+
+def _key() -> bytes:
+    secret = get_settings().cursor_secret
+    return secret.encode() if secret else _PROCESS_KEY
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def encode_cursor(sql: str, after: int, size: int, remaining: Optional[int]) -> str:
+    payload = json.dumps([CURSOR_VERSION, sql, after, size, remaining], separators=(",", ":")).encode()
+    signature = hmac.new(_key(), payload, hashlib.sha256).digest()
+    return f"{_b64encode(payload)}.{_b64encode(signature)}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int, Optional[int]]:
+    """(sql, last id, page size, rows still owed) from a cursor made by :func:`encode_cursor`."""
+    try:
+        payload_text, signature_text = cursor.split(".")
+        payload, signature = _b64decode(payload_text), _b64decode(signature_text)
+    except (ValueError, binascii.Error):
+        raise InvalidCursor("Malformed cursor") from None
+    if not hmac.compare_digest(signature, hmac.new(_key(), payload, hashlib.sha256).digest()):
+        raise InvalidCursor("Cursor signature does not match")
+    try:
+        version, sql, after, size, remaining = json.loads(payload)
+    except ValueError:
+        raise InvalidCursor("Malformed cursor") from None
+    if version != CURSOR_VERSION:
+        raise InvalidCursor(f"Unsupported cursor version {version!r}")
+    return sql, after, size, remaining
+
+
+class Page:
+    """One page of a listing. Quacks like :class:`~app.services.guardrails.GuardedQuery`.
+
+    :meth:`trim` cuts the fetched rows to the page and sets ``next_cursor``
+    (None on the last page).
+    """
+
+    def __init__(
+        self, base_sql: str, select: str, table: str, condition: Optional[str], hidden_id: bool,
+        size: int, after: Optional[int], remaining: Optional[int],
+    ):
+        self.base_sql = base_sql
+        self.size = size if remaining is None else min(size, remaining)
+        self.page_size = size
+        self.remaining = remaining
+        self.hidden_id = hidden_id
+        self.next_cursor: Optional[str] = None
+        conditions = []
+        if condition is not None:
+            conditions.append(condition if after is None else f"({condition})")
+        if after is not None:
+            conditions.append(f"id > {int(after)}")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        head = f"SELECT {select}{', id' if hidden_id else ''} FROM {table}{where} ORDER BY id LIMIT "
+        self.sql = f"{head}{self.size}"
+        # The rows the listing's own LIMIT still owes may end with this page.
+        last = remaining is not None and remaining <= size
+        self.execute_sql = self.sql if last else f"{head}{self.size + 1}"
+
+    def trim(self, result: Any) -> Tuple[Any, bool]:
+        """Cut ``result`` (rows, columnar result or Arrow table) to the page; never reports truncation."""
+        if isinstance(result, ColumnarResult):
+            n = len(result.data[0]) if result.data else 0
+            result = ColumnarResult(result.columns, [c[:self.size] for c in result.data])
+            position = result.columns.index("id")
+            last_id = result.data[position][-1] if n else None
+            if self.hidden_id:
+                result = ColumnarResult(
+                    result.columns[:position] + result.columns[position + 1:],
+                    result.data[:position] + result.data[position + 1:],
+                )
+        elif hasattr(result, "num_rows"):  # pyarrow.Table
+            n = result.num_rows
+            result = result.slice(0, self.size)
+            last_id = result.column("id")[-1].as_py() if n else None
+            if self.hidden_id:
+                result = result.remove_column(result.schema.get_field_index("id"))
+        else:
+            n = len(result)
+            result = result[:self.size]
+            last_id = result[-1]["id"] if n else None
+            if self.hidden_id:
+                result = [{k: v for k, v in row.items() if k != "id"} for row in result]
+        if n > self.size:
+            remaining = None if self.remaining is None else self.remaining - self.size
+            self.next_cursor = encode_cursor(self.base_sql, int(last_id), self.page_size, remaining)
+        return result, False
+
+
+def first_page(sql: str, size: int) -> Optional[Page]:
+    """First page of grammar-valid ``sql``, or None when it is not a listing that can be paginated."""
+    return _page(sql, size, None, None)
+
+
+def next_page(cursor: str) -> Page:
+    """The page a cursor from :attr:`Page.next_cursor` points at; raises :class:`InvalidCursor`."""
+    sql, after, size, remaining = decode_cursor(cursor)
+    if not isinstance(after, int) or not isinstance(size, int) or size < 1:
+        raise InvalidCursor("Malformed cursor")
+    page = _page(sql, size, after, remaining)
+    if page is None:
+        raise InvalidCursor("Cursor does not refer to a paginated listing")
+    return page
+
+
+def _page(sql: str, size: int, after: Optional[int], remaining: Optional[int]) -> Optional[Page]:
+    try:
+        text = validate_sql(sql)
+    except SqlSyntaxError:
+        return None
+    stmt = get_parser().parse(text).find("select_stmt")
+    clauses = {c.name: c for c in _nodes(stmt)}
+    select_list = clauses["select_list"]
+    if {"group_clause", "having_clause"} & set(clauses) or select_list.find("aggregate_expr") is not None:
+        return None
+    order = clauses.get("order_clause")
+    if order is not None:
+        if " ".join(t.text.lower() for t in order.find("order_list").tokens()) not in ("id", "id asc"):
+            return None
+    limit = clauses.get("limit_clause")
+    if limit is not None:
+        numbers = _nodes(limit)
+        if len(numbers) != 1:
+            return None
+        owed = int(text[numbers[0].start:numbers[0].end])
+        remaining = owed if remaining is None else remaining
+    if any(text[a.start:a.end] == "id" for a in select_list.iter("alias")):
+        return None
+    # ``*`` or a bare ``id`` already returns the key the next cursor needs.
+    has_id = any(
+        isinstance(p.children[0], Token) or (p.children[0].name == "column_ref" and text[p.start:p.end] == "id")
+        for p in _nodes(select_list)
+    )
+    where = clauses.get("where_clause")
+    condition = None
+    if where is not None:
+        condition = where.find("or_expr")
+        condition = text[condition.start:condition.end]
+    table = clauses["table_name"]
+    return Page(
+        text, text[select_list.start:select_list.end], text[table.start:table.end], condition,
+        not has_id, size, after, remaining,
+    )
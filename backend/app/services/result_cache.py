@@ -0,0 +1,180 @@
+"""Query result cache for execute_sql.
+
+Entries are keyed by canonical SQL (see ``canonicalize_sql``), bounded by an
+approximate memory budget in bytes and expire after a TTL chosen by query
+shape: aggregates change slowly and are cheap to keep, row listings are large
+and are kept briefly. An optional table-version probe (row count / last part
+modification) clears the cache when the underlying table changes.
+"""
+from __future__ import annotations
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from app.config import get_settings
+from app.services.sql_parser import SqlSyntaxError, get_parser
+
+Rows = List[Dict[str, Any]]
+
+# Rows sampled when estimating the in-memory size of a result.
+_SIZE_SAMPLE = 32
+
+
+def _list_size(values: list) -> int:
+    if not values:
+        return sys.getsizeof(values)
+    sample = values[:_SIZE_SAMPLE]
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in sample) * len(values) // len(sample)
+
+
+def estimate_size(rows: Any) -> int:
+    """Approximate bytes held by a cached result (extrapolated from a sample).
+
+    Handles row dicts, columnar results (``(names, columns)`` tuples) and
+    objects that report ``nbytes`` (Arrow tables).
+    """
+    nbytes = getattr(rows, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(rows, tuple):
+        names, columns = rows
+        return sys.getsizeof(rows) + _list_size(list(names)) + sum(_list_size(c) for c in columns)
+    if not rows:
+        return sys.getsizeof(rows)
+    sample = rows[:_SIZE_SAMPLE]
+    per_row = 0
+    for row in sample:
+        per_row += sys.getsizeof(row)
+        for k, v in row.items():
+            per_row += sys.getsizeof(k) + sys.getsizeof(v)
+    return sys.getsizeof(rows) + per_row * len(rows) // len(sample)
+
+
+def query_shape(sql: str) -> str:
+    """``"aggregate"`` for queries with aggregates / GROUP BY, else ``"rows"``."""
+    try:
+        tree = get_parser().parse(sql.strip())
+    except SqlSyntaxError:
+        return "rows"
+    if tree.find("group_clause") is not None or tree.find("aggregate_expr") is not None:
+        return "aggregate"
+    return "rows"
+
+
+class ResultCache:
+    """LRU result cache bounded by bytes, with per-shape TTLs."""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttls: Optional[Dict[str, float]] = None,
+        version_probe: Optional[Callable[[], Hashable]] = None,
+        version_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {"aggregate": 30.0, "rows": 5.0}
+        self.version_probe = version_probe
+        self.version_interval = version_interval
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version: Optional[Hashable] = None
+        self._version_checked = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        self._check_version()
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                rows, size, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(rows) if isinstance(rows, list) else rows
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: str, rows: Any, shape: str = "rows") -> None:
+        """Cache ``rows`` (a list of row dicts, or an immutable columnar / Arrow result)."""
+        ttl = self.ttls.get(shape, 0.0)
+        if ttl <= 0:
+            return
+        size = estimate_size(rows)
+        if size > self.max_bytes:
+            return  # would evict everything else and still not fit
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (list(rows) if isinstance(rows, list) else rows, size, self._clock() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop one entry, or everything when ``key`` is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif key in self._entries:
+                self._drop(key)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_version(self) -> None:
+        if self.version_probe is None:
+            return
+        now = self._clock()
+        if now - self._version_checked < self.version_interval:
+            return
+        self._version_checked = now
+        try:
+            version = self.version_probe()
+        except Exception:
+            return  # probe failures must never break query execution
+        if self._version is not None and version != self._version:
+            self.invalidate()
+        self._version = version
+
+
+@lru_cache
+def get_result_cache() -> ResultCache:
+    settings = get_settings()
+    probe = None
+    if settings.result_cache_version_check:
+        from app.services.clickhouse_client import table_version  # avoid import cycle
+        probe = table_version
+    return ResultCache(
+        max_bytes=settings.result_cache_max_bytes,
+        ttls={"aggregate": settings.result_cache_ttl_aggregate, "rows": settings.result_cache_ttl_rows},
+        version_probe=probe,
+        version_interval=settings.result_cache_version_interval,
+    )
@@ -0,0 +1,65 @@
+"""Response encodings for /nl-query.
+
+* ``rows``: list of row dicts (default, unchanged response model);
+* ``columnar``: ``{"columns": [...], "data": [[...], ...]}`` with one list per
+  column, so names are not repeated per row;
+* ``arrow``: Apache Arrow IPC stream. Real mode fetches ClickHouse's Arrow
+  output directly (``query_arrow``) and the mock engine hands over its NumPy
+  arrays, so no Python row objects are built.
+
+pyarrow is imported lazily; without it only the JSON formats are available.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+FORMATS = ("rows", "columnar", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.cfg-evals.columnar+json"
+_ACCEPT = {ARROW_MEDIA_TYPE: "arrow", COLUMNAR_MEDIA_TYPE: "columnar", "application/json": "rows"}
+
+
+class FormatUnavailable(RuntimeError):
+    """The requested format needs an optional dependency that is not installed."""
+
+
+class ColumnarResult(NamedTuple):
+    columns: List[str]
+    data: List[list]
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """Explicit ``format`` wins, then the first recognized ``Accept`` media type, else ``rows``."""
+    if requested:
+        return requested
+    for part in (accept or "").split(","):
+        media_type = part.split(";", 1)[0].strip().lower()
+        if media_type in _ACCEPT:
+            return _ACCEPT[media_type]
+    return "rows"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as e:  # pragma: no cover - depends on the environment
+        raise FormatUnavailable("Arrow responses need pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def arrow_table(names: Sequence[str], arrays: Sequence[Any]):
+    """pyarrow.Table from NumPy columns (NaN floats become nulls)."""
+    pa = _pyarrow()
+    columns = [pa.array(a, from_pandas=True) for a in arrays]
+    return pa.Table.from_arrays(columns, names=list(names))
+
+
+def arrow_ipc(table, metadata: Optional[Dict[str, str]] = None) -> bytes:
+    """Serialize ``table`` as an Arrow IPC stream, attaching ``metadata`` to the schema."""
+    pa = _pyarrow()
+    if metadata:
+        table = table.replace_schema_metadata({k: str(v) for k, v in metadata.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,302 @@
+"""Pre-aggregated rollups of ``default.MOCK_DATA`` and the query rewriter that uses them.
+
+The aggregate shapes ``mock_translate`` emits (count per country, average
+balance per plan, active user count, balance over the last N hours/days) all
+scan the base table in full. Two rollups, kept current by ClickHouse
+materialized views created in ``scripts/init_clickhouse.py``, answer them from
+a few hundred rows:
+
+* ``DIMS``: row count and balance / age sums per (country, plan, is_active).
+  Serves GROUP BY queries on those columns, WHERE filters on them, and count,
+  sum and avg (sum / count) of balance and age.
+* ``HOURLY``: row count and balance sum per signup hour. Serves
+  ``count(*)`` / ``sum(balance)`` with ``WHERE signup_date >= subtractHours(now(), N)``
+  (or Days / Minutes). Whole hours come from the rollup. The hour the window
+  starts in is read from the base table, whose ``signup_order`` projection
+  makes that a range read. The answer is exact.
+
+Both targets are SummingMergeTree tables, whose parts are only summed in the
+background, so rewritten queries always re-aggregate (``sum(row_count)``).
+
+:func:`rewrite` runs after the safety check and the result cache lookup (see
+``clickhouse_client``): the cache stays keyed by the original SQL, and the
+rewritten SQL, which names tables the grammar does not admit, is never shown
+to the grammar. ``QUERY_ROLLUPS=false`` turns it off. In mock mode the engine
+materializes the same rollups in memory (``MockEngine.rollup_table``), so the
+tests check rewritten results against the originals.
+"""
+from __future__ import annotations
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from app.config import get_settings
+from app.services import metrics
+from app.services.sql_parser import Node, SqlSyntaxError, Token, get_parser, validate_sql
+
+BASE_TABLE = "default.MOCK_DATA"
+_WRAPPERS = frozenset({"projection", "arithmetic_expr", "arithmetic_term", "numeric_leaf", "having_metric"})
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_BUCKETS = {"hour": "toStartOfHour"}
+
+
+@dataclass(frozen=True)
+class Key:
+    name: str
+    type: str
+    column: str  # MOCK_DATA column the key is taken from
+    bucket: Optional[str] = None  # time truncation ("hour") applied to ``column``
+
+    @property
+    def expression(self) -> str:
+        return f"{_BUCKETS[self.bucket]}({self.column})" if self.bucket else self.column
+
+
+@dataclass(frozen=True)
+class Measure:
+    name: str
+    type: str
+    func: str  # "count" or "sum"
+    column: str = "*"  # summed MOCK_DATA column
+
+    @property
+    def expression(self) -> str:
+        return "count()" if self.func == "count" else f"sum({self.column})"
+
+
+@dataclass(frozen=True)
+class Rollup:
+    name: str
+    table: str
+    keys: Tuple[Key, ...]
+    measures: Tuple[Measure, ...]
+
+    @property
+    def view(self) -> str:
+        return f"{self.table}_mv"
+
+    def measure(self, func: str, column: str) -> Optional[Measure]:
+        """The stored measure a ``count`` / ``sum`` over ``column`` adds up, if any."""
+        for m in self.measures:
+            if m.func == func and (func == "count" or m.column == column):
+                return m
+        return None
+
+    def select_sql(self) -> str:
+        keys = ", ".join(k.expression if k.expression == k.name else f"{k.expression} AS {k.name}" for k in self.keys)
+        measures = ", ".join(f"{m.expression} AS {m.name}" for m in self.measures)
+        return f"SELECT {keys}, {measures} FROM {BASE_TABLE} GROUP BY {', '.join(k.name for k in self.keys)}"
+
+    def ddl(self) -> List[str]:
+        """Target table and the materialized view feeding it (both IF NOT EXISTS)."""
+        columns = ",\n  ".join(f"{c.name} {c.type}" for c in (*self.keys, *self.measures))
+        return [
+            f"CREATE TABLE IF NOT EXISTS {self.table} (\n  {columns}\n) "
+            f"ENGINE = SummingMergeTree ORDER BY ({', '.join(k.name for k in self.keys)})",
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {self.view} TO {self.table} AS {self.select_sql()}",
+        ]
+
+    def backfill_sql(self) -> str:
+        """Aggregates rows inserted before the view existed."""
+        return f"INSERT INTO {self.table} {self.select_sql()}"
+
+
+_ROW_COUNT = Measure("row_count", "UInt64", "count")
+_BALANCE_SUM = Measure("balance_sum", "Int64", "sum", "balance")
+
+DIMS = Rollup(
+    "dims",
+    f"{BASE_TABLE}_dims",
+    keys=(
+        Key("country", "String", "country"),
+        Key("subscription_plane", "String", "subscription_plane"),
+        Key("is_active", "Bool", "is_active"),
+    ),
+    measures=(_ROW_COUNT, _BALANCE_SUM, Measure("age_sum", "Int64", "sum", "age")),
+)
+HOURLY = Rollup(
+    "signups_hourly",
+    f"{BASE_TABLE}_signups_hourly",
+    keys=(Key("hour", "DateTime", "signup_date", bucket="hour"),),
+    measures=(_ROW_COUNT, _BALANCE_SUM),
+)
+ROLLUPS: Tuple[Rollup, ...] = (DIMS, HOURLY)
+
+# Normal projection on the base table: rows sorted by signup time, so the
+# partial first hour of a HOURLY window is a range read.
+PROJECTIONS: Dict[str, str] = {"signup_order": "SELECT signup_date, balance ORDER BY signup_date"}
+
+
+class Rewrite(NamedTuple):
+    rollup: Rollup
+    sql: str  # ClickHouse SQL over the rollup table (not grammar-valid)
+
+
+# --- matching ----------------------------------------------------------------------
+
+def _nodes(node: Node) -> List[Node]:
+    return [c for c in node.children if isinstance(c, Node)]
+
+
+def _text(node: Union[Node, Token]) -> str:
+    if isinstance(node, Token):
+        return node.text
+    return "".join(t.text for t in node.tokens())
+
+
+def _unwrap(node: Node) -> Node:
+    while node.name in _WRAPPERS and len(node.children) == 1 and isinstance(node.children[0], Node):
+        node = node.children[0]
+    return node
+
+
+def _projection(projection: Node, first: Node) -> Tuple[Node, Optional[str]]:
+    """(expression, alias or None) of a select list item."""
+    if first.name == "named_projection":
+        expr, alias = _nodes(first)
+        return expr, _text(alias)
+    return projection, None
+
+
+def _quote(name: str) -> str:
+    return name if _IDENT_RE.fullmatch(name) else f"`{name}`"
+
+
+def _aggregate(node: Node, rollup: Rollup) -> Optional[Tuple[str, str, str, Measure]]:
+    """(func, argument, default column name, count measure or summed measure) for an aggregate the rollup can merge."""
+    node = _unwrap(node)
+    if node.name != "aggregate_expr":
+        return None
+    func, arg = (_text(n) for n in _nodes(node))
+    name = f"{func}({'' if arg == '*' else arg})"
+    if func == "count":
+        return func, arg, name, rollup.measure("count", "*")
+    if func in ("sum", "avg"):
+        measure = rollup.measure("sum", arg)
+        return (func, arg, name, measure) if measure else None
+    return None
+
+
+def _merged(func: str, measure: Measure, rollup: Rollup) -> str:
+    """Expression re-aggregating the rollup's partial aggregates."""
+    if func == "avg":
+        return f"sum({measure.name}) / sum({rollup.measure('count', '*').name})"
+    return f"sum({measure.name})"
+
+
+def _conditions_on(node: Node, columns: Tuple[str, ...]) -> bool:
+    """True when every leaf condition under ``node`` tests one of ``columns``."""
+    if node.name in ("or_expr", "and_expr", "base_condition", "paren_cond"):
+        return all(_conditions_on(child, columns) for child in _nodes(node))
+    return node.name in ("comparison", "bool_is", "in_list", "like_condition") and _text(_nodes(node)[0]) in columns
+
+
+def _dims_rewrite(sql: str, clauses: Dict[str, Node]) -> Optional[str]:
+    keys = tuple(k.name for k in DIMS.keys)
+    reserved = {*keys, *(m.name for m in DIMS.measures)}
+    group = clauses.get("group_clause")
+    grouped = tuple(_text(c) for c in _nodes(group.find("group_list"))) if group is not None else ()
+    if not set(grouped) <= set(keys):
+        return None
+    where = clauses.get("where_clause")
+    if where is not None and not _conditions_on(where.find("or_expr"), keys):
+        return None
+
+    items, only_counts = [], True
+    for projection in _nodes(clauses["select_list"]):
+        first = projection.children[0]
+        if isinstance(first, Token):  # SELECT *
+            return None
+        expr, alias = _projection(projection, first)
+        expr = _unwrap(expr)
+        if expr.name == "column_ref":
+            column = _text(expr)
+            if column not in grouped:
+                return None
+            items.append(column if alias is None else f"{column} AS {_quote(alias)}")
+            continue
+        found = _aggregate(expr, DIMS)
+        if found is None or alias in reserved:
+            return None
+        func, _, name, measure = found
+        only_counts = only_counts and func == "count"
+        items.append(f"{_merged(func, measure, DIMS)} AS {_quote(alias or name)}")
+    if only_counts and where is None and group is None:
+        return None  # a plain count(*) is answered from part metadata already
+
+    tail_start = clauses["table_name"].end
+    tail = sql[tail_start:]
+    having = clauses.get("having_clause")
+    if having is not None:
+        metric = having.find("having_metric")
+        found = _aggregate(metric, DIMS)
+        if found is None:
+            return None
+        func, _, _, measure = found
+        tail = sql[tail_start:metric.start] + _merged(func, measure, DIMS) + sql[metric.end:]
+    order = clauses.get("order_clause")
+    if order is not None:
+        names = set(grouped) | {_text(a) for a in clauses["select_list"].iter("alias")}
+        if any(_text(_nodes(item)[0]) not in names for item in _nodes(order.find("order_list"))):
+            return None
+    return f"SELECT {', '.join(items)} FROM {DIMS.table}{tail}"
+
+
+def _hourly_rewrite(sql: str, clauses: Dict[str, Node]) -> Optional[str]:
+    if set(clauses) - {"select_list", "table_name", "where_clause"} or "where_clause" not in clauses:
+        return None
+    conditions = list(clauses["where_clause"].find("or_expr").iter("base_condition"))
+    window = clauses["where_clause"].find("time_range")
+    if len(conditions) != 1 or window is None or conditions[0].children[0] is not window:
+        return None
+    column, op, bound = _nodes(window)
+    if _text(column) != "signup_date" or _text(op) not in (">=", ">") or bound.find("relative_time_func") is None:
+        return None
+    start = sql[bound.start:bound.end]
+    cut = f"toStartOfHour({start})"
+    (key,) = HOURLY.keys
+    items = []
+    for projection in _nodes(clauses["select_list"]):
+        first = projection.children[0]
+        if isinstance(first, Token):
+            return None
+        expr, alias = _projection(projection, first)
+        found = _aggregate(expr, HOURLY)
+        if found is None or found[0] == "avg":
+            return None
+        func, arg, name, measure = found
+        whole = f"(SELECT sum({measure.name}) FROM {HOURLY.table} WHERE {key.name} > {cut})"
+        edge = (
+            f"(SELECT {func}({arg}) FROM {BASE_TABLE} WHERE signup_date {_text(op)} {start} "
+            f"AND signup_date < {cut} + INTERVAL 1 HOUR)"
+        )
+        items.append(f"{whole} + {edge} AS {_quote(alias or name)}")
+    return f"SELECT {', '.join(items)}"
+
+
+@lru_cache(maxsize=1024)
+def plan(sql: str) -> Optional[Rewrite]:
+    """Equivalent query over a rollup for grammar-valid ``sql``, or None when no rollup answers it."""
+    try:
+        text = validate_sql(sql)
+    except SqlSyntaxError:
+        return None  # execution reports it
+    stmt = get_parser().parse(text).find("select_stmt")
+    clauses = {c.name: c for c in _nodes(stmt)}
+    rewritten = _dims_rewrite(text, clauses)
+    if rewritten is not None:
+        return Rewrite(DIMS, rewritten)
+    rewritten = _hourly_rewrite(text, clauses)
+    if rewritten is not None:
+        return Rewrite(HOURLY, rewritten)
+    return None
+
+
+def rewrite(sql: str) -> Optional[Rewrite]:
+    """:func:`plan` when rollups are enabled; counts every query routed to a rollup."""
+    if not get_settings().query_rollups:
+        return None
+    routed = plan(sql)
+    if routed is not None:
+        metrics.ROLLUP_REWRITES.inc(rollup=routed.rollup.name)
+    return routed
@@ -0,0 +1,392 @@
+"""Paraphrase-tolerant NL -> SQL cache.
+
+The exact cache (:mod:`app.services.translation_cache`) only helps when a
+question repeats word for word after normalization. This index also answers
+paraphrases such as "how many users are there" / "count all users" and
+questions that differ only in their literals ("first 5 users" / "top 20
+users"), all locally and without an embedding service.
+
+* **Slots.** Numbers, two-letter country codes (``from us``) and the value
+  after ``starts with`` / ``contains`` / ``domain`` / ``plan`` are the
+  question's literals. A translation is indexed only when each of them shows
+  up exactly once in the SQL (a number token, or inside a string literal); the
+  SQL is stored as a template with those spots left open and refilled from
+  the new question on a hit. A question whose literal the SQL does not echo
+  ("last 2 weeks" -> ``subtractDays(now(), 14)``) is never indexed.
+* **Similarity.** With the slots masked, the question is reduced to canonical
+  words (synonyms folded, stop words dropped) and compared by Jaccard
+  similarity over its words, word bigrams and character trigrams.
+* **Polarity.** Comparison operators and direction words (asc / desc,
+  highest / lowest, most / least, not, older / younger, before / after) flip
+  a query's meaning while barely moving the similarity, so they are part of
+  the partition: "age > 30" never answers "age < 25".
+* **Index.** A 32-hash MinHash signature split into 8 bands of 4 (LSH) finds
+  candidates with a few dict lookups, so lookups stay well under a
+  millisecond with 100k entries. Candidates need the same slot kinds,
+  polarity, model and grammar, and a similarity of at least ``threshold``.
+
+A hit is checked against the grammar again before it is served.
+"""
+from __future__ import annotations
+import itertools
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+from app.config import get_settings
+from app.services.sql_parser import SqlSyntaxError, tokenize, validate_sql
+from app.services.translation_cache import normalize_question
+
+NUM, CODE, TEXT = "num", "code", "text"
+
+_TEXT_SLOT_RE = re.compile(
+    r"\b(?:(?:starts|starting|begins|beginning|ends|ending)\s+with|contains|containing|domain|named|called"
+    r"|plan(?:\s+is)?)\s+([\w.@-]+)"
+)
+_CODE_SLOT_RE = re.compile(r"\b(?:from|in)\s+([a-z]{2})\b")
+_NUM_SLOT_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+_PHRASES = tuple((re.compile(p), r) for p, r in (
+    (r"\bhow many\b", "count"),
+    (r"\bnumber of\b", "count"),
+    (r"\b(?:starts|starting|begins|beginning) with\b", "prefix"),
+    (r"\b(?:ends|ending) with\b", "suffix"),
+    (r"\bsign ups?\b", "signups"),
+    (r"\bsubscription plan\b", "plan"),
+    (r"\bin the last\b|\bover the last\b|\bwithin the last\b|\bin the past\b", "last"),
+    (r"\b(?:greater|more|higher|larger|bigger) than\b", "gt"),
+    (r"\b(?:less|fewer|lower|smaller) than\b", "lt"),
+    (r"\bat least\b", "ge"),
+    (r"\bat most\b", "le"),
+))
+_SYNONYMS = {
+    "show": "list", "find": "list", "display": "list", "get": "list", "give": "list", "return": "list",
+    "fetch": "list", "select": "list",
+    "average": "avg", "mean": "avg", "total": "sum",
+    "user": "users", "customer": "users", "customers": "users", "people": "users", "accounts": "users",
+    "top": "first", "records": "rows", "entries": "rows", "row": "rows",
+    "per": "by", "each": "by", "in": "from",
+    "containing": "contains", "including": "contains",
+    "hour": "hours", "day": "days", "signup": "signups", "emails": "email", "countries": "country",
+    "past": "last", "recently": "recent", "plans": "plan",
+    "ascending": "asc", "descending": "desc", "largest": "highest", "biggest": "highest", "max": "highest",
+    "maximum": "highest", "smallest": "lowest", "min": "lowest", "minimum": "lowest", "fewest": "least",
+    "above": "gt", "below": "lt", "under": "lt", "no": "not", "without": "not", "never": "not",
+    "earlier": "before", "later": "after", "newest": "latest", "earliest": "oldest",
+}
+# Words (after synonym folding) that flip a query's meaning; see "Polarity" above.
+_POLARITY = frozenset(
+    "gt ge lt le ne eq asc desc highest lowest most least not older younger oldest latest before after".split()
+)
+_STOPWORDS = frozenset(
+    "a an the all are is there me please of what whats which who whose where that with having has "
+    "do does we have our i to for and can you currently".split()
+)
+
+HASHES = 32
+BANDS = 8
+CANDIDATES = 8  # entries sharing the most bands that get an exact similarity check
+# Newest entries kept per band bucket. Only near-duplicate clusters fill one,
+# and their members stay reachable through their other bands.
+BUCKET_CAP = 64
+_ROWS = HASHES // BANDS
+_rng = np.random.default_rng(0x5E3A)
+_MUL = _rng.integers(1, 2**63, HASHES, dtype=np.uint64) | np.uint64(1)
+_ADD = _rng.integers(0, 2**63, HASHES, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2**63, (BANDS, _ROWS), dtype=np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.integers(0, 2**63, BANDS, dtype=np.uint64)
+
+
+class Slot(NamedTuple):
+    kind: str  # num | code | text
+    value: str
+    start: int
+    end: int
+
+
+class SemanticHit(NamedTuple):
+    sql: str
+    similarity: float
+    question: str  # the cached question it paraphrases
+
+
+# A SQL template: literal text and (slot index, case) holes, in order.
+Template = Tuple[Union[str, Tuple[int, str]], ...]
+
+
+Partition = Tuple[str, Tuple[str, ...], Tuple[str, ...]]  # namespace, slot kinds, polarity words
+
+
+@dataclass(slots=True)
+class _Entry:
+    key: int  # hash of namespace and canonical words
+    partition: Partition
+    shingles: np.ndarray  # sorted unique 32-bit shingle hashes
+    template: Template
+    question: str
+    expires_at: float
+
+
+def extract_slots(normalized: str) -> List[Slot]:
+    """Literal slots of a normalized question, in order (a number inside a text slot is part of it)."""
+    slots = [Slot(TEXT, m.group(1), m.start(1), m.end(1)) for m in _TEXT_SLOT_RE.finditer(normalized)]
+    slots += [Slot(CODE, m.group(1), m.start(1), m.end(1)) for m in _CODE_SLOT_RE.finditer(normalized)]
+    taken = [(s.start, s.end) for s in slots]
+    slots += [
+        Slot(NUM, m.group(), m.start(), m.end()) for m in _NUM_SLOT_RE.finditer(normalized)
+        if not any(a <= m.start() < b for a, b in taken)
+    ]
+    return sorted(slots, key=lambda s: s.start)
+
+
+def canonical_words(normalized: str, slots: List[Slot]) -> List[str]:
+    """Words the similarity is computed on: slots masked, synonyms folded, stop words dropped.
+
+    >>> canonical_words("how many users are there", [])
+    ['count', 'users']
+    >>> q = "show the first 5 users"
+    >>> canonical_words(q, extract_slots(q))
+    ['list', 'first', '#num', 'users']
+    """
+    parts, pos = [], 0
+    for slot in slots:
+        parts += [normalized[pos:slot.start], f" #{slot.kind} "]
+        pos = slot.end
+    text = "".join(parts) + normalized[pos:]
+    for pattern, replacement in _PHRASES:
+        text = pattern.sub(replacement, text)
+    words = (_SYNONYMS.get(w, w) for w in text.split())
+    return [w for w in words if w not in _STOPWORDS]
+
+
+def polarity(words: List[str]) -> Tuple[str, ...]:
+    """The canonical words that flip a query's meaning, sorted.
+
+    >>> polarity(canonical_words("users ordered by balance descending", []))
+    ('desc',)
+    """
+    return tuple(sorted(w for w in words if w in _POLARITY))
+
+
+def shingles(words: List[str]) -> FrozenSet[str]:
+    """Words, word bigrams and character trigrams of the canonical text."""
+    text = f" {' '.join(words)} "
+    out = set(words)
+    out.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    out.update(text[i:i + 3] for i in range(len(text) - 2))
+    return frozenset(out)
+
+
+def _hashes(items: FrozenSet[str]) -> np.ndarray:
+    return np.unique(np.array([hash(s) & 0xFFFFFFFF for s in items], dtype=np.uint32))
+
+
+def _bands(hashes: np.ndarray, partition: Partition) -> List[int]:
+    """LSH band keys of the MinHash signature of ``hashes``, within ``partition``."""
+    with np.errstate(over="ignore"):
+        signature = ((_MUL[:, None] * hashes.astype(np.uint64)[None, :] + _ADD[:, None]) >> np.uint64(32)).min(axis=1)
+        keys = (signature.reshape(BANDS, _ROWS) * _BAND_MIX).sum(axis=1, dtype=np.uint64) ^ _BAND_SALT
+    return [hash((key, partition)) for key in keys.tolist()]
+
+
+def _jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    common = np.intersect1d(a, b, assume_unique=True).size
+    return common / (a.size + b.size - common)
+
+
+def sql_template(sql: str, slots: List[Slot]) -> Optional[Template]:
+    """``sql`` with each slot's literal left open, or None unless every slot occurs exactly once.
+
+    Numbers bind to number tokens, codes and text to a case-insensitive match
+    inside a string literal (kept upper case when the SQL upper-cases it).
+    """
+    try:
+        tokens = tokenize(sql)
+    except SqlSyntaxError:
+        return None
+    holes: List[Tuple[int, int, int, str]] = []  # start, end, slot index, case
+    for i, slot in enumerate(slots):
+        found = []
+        for token in tokens:
+            if slot.kind == NUM and token.kind == "number" and token.text == slot.value:
+                found.append((token.start, token.end, i, "same"))
+            elif slot.kind != NUM and token.kind == "string":
+                body = token.text[1:-1].lower()
+                at = body.find(slot.value)
+                if at >= 0 and body.find(slot.value, at + 1) < 0:
+                    start = token.start + 1 + at
+                    literal = sql[start:start + len(slot.value)]
+                    case = "same" if literal == slot.value else "upper" if literal == slot.value.upper() else ""
+                    if case:
+                        found.append((start, start + len(slot.value), i, case))
+        if len(found) != 1:
+            return None
+        holes += found
+    holes.sort()
+    template: List[Union[str, Tuple[int, str]]] = []
+    pos = 0
+    for start, end, i, case in holes:
+        if start < pos:
+            return None  # two slots bound to one spot
+        template += [sql[pos:start], (i, case)]
+        pos = end
+    template.append(sql[pos:])
+    return tuple(template)
+
+
+def render(template: Template, slots: List[Slot]) -> str:
+    return "".join(
+        part if isinstance(part, str) else (slots[part[0]].value.upper() if part[1] == "upper" else slots[part[0]].value)
+        for part in template
+    )
+
+
+class SemanticCache:
+    """MinHash LSH index of translated questions, refilled with each question's literals."""
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        threshold: float = 0.8,
+        ttl: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._keys: Dict[int, int] = {}
+        self._buckets: Dict[int, List[int]] = {}
+        self._partitions: Dict[Partition, Partition] = {}  # one shared tuple per partition
+        self._ids = itertools.count()
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0
+        self.indexed = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _analyze(question: str) -> Tuple[List[Slot], List[str]]:
+        normalized = normalize_question(question)
+        slots = extract_slots(normalized)
+        return slots, canonical_words(normalized, slots)
+
+    def add(self, question: str, sql: str, namespace: str = "") -> bool:
+        """Index ``question`` -> ``sql``; False when its literals cannot be mapped onto the SQL."""
+        if self.max_entries <= 0:
+            return False
+        slots, words = self._analyze(question)
+        template = sql_template(sql, slots) if words else None
+        if template is None:
+            with self._lock:
+                self.skipped += 1
+            return False
+        hashes = _hashes(shingles(words))
+        partition = (namespace, tuple(s.kind for s in slots), polarity(words))
+        bands = _bands(hashes, partition)
+        with self._lock:
+            partition = self._partitions.setdefault(partition, partition)
+            entry = _Entry(hash((namespace, *words)), partition, hashes, template, question, self._clock() + self.ttl)
+            old = self._keys.pop(entry.key, None)
+            if old is not None:
+                self._drop(old)
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._keys[entry.key] = entry_id
+            for band in bands:
+                bucket = self._buckets.setdefault(band, [])
+                bucket.append(entry_id)
+                if len(bucket) > BUCKET_CAP:
+                    del bucket[0]
+            self.indexed += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def lookup(self, question: str, namespace: str = "") -> Optional[SemanticHit]:
+        """Cached SQL for a question similar to ``question``, with its literals filled in."""
+        if self.max_entries <= 0:
+            return None
+        slots, words = self._analyze(question)
+        hashes = _hashes(shingles(words)) if words else None
+        partition = (namespace, tuple(s.kind for s in slots), polarity(words))
+        bands = _bands(hashes, partition) if words else []
+        now = self._clock()
+        best: Optional[Tuple[float, int, _Entry]] = None
+        with self._lock:
+            self.lookups += 1
+            shared: Counter = Counter()
+            for band in bands:
+                bucket = self._buckets.get(band)
+                if bucket:
+                    shared.update(bucket)
+            for entry_id, _ in shared.most_common(CANDIDATES):
+                entry = self._entries[entry_id]
+                if entry.partition != partition or entry.expires_at <= now:
+                    continue
+                similarity = _jaccard(hashes, entry.shingles)
+                if similarity >= self.threshold and (best is None or similarity > best[0]):
+                    best = (similarity, entry_id, entry)
+            if best is not None:
+                self._entries.move_to_end(best[1])
+        if best is None:
+            return None
+        similarity, _, entry = best
+        try:
+            sql = validate_sql(render(entry.template, slots))
+        except SqlSyntaxError:
+            with self._lock:
+                self.rejected += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return SemanticHit(sql, round(similarity, 4), entry.question)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._buckets.clear()
+            self._partitions.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "llm_calls_avoided": self.hits,
+            "rejected": self.rejected,
+            "indexed": self.indexed,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        if self._keys.get(entry.key) == entry_id:
+            del self._keys[entry.key]
+        for band in _bands(entry.shingles, entry.partition):
+            bucket = self._buckets.get(band)
+            if bucket is not None and entry_id in bucket:
+                bucket.remove(entry_id)
+                if not bucket:
+                    del self._buckets[band]
+
+
+@lru_cache
+def get_semantic_cache() -> SemanticCache:
+    settings = get_settings()
+    return SemanticCache(
+        max_entries=settings.semantic_cache_size,
+        threshold=settings.semantic_cache_threshold,
+        ttl=settings.translation_cache_ttl,
+    )
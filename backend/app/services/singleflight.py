@@ -0,0 +1,106 @@
+"""Single-flight request coalescing.
+
+While a call for ``key`` is running, identical calls do not start their own;
+they wait for the first one (the leader) and get its result or its exception.
+Used in front of LLM translation (keyed like the translation cache) and
+ClickHouse execution (keyed like the result cache), so a dashboard refresh
+that sends the same question from many clients costs one upstream call.
+
+Only in-flight calls are shared; once the leader finishes, the next call
+starts fresh (the caches take over from there).
+
+* ``acall`` coalesces coroutines on the running event loop. The shared work
+  runs as its own task, so a leader whose client disconnects does not cancel
+  the followers' result.
+* ``call`` does the same for blocking functions across threads.
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # asyncio tasks are bound to their loop; keep one table per loop
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Future]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.leaders = 0
+        self.coalesced = 0
+
+    def call(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def acall(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        tasks = self._tasks.setdefault(asyncio.get_running_loop(), {})
+        task = tasks.get(key)
+        if task is None:
+            task = tasks[key] = asyncio.ensure_future(fn())
+
+            def forget(t: "asyncio.Future") -> None:
+                if tasks.get(key) is t:
+                    del tasks[key]
+                if not t.cancelled():
+                    t.exception()  # retrieved even if every waiter was cancelled
+
+            task.add_done_callback(forget)
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.leaders + self.coalesced
+        return {
+            "calls": total,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": len(self._calls) + sum(len(t) for t in list(self._tasks.values())),
+        }
+
+
+translations = SingleFlight("translation")
+executions = SingleFlight("execution")
+
+
+def coalescing_stats() -> Dict[str, Dict[str, float]]:
+    return {translations.name: translations.stats(), executions.name: executions.stats()}
@@ -0,0 +1,564 @@
+"""In-process recognizer for the restricted SQL grammar.
+
+The BNF in app/grammars is character level (explicit ``ws``). For speed the
+parser works on SQL tokens instead:
+
+* productions made only of character classes / other such productions
+  (``ident``, ``number_literal``, ``string_literal``, ``ws`` ...) are compiled
+  to regexes and match a single token;
+* the whitespace production becomes implicit (the lexer drops whitespace);
+* every other production is matched over the token stream by a memoized
+  all-paths descent, so ambiguous rules (``order_item ws? order_dir?`` followed
+  by ``ws "LIMIT"``) are handled like a real CFG rather than a PEG.
+
+Upper-case keyword literals (``SELECT``, ``WHERE`` ...) match case-insensitively,
+everything else (columns, functions, table) is exact.
+
+:meth:`SqlParser.check_prefix` runs the same descent over an unfinished query
+(streamed LLM output): a prefix is viable while some path runs out of input
+rather than into a wrong token. :class:`StreamingSqlCheck` uses it to stop a
+stream once the query is finished or can no longer be.
+"""
+from __future__ import annotations
+import ast
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union
+from app.services.grammar import (
+    AnyChar, CharClass, Choice, Expr, Grammar, GrammarError, Literal, Ref, Repeat, Sequence, get_grammar,
+)
+
+
+class SqlSyntaxError(ValueError):
+    """Raised when SQL is not accepted by the grammar."""
+
+    def __init__(self, message: str, position: int, expected: Tuple[str, ...] = ()):
+        super().__init__(message)
+        self.position = position
+        self.expected = expected
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str  # word | number | string | op
+    text: str
+    start: int
+    end: int
+
+
+@dataclass(frozen=True)
+class PrefixCheck:
+    viable: bool  # some suffix turns the text into a valid query
+    complete: Optional[int]  # end offset of a valid query the text starts with, up to the first bad token
+    final: bool  # the whole text is a valid query that no suffix can extend
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+    start: int  # character offsets into the SQL text
+    end: int
+    children: Tuple[Union["Node", Token], ...]
+
+    def find(self, name: str) -> Optional["Node"]:
+        """First descendant (or self) named ``name``, depth first."""
+        for node in self.iter(name):
+            return node
+        return None
+
+    def iter(self, name: str):
+        if self.name == name:
+            yield self
+        for child in self.children:
+            if isinstance(child, Node):
+                yield from child.iter(name)
+
+    def tokens(self) -> List[Token]:
+        out: List[Token] = []
+        for child in self.children:
+            if isinstance(child, Node):
+                out.extend(child.tokens())
+            else:
+                out.append(child)
+        return out
+
+
+_LEX_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+  | (?P<string>'(?:[^'\\]|\\.)*')
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>>=|<=|!=|<>|[=<>+\-/*(),.;%])
+    """,
+    re.VERBOSE,
+)
+
+
+def tokenize(sql: str) -> List[Token]:
+    tokens: List[Token] = []
+    pos = 0
+    n = len(sql)
+    while pos < n:
+        m = _LEX_RE.match(sql, pos)
+        if not m:
+            what = "unterminated string literal" if sql[pos] == "'" else f"unexpected character {sql[pos]!r}"
+            raise SqlSyntaxError(f"Syntax error at position {pos}: {what}", pos)
+        kind = m.lastgroup
+        if kind != "ws":
+            tokens.append(Token(kind, m.group(), pos, m.end()))
+        pos = m.end()
+    return tokens
+
+
+_KEYWORD_RE = re.compile(r"[A-Z]+")
+
+_Matches = Dict[int, Tuple[Union[Node, Token], ...]]
+_Matcher = Callable[["_Run", int], _Matches]
+_EMPTY: _Matches = {}
+
+
+class _Run:
+    """Per-parse state (token list, memo table, furthest failure)."""
+
+    __slots__ = ("tokens", "upper", "memo", "lex_memo", "fail_pos", "expected")
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.upper = [t.text.upper() for t in tokens]
+        self.memo: Dict[Tuple[str, int], _Matches] = {}
+        self.lex_memo: Dict[Tuple[str, int], bool] = {}
+        self.fail_pos = -1
+        self.expected: Set[str] = set()
+
+    def fail(self, pos: int, expected) -> None:
+        if pos > self.fail_pos:
+            self.fail_pos = pos
+            self.expected = set(expected)
+        elif pos == self.fail_pos:
+            self.expected.update(expected)
+
+
+class SqlParser:
+    """Recognizer compiled once from a :class:`Grammar`."""
+
+    def __init__(self, grammar: Grammar):
+        self.grammar = grammar
+        self.lexical = self._lexical_productions(grammar)
+        self.lex_regex: Dict[str, "re.Pattern[str]"] = {}
+        for name in self.lexical:
+            self.lex_regex[name] = re.compile(self._regex(grammar.productions[name].expr))
+        self.whitespace = frozenset(
+            name for name, rx in self.lex_regex.items() if rx.fullmatch(" ") and not rx.fullmatch("a")
+        )
+        self._rules: Dict[str, _Matcher] = {}
+        for name, prod in grammar.productions.items():
+            if name not in self.lexical:
+                self._rules[name] = self._compile(prod.expr, name)
+        self._first = self._first_sets()
+        self.keywords = frozenset(t for t in grammar.terminals if _KEYWORD_RE.fullmatch(t))
+        self._quoted = frozenset(name for name, rx in self.lex_regex.items() if rx.pattern.lstrip("(?:").startswith("'"))
+        # Parse trees are immutable, so recent results can be shared across requests.
+        self.parse = lru_cache(maxsize=1024)(self._parse)
+
+    # --- public API -----------------------------------------------------------------
+
+    def _parse(self, sql: str) -> Node:
+        """Return the parse tree for ``sql`` or raise :class:`SqlSyntaxError`.
+
+        Exposed as ``parse`` (memoized per parser instance).
+        """
+        tokens = tokenize(sql)
+        run = _Run(tokens)
+        start = self.grammar.start
+        matches = self._call(run, start, 0)
+        n = len(tokens)
+        if n in matches:
+            return matches[n][0]
+        if run.fail_pos < 0 or (matches and max(matches) > run.fail_pos):
+            run.fail_pos = max(matches) if matches else 0
+            run.expected = {"end of query"}
+        pos = run.fail_pos
+        char_pos = tokens[pos].start if pos < n else len(sql)
+        found = repr(tokens[pos].text) if pos < n else "end of query"
+        expected = tuple(sorted(run.expected))
+        raise SqlSyntaxError(
+            f"Syntax error at position {char_pos}: unexpected {found}; expected one of: {', '.join(expected)}",
+            char_pos,
+            expected,
+        )
+
+    def check_prefix(self, text: str) -> PrefixCheck:
+        """How far ``text``, the start of a query still being written, can go.
+
+        The last token may be unfinished (``SEL``, ``'Uni``, ``>``): it only
+        has to be the start of a token the grammar accepts there.
+        """
+        tail = ""
+        try:
+            tokens = tokenize(text)
+        except SqlSyntaxError as e:  # unterminated string or a stray character
+            tokens = tokenize(text[:e.position])
+            tail = text[e.position:]
+        run = _Run(tokens)
+        matches = self._call(run, self.grammar.start, 0)
+        n = len(tokens)
+        # Only a query that runs up to the first bad token counts: accepting an
+        # earlier one would silently drop a half-written clause.
+        last = max((e for e in matches if e > 0), default=0)
+        complete = tokens[last - 1].end if last and last >= run.fail_pos else None
+        if tail:
+            return PrefixCheck(run.fail_pos >= n and self._continues(tail, run.expected), complete, False)
+        if n in matches:
+            return PrefixCheck(True, complete, run.fail_pos < n)
+        if run.fail_pos >= n:
+            return PrefixCheck(True, complete, False)
+        partial = n and not text[-1].isspace() and run.fail_pos == n - 1
+        return PrefixCheck(bool(partial) and self._continues(tokens[-1].text, run.expected), complete, False)
+
+    def _continues(self, partial: str, expected: Set[str]) -> bool:
+        """Whether ``partial`` can grow into one of the ``expected`` tokens."""
+        for label in expected:
+            rx = self.lex_regex.get(label)
+            if rx is not None:
+                if label in self._quoted if partial.startswith("'") else rx.fullmatch(partial):
+                    return True
+            elif label[:1] in ("'", '"'):
+                literal = ast.literal_eval(label)
+                if _KEYWORD_RE.fullmatch(literal):
+                    if literal.startswith(partial.upper()):
+                        return True
+                elif literal.startswith(partial):
+                    return True
+        return False
+
+    def validate(self, sql: str) -> Optional[str]:
+        """Error message if ``sql`` is rejected, else ``None``."""
+        try:
+            self.parse(sql)
+        except SqlSyntaxError as e:
+            return str(e)
+        return None
+
+    # --- compilation ----------------------------------------------------------------
+
+    @staticmethod
+    def _lexical_productions(grammar: Grammar) -> FrozenSet[str]:
+        """Productions that describe a single token.
+
+        A production is lexical when every rule it references is lexical and it
+        either contains a character class itself (``datetime_literal``) or is
+        built from lexical references alone (``alias ::= ident``).
+        """
+        def contains(expr: Expr, kinds) -> bool:
+            if isinstance(expr, kinds):
+                return True
+            if isinstance(expr, Sequence):
+                return any(contains(i, kinds) for i in expr.items)
+            if isinstance(expr, Choice):
+                return any(contains(o, kinds) for o in expr.options)
+            if isinstance(expr, Repeat):
+                return contains(expr.item, kinds)
+            return False
+
+        def has_char_class(expr: Expr) -> bool:
+            return contains(expr, (CharClass, AnyChar))
+
+        lexical: Set[str] = set()
+        changed = True
+        while changed:
+            changed = False
+            for name, prod in grammar.productions.items():
+                if name in lexical:
+                    continue
+                refs = grammar.references(name)
+                if all(r in lexical for r in refs) and (
+                    has_char_class(prod.expr) or (refs and not contains(prod.expr, Literal))
+                ):
+                    lexical.add(name)
+                    changed = True
+        for name, prod in grammar.productions.items():
+            if name not in lexical and has_char_class(prod.expr):
+                raise GrammarError(f"Production {name!r} mixes character classes with syntactic rules")
+        return frozenset(lexical)
+
+    def _regex(self, expr: Expr) -> str:
+        if isinstance(expr, Literal):
+            return re.escape(expr.text)
+        if isinstance(expr, CharClass):
+            return expr.pattern
+        if isinstance(expr, AnyChar):
+            return r"[\s\S]"
+        if isinstance(expr, Ref):
+            return "(?:" + self._regex(self.grammar.productions[expr.name].expr) + ")"
+        if isinstance(expr, Sequence):
+            return "".join(self._regex(i) for i in expr.items)
+        if isinstance(expr, Choice):
+            return "(?:" + "|".join(self._regex(o) for o in expr.options) + ")"
+        if isinstance(expr, Repeat):
+            hi = "" if expr.max is None else str(expr.max)
+            return "(?:" + self._regex(expr.item) + "){" + f"{expr.min},{hi}" + "}"
+        raise GrammarError(f"Unsupported expression {expr!r}")
+
+    def _compile(self, expr: Expr, rule: str) -> _Matcher:
+        if isinstance(expr, Literal):
+            return self._compile_literal(expr.text)
+        if isinstance(expr, Ref):
+            name = expr.name
+            if name in self.whitespace:
+                return lambda run, pos: {pos: ()}
+            if name in self.lexical:
+                return self._compile_lexical(name)
+            return lambda run, pos: self._call(run, name, pos)
+        if isinstance(expr, Sequence):
+            parts = [self._compile(i, rule) for i in expr.items]
+
+            def seq(run: _Run, pos: int) -> _Matches:
+                results: _Matches = {pos: ()}
+                for part in parts:
+                    nxt: _Matches = {}
+                    for p, children in results.items():
+                        for e, c in part(run, p).items():
+                            if e not in nxt:
+                                nxt[e] = children + c
+                    if not nxt:
+                        return _EMPTY
+                    results = nxt
+                return results
+            return seq
+        if isinstance(expr, Choice):
+            options = [self._compile(o, rule) for o in expr.options]
+
+            def choice(run: _Run, pos: int) -> _Matches:
+                out: _Matches = {}
+                for option in options:
+                    for e, c in option(run, pos).items():
+                        if e not in out:
+                            out[e] = c
+                return out
+            return choice
+        if isinstance(expr, Repeat):
+            item = self._compile(expr.item, rule)
+            lo, hi = expr.min, expr.max
+
+            def repeat(run: _Run, pos: int) -> _Matches:
+                out: _Matches = {pos: ()} if lo == 0 else {}
+                current: _Matches = {pos: ()}
+                count = 0
+                while current and (hi is None or count < hi):
+                    count += 1
+                    nxt: _Matches = {}
+                    for p, children in current.items():
+                        for e, c in item(run, p).items():
+                            if e > p and e not in nxt:
+                                nxt[e] = children + c
+                    if count >= lo:
+                        for e, c in nxt.items():
+                            if e not in out:
+                                out[e] = c
+                    current = nxt
+                return out
+            return repeat
+        raise GrammarError(f"Production {rule!r}: character-level expression outside a lexical rule")
+
+    def _compile_literal(self, text: str) -> _Matcher:
+        try:
+            parts = tokenize(text)
+        except SqlSyntaxError:
+            raise GrammarError(f"Literal {text!r} cannot be tokenized")
+        keys = [(p.text, p.kind == "word" and _KEYWORD_RE.fullmatch(p.text) is not None) for p in parts]
+        label = repr(text)
+
+        def literal(run: _Run, pos: int) -> _Matches:
+            toks = run.tokens
+            p = pos
+            for key, keyword in keys:
+                if p >= len(toks) or (run.upper[p] if keyword else toks[p].text) != key:
+                    run.fail(p, (label,))
+                    return _EMPTY
+                p += 1
+            return {p: tuple(toks[pos:p])}
+        return literal
+
+    def _compile_lexical(self, name: str) -> _Matcher:
+        def lexical(run: _Run, pos: int) -> _Matches:
+            if self._lex_match(run, name, pos):
+                tok = run.tokens[pos]
+                return {pos + 1: (Node(name, tok.start, tok.end, (tok,)),)}
+            run.fail(pos, (name,))
+            return _EMPTY
+        return lexical
+
+    def _lex_match(self, run: _Run, name: str, pos: int) -> bool:
+        if pos >= len(run.tokens):
+            return False
+        key = (name, pos)
+        hit = run.lex_memo.get(key)
+        if hit is None:
+            tok = run.tokens[pos]
+            hit = tok.kind != "op" and self.lex_regex[name].fullmatch(tok.text) is not None
+            run.lex_memo[key] = hit
+        return hit
+
+    def _call(self, run: _Run, name: str, pos: int) -> _Matches:
+        key = (name, pos)
+        hit = run.memo.get(key)
+        if hit is not None:
+            return hit
+        literals, keywords, lexicals, nullable, labels = self._first[name]
+        if not nullable:
+            ok = False
+            if pos < len(run.tokens):
+                ok = (
+                    run.tokens[pos].text in literals
+                    or run.upper[pos] in keywords
+                    or any(self._lex_match(run, lx, pos) for lx in lexicals)
+                )
+            if not ok:
+                run.fail(pos, labels)
+                run.memo[key] = _EMPTY
+                return _EMPTY
+        run.memo[key] = _EMPTY  # guards against (unsupported) left recursion
+        raw = self._rules[name](run, pos)
+        result: _Matches = {}
+        tokens = run.tokens
+        for e, children in raw.items():
+            start = tokens[pos].start if pos < len(tokens) and e > pos else (tokens[pos - 1].end if pos else 0)
+            end = tokens[e - 1].end if e > pos else start
+            result[e] = (Node(name, start, end, children),)
+        run.memo[key] = result
+        return result
+
+    def _first_sets(self) -> Dict[str, Tuple[FrozenSet[str], FrozenSet[str], Tuple[str, ...], bool, Tuple[str, ...]]]:
+        """FIRST terminals per syntactic production.
+
+        Values are (literals, keywords, lexical rules, nullable, labels for error messages).
+        """
+        first: Dict[str, Tuple[Set[str], Set[str], Set[str], bool]] = {
+            name: (set(), set(), set(), False) for name in self._rules
+        }
+
+        def walk(expr: Expr, lits: Set[str], kws: Set[str], lexs: Set[str]) -> bool:
+            """Add FIRST terminals of ``expr``; return whether ``expr`` is nullable."""
+            if isinstance(expr, Literal):
+                tok = tokenize(expr.text)[0]
+                if tok.kind == "word" and _KEYWORD_RE.fullmatch(tok.text):
+                    kws.add(tok.text)
+                else:
+                    lits.add(tok.text)
+                return False
+            if isinstance(expr, Ref):
+                if expr.name in self.whitespace:
+                    return True
+                if expr.name in self.lexical:
+                    lexs.add(expr.name)
+                    return False
+                sub = first[expr.name]
+                lits |= sub[0]
+                kws |= sub[1]
+                lexs |= sub[2]
+                return sub[3]
+            if isinstance(expr, Sequence):
+                for item in expr.items:
+                    if not walk(item, lits, kws, lexs):
+                        return False
+                return True
+            if isinstance(expr, Choice):
+                nullable = False
+                for option in expr.options:
+                    nullable = walk(option, lits, kws, lexs) or nullable
+                return nullable
+            if isinstance(expr, Repeat):
+                return walk(expr.item, lits, kws, lexs) or expr.min == 0
+            return False
+
+        changed = True
+        while changed:
+            changed = False
+            for name in self._rules:
+                lits, kws, lexs, _ = first[name]
+                before = (len(lits), len(kws), len(lexs), first[name][3])
+                nullable = walk(self.grammar.productions[name].expr, lits, kws, lexs)
+                first[name] = (lits, kws, lexs, nullable)
+                if (len(lits), len(kws), len(lexs), nullable) != before:
+                    changed = True
+        return {
+            name: (
+                frozenset(l), frozenset(k), tuple(sorted(x)), nb,
+                tuple(repr(t) for t in sorted(l | k)) + tuple(sorted(x)),
+            )
+            for name, (l, k, x, nb) in first.items()
+        }
+
+
+@lru_cache(maxsize=8)
+def _parser_for(grammar: Grammar) -> SqlParser:
+    return SqlParser(grammar)
+
+
+def get_parser(name: Optional[str] = None) -> SqlParser:
+    """Compiled parser for the named grammar; rebuilt only when the grammar reloads."""
+    return _parser_for(get_grammar(name))
+
+
+def validate_sql(sql: str) -> str:
+    """Normalize (strip, drop one trailing ';') and check ``sql`` against the grammar.
+
+    Returns the normalized SQL or raises :class:`SqlSyntaxError`.
+    """
+    candidate = sql.strip()
+    if candidate.endswith(";"):
+        candidate = candidate[:-1].rstrip()
+    get_parser().parse(candidate)
+    return candidate
+
+
+class StreamingSqlCheck:
+    """Checks LLM output as it streams in, a chunk at a time.
+
+    :meth:`feed` returns the query as soon as it is finished (a ``;``, a
+    query nothing can extend, or text that only continues a complete query
+    with commentary) and raises :class:`SqlSyntaxError` as soon as no suffix
+    can make the text valid. :meth:`finish` validates whatever the stream
+    ended with.
+    """
+
+    def __init__(self):
+        self.parser = get_parser()
+        self.text = ""
+
+    def feed(self, delta: str) -> Optional[str]:
+        self.text += delta
+        head, semicolon, _ = self.text.partition(";")
+        if semicolon:
+            return validate_sql(head)
+        check = self.parser.check_prefix(self.text)
+        if check.final:
+            return validate_sql(self.text)
+        if check.viable:
+            return None
+        if check.complete is not None:
+            return validate_sql(self.text[:check.complete])
+        position = len(self.text)
+        raise SqlSyntaxError(f"Output can no longer become a valid query (position {position})", position)
+
+    def finish(self) -> str:
+        return validate_sql(self.text)
+
+
+def canonicalize_sql(sql: str) -> str:
+    """Whitespace- and keyword-case-insensitive form of ``sql`` (for cache keys).
+
+    Identifiers and literals are left untouched since ClickHouse treats them
+    case-sensitively.
+    """
+    candidate = sql.strip()
+    if candidate.endswith(";"):
+        candidate = candidate[:-1]
+    try:
+        tokens = tokenize(candidate)
+    except SqlSyntaxError:
+        return " ".join(candidate.split())
+    keywords = get_parser().keywords
+    return " ".join(t.text.upper() if t.kind == "word" and t.text.upper() in keywords else t.text for t in tokens)
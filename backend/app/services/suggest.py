@@ -0,0 +1,261 @@
+"""Question autocomplete for ``GET /suggest``.
+
+A radix trie over known questions, weighted by how often each was asked.
+Every node keeps the ``TOP_K`` heaviest questions below it, so a lookup is one
+walk down the prefix's path and never scans a subtree. A question's weight
+only grows while it is kept. An increment re-sorts the short lists on its path
+(a few microseconds). An eviction rebuilds, from the children's lists, only
+the lists that held the evicted question.
+
+The trie is seeded with the eval dataset and the phrasings ``mock_translate``
+recognizes, then learns from every successful ``/nl-query``. Memory is bounded
+by ``max_phrases``: past it the lightest question (the oldest among equals) is
+evicted. With a ``snapshot_path`` the phrases and weights are saved
+periodically (see ``app.main``) and reloaded at startup.
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config import get_settings
+
+logger = logging.getLogger("cfg_evals.suggest")
+
+TOP_K = 10  # completions kept per node, and the most a lookup returns
+MAX_PHRASE_CHARS = 200
+DATASET_PATH = Path(__file__).resolve().parents[2] / "evals" / "dataset.jsonl"
+
+
+def phrase_key(text: str) -> str:
+    """Lookup form: lower case, whitespace collapsed (a trailing space is kept, it ends a word)."""
+    key = " ".join(text.lower().split())
+    return key + " " if key and text[-1:].isspace() else key
+
+
+class _Node:
+    __slots__ = ("label", "children", "top", "terminal")
+
+    def __init__(self, label: str = ""):
+        self.label = label  # edge text from the parent
+        self.children: Dict[str, "_Node"] = {}  # first character of the child's label -> child
+        self.top: List[str] = []  # heaviest phrase keys in this subtree, heaviest first
+        self.terminal = False  # a phrase ends here
+
+
+class SuggestionTrie:
+    def __init__(self, max_phrases: int = 5000):
+        self.max_phrases = max_phrases
+        self._root = _Node()
+        self._weights: Dict[str, float] = {}
+        self._display: Dict[str, str] = {}  # key -> text as first asked
+        self._order: Dict[str, int] = {}  # key -> sequence of its last weight change
+        self._heap: List[Tuple[float, int, str]] = []  # lazy min-heap for eviction
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.nodes = 1
+        self.lookups = 0
+        self.recorded = 0
+        self.evictions = 0
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def _rank(self, key: str) -> Tuple[float, str]:
+        return -self._weights[key], key
+
+    def suggest(self, prefix: str, k: int = 5) -> List[str]:
+        """Up to ``k`` known questions starting with ``prefix``, most asked first."""
+        key = phrase_key(prefix)
+        with self._lock:
+            self.lookups += 1
+            node = self._root
+            while key:
+                child = node.children.get(key[0])
+                if child is None:
+                    return []
+                if key.startswith(child.label):
+                    key = key[len(child.label):]
+                    node = child
+                elif child.label.startswith(key):
+                    node, key = child, ""
+                else:
+                    return []
+            return [self._display[p] for p in node.top[:k]]
+
+    def add(self, text: str, weight: float = 1.0) -> bool:
+        """Add ``weight`` to ``text`` (inserting it if new); False for blank or over-long text."""
+        key = phrase_key(text).strip()
+        if not key or len(key) > MAX_PHRASE_CHARS or weight <= 0 or self.max_phrases <= 0:
+            return False
+        with self._lock:
+            new = key not in self._weights
+            self._weights[key] = self._weights.get(key, 0.0) + weight
+            if new:
+                self._display[key] = " ".join(text.split())
+            seq = next(self._seq)
+            self._order[key] = seq
+            heapq.heappush(self._heap, (self._weights[key], seq, key))
+            for node in self._path(key, create=new):
+                self._promote(node, key)
+            if len(self._heap) > 4 * len(self._weights) + 64:
+                self._heap = [(self._weights[k], s, k) for k, s in self._order.items()]
+                heapq.heapify(self._heap)
+            while len(self._weights) > self.max_phrases:
+                self._evict()
+            self.recorded += 1
+            self.dirty = True
+        return True
+
+    def _promote(self, node: _Node, key: str) -> None:
+        top = node.top
+        if key not in top:
+            if len(top) >= TOP_K and self._rank(key) >= self._rank(top[-1]):
+                return
+            top.append(key)
+        top.sort(key=self._rank)
+        del top[TOP_K:]
+
+    def _path(self, key: str, create: bool) -> List[_Node]:
+        """Nodes from the root to ``key``'s node, splitting edges and adding nodes when ``create``."""
+        node, rest, path = self._root, key, [self._root]
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                if not create:
+                    raise KeyError(key)
+                child = node.children[rest[0]] = _Node(rest)
+                self.nodes += 1
+            common = _common_prefix(child.label, rest)
+            if common < len(child.label):
+                if not create:
+                    raise KeyError(key)
+                mid = _Node(child.label[:common])  # split the edge; same subtree so far
+                mid.top = list(child.top)
+                child.label = child.label[common:]
+                mid.children[child.label[0]] = child
+                node.children[rest[0]] = child = mid
+                self.nodes += 1
+            node, rest = child, rest[common:]
+            path.append(node)
+        node.terminal = True
+        return path
+
+    def _evict(self) -> None:
+        while True:
+            weight, seq, key = heapq.heappop(self._heap)
+            if self._order.get(key) == seq:
+                break
+        path = self._path(key, create=False)
+        del self._weights[key], self._display[key], self._order[key]
+        path[-1].terminal = False
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            if depth and not node.terminal and len(node.children) <= 1:
+                parent = path[depth - 1]
+                if not node.children:
+                    del parent.children[node.label[0]]
+                    self.nodes -= 1
+                    continue
+                (child,) = node.children.values()  # merge a pass-through node into its child
+                child.label = node.label + child.label
+                parent.children[child.label[0]] = child
+                self.nodes -= 1
+                continue
+            if key in node.top:  # the lightest phrase rarely ranks near the root
+                own = "".join(n.label for n in path[1:depth + 1]) if node.terminal else None
+                node.top = self._merged(node, own)
+        self.evictions += 1
+
+    def _merged(self, node: _Node, own: Optional[str]) -> List[str]:
+        """Top list rebuilt from the children's lists plus the phrase ending at ``node``."""
+        candidates = [k for child in node.children.values() for k in child.top]
+        if own is not None:
+            candidates.append(own)
+        return heapq.nsmallest(TOP_K, candidates, key=self._rank)
+
+    def items(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return [(self._display[k], w) for k, w in self._weights.items()]
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "phrases": len(self._weights),
+            "nodes": self.nodes,
+            "lookups": self.lookups,
+            "recorded": self.recorded,
+            "evictions": self.evictions,
+        }
+
+    def save(self, path: str) -> bool:
+        """Write phrases and weights to ``path`` (atomically) if anything changed since the last save."""
+        if not self.dirty:
+            return False
+        self.dirty = False
+        data = {"version": 1, "phrases": self.items()}
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError:
+            self.dirty = True
+            raise
+        return True
+
+    def load(self, path: str) -> int:
+        """Merge a snapshot written by :meth:`save`: weights are raised to the saved ones. Returns phrases read."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        phrases = data.get("phrases", [])
+        for text, weight in phrases:
+            current = self._weights.get(phrase_key(text).strip(), 0.0)
+            if weight > current:
+                self.add(text, weight - current)
+        self.dirty = False
+        return len(phrases)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def seed_phrases() -> Iterable[str]:
+    """Eval dataset questions and ``mock_translate`` intent examples."""
+    from app.services.nl_to_sql import INTENTS
+
+    for intent in INTENTS:
+        yield from intent.examples
+    try:
+        with open(DATASET_PATH, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)["question"]
+    except OSError:
+        logger.warning("Eval dataset not found; suggestions start from the intent examples only")
+
+
+@lru_cache
+def get_suggestion_trie() -> SuggestionTrie:
+    settings = get_settings()
+    trie = SuggestionTrie(settings.suggest_max_phrases)
+    for text in seed_phrases():
+        trie.add(text)
+    path = settings.suggest_snapshot_path
+    if path and os.path.exists(path):
+        try:
+            trie.load(path)
+        except (OSError, ValueError, TypeError):
+            logger.exception("Ignoring unreadable suggestion snapshot", extra={"path": path})
+    trie.dirty = False
+    return trie
@@ -0,0 +1,61 @@
+"""Per-request stage timings.
+
+``/nl-query`` times its stages (translate, validate, execute, serialize) and
+reports them in a ``Server-Timing`` header, e.g.
+``translate;dur=0.41, validate;dur=0.08, execute;dur=2.95, serialize;dur=0.37``
+(milliseconds). Browsers' dev tools show the header as is; the eval harness
+parses it to report per-stage percentiles.
+
+Code below the endpoint (the LLM call, the grammar load) records into the
+request's timer through :func:`stage`, which finds it via a context variable.
+"""
+from __future__ import annotations
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import ContextManager, Dict, Iterator, Optional
+
+_current: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages: Dict[str, float] = {}  # stage -> seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def bind(self) -> Iterator["StageTimer"]:
+        """Make this the timer :func:`stage` records into (for the current task)."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items())
+
+
+def stage(name: str) -> ContextManager[None]:
+    """Time a block into the current request's timer; a no-op outside a request."""
+    timer = _current.get()
+    return timer.stage(name) if timer is not None else nullcontext()
+
+
+def parse_server_timing(value: str) -> Dict[str, float]:
+    """``Server-Timing`` header -> {stage: milliseconds} (entries without ``dur`` are skipped)."""
+    out: Dict[str, float] = {}
+    for entry in value.split(","):
+        name, *params = (p.strip() for p in entry.split(";"))
+        for param in params:
+            key, _, raw = param.partition("=")
+            if key == "dur" and name:
+                out[name] = float(raw.strip('"'))
+    return out
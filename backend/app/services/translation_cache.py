@@ -0,0 +1,189 @@
+"""NL -> SQL translation cache.
+
+Two tiers: an in-process LRU (OrderedDict) and an optional SQLite file that
+several uvicorn workers can share. Entries expire after ``ttl`` seconds in
+both tiers. Keys combine the normalized question with the model name and the
+grammar digest, so a model switch or grammar edit never serves stale SQL.
+
+Disk reads and writes happen outside the memory lock, so a slow SQLite write
+never holds up memory hits; the async path runs them on the worker pool (see
+``nl_to_sql.atranslate``). Expired rows are purged every ``PURGE_EVERY`` puts.
+"""
+from __future__ import annotations
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+from app.config import get_settings
+
+_NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20,
+    "thirty": 30, "forty": 40, "fifty": 50, "hundred": 100,
+}
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}\b)")
+# Operators become words so "age > 30" and "age < 30" keep different keys.
+_OPERATORS = {">=": "ge", "=>": "ge", "<=": "le", "=<": "le", "!=": "ne", "<>": "ne", "==": "eq",
+              ">": "gt", "<": "lt", "=": "eq", "+": "plus", "*": "times"}
+_OPERATOR_RE = re.compile("|".join(re.escape(op) for op in sorted(_OPERATORS, key=len, reverse=True)))
+_PUNCT_RE = re.compile(r"[^\w\s.@%'-]")
+# '.', '@', '-', '%' and "'" survive only inside a token (gmail.com, a@b, 30-day)
+_LOOSE_RE = re.compile(r"(?<!\w)[.@%'-]+|[.@%'-]+(?!\w)")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+PURGE_EVERY = 256  # puts between deletes of expired SQLite rows
+
+
+def _canonical_number(m: "re.Match[str]") -> str:
+    text = m.group()
+    if "." in text:
+        value = float(text)
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(int(text))
+
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question: case, whitespace, punctuation and numbers folded.
+
+    Comparison and arithmetic operators are kept, spelled as words.
+
+    >>> normalize_question("  Show the FIRST five users!! ")
+    'show the first 5 users'
+    >>> normalize_question("Sum balance, last 024 hours?")
+    'sum balance last 24 hours'
+    >>> normalize_question("users with age>=30")
+    'users with age ge 30'
+    """
+    q = unicodedata.normalize("NFKC", question).lower()
+    q = _THOUSANDS_RE.sub("", q)
+    q = _OPERATOR_RE.sub(lambda m: f" {_OPERATORS[m.group()]} ", q)
+    q = _PUNCT_RE.sub(" ", q)
+    q = _LOOSE_RE.sub(" ", q)
+    words = [str(_NUMBER_WORDS[w]) if w in _NUMBER_WORDS else w for w in q.split()]
+    return _NUMBER_RE.sub(_canonical_number, " ".join(words))
+
+
+def cache_key(question: str, model: str, grammar_digest: str) -> str:
+    raw = f"{model}\x00{grammar_digest}\x00{normalize_question(question)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """LRU + TTL cache of translated SQL with an optional SQLite tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 86400.0,
+        path: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._clock = clock
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()  # one sqlite3 connection, used by one thread at a time
+        self._db: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, sql TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def has_disk_tier(self) -> bool:
+        return self._db is not None
+
+    def get(self, key: str) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                sql, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return sql
+                del self._memory[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT sql, expires_at FROM translations WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key: str, sql: str) -> None:
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._remember(key, sql, expires_at)
+            if self._db is None:
+                return
+            self._puts += 1
+            purge = self._puts % PURGE_EVERY == 0
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, sql, expires_at) VALUES (?, ?, ?)", (key, sql, expires_at)
+            )
+            if purge:
+                self._db.execute("DELETE FROM translations WHERE expires_at <= ?", (self._clock(),))
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM translations")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _remember(self, key: str, sql: str, expires_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (sql, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+
+@lru_cache
+def get_translation_cache() -> TranslationCache:
+    settings = get_settings()
+    return TranslationCache(
+        max_entries=settings.translation_cache_size,
+        ttl=settings.translation_cache_ttl,
+        path=settings.translation_cache_path,
+    )
@@ -0,0 +1,102 @@
+"""Microbenchmarks for the per-request hot paths.
+
+Run from backend/:  python -m benchmarks.bench_hot_paths [--only validate] [--rows 10000]
+
+* ``mock_translate`` over the eval questions;
+* ``validate_sql`` cold (recognizer memo cleared) and warm, and ``_safety_check``;
+* grammar loading: BNF parse and recognizer compile;
+* result-row construction: ``execute_sql`` on the mock engine, and the
+  ``dict(zip(names, row))`` loop the ClickHouse path runs over ``result_rows``.
+
+Each line is the best of ``--repeat`` runs, per call.
+"""
+from __future__ import annotations
+import argparse
+import timeit
+from typing import Callable, List, Tuple
+from app.config import get_settings
+from app.services.clickhouse_client import _safety_check
+from app.services.grammar import load_grammar_text, parse_grammar
+from app.services.mock_engine import MockEngine
+from app.services.nl_to_sql import mock_translate
+from app.services.sql_parser import SqlParser, get_parser, validate_sql
+from benchmarks.bench_mock_engine import synthetic_table
+from benchmarks.bench_mock_translate import QUESTIONS, _dataset_questions
+
+
+def _per_call(fn: Callable[[], object], calls: int, number: int, repeat: int) -> float:
+    """Best seconds per call, where one ``fn()`` performs ``calls`` calls."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / (number * calls)
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds * 1e6:9.2f} us"
+
+
+def translate_cases(args) -> List[Tuple[str, float]]:
+    questions = QUESTIONS + _dataset_questions()
+    return [("mock_translate", _per_call(lambda: [mock_translate(q) for q in questions], len(questions), 200, args.repeat))]
+
+
+def validate_cases(args) -> List[Tuple[str, float]]:
+    statements = sorted({mock_translate(q) for q in QUESTIONS + _dataset_questions()})
+    parser = get_parser()
+
+    def cold():
+        parser.parse.cache_clear()
+        for sql in statements:
+            validate_sql(sql)
+
+    return [
+        ("validate_sql (cold)", _per_call(cold, len(statements), 20, args.repeat)),
+        ("validate_sql (memoized)", _per_call(lambda: [validate_sql(s) for s in statements], len(statements), 200, args.repeat)),
+        ("_safety_check (memoized)", _per_call(lambda: [_safety_check(s) for s in statements], len(statements), 200, args.repeat)),
+    ]
+
+
+def grammar_cases(args) -> List[Tuple[str, float]]:
+    text = load_grammar_text(get_settings().grammar_path)
+    grammar = parse_grammar(text)
+    return [
+        ("grammar parse (BNF)", _per_call(lambda: parse_grammar(text), 1, 20, args.repeat)),
+        ("recognizer compile", _per_call(lambda: SqlParser(grammar), 1, 5, args.repeat)),
+    ]
+
+
+def rows_cases(args) -> List[Tuple[str, float]]:
+    engine = MockEngine(synthetic_table(args.rows))
+    sql = f"SELECT * FROM default.MOCK_DATA LIMIT {args.rows}"
+    names, data = engine.execute_lists(sql)
+    result_rows = list(zip(*data))  # what clickhouse_connect hands back in result_rows
+    n = len(result_rows)
+    return [
+        (f"mock engine execute ({n} rows), per row", _per_call(lambda: engine.execute(sql), n, 3, args.repeat)),
+        (f"dict(zip()) row build ({n} rows), per row", _per_call(
+            lambda: [dict(zip(names, row)) for row in result_rows], n, 3, args.repeat
+        )),
+    ]
+
+
+SUITES = {
+    "translate": translate_cases,
+    "validate": validate_cases,
+    "grammar": grammar_cases,
+    "rows": rows_cases,
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--only", choices=sorted(SUITES), nargs="+", help="Run only these suites")
+    ap.add_argument("--rows", type=int, default=10_000, help="Result size for the row-construction suite")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    for suite in args.only or SUITES:
+        for label, seconds in SUITES[suite](args):
+            print(f"{suite:>9}  {_fmt(seconds)}  {label}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Mock engine latency over a synthetic MOCK_DATA table.
+
+Run from backend/:  python -m benchmarks.bench_mock_engine [--rows N] [--repeat R]
+"""
+from __future__ import annotations
+import argparse
+import time
+from app.services.ingest import synthetic_batches
+from app.services.mock_engine import MockEngine, Table
+
+QUERIES = [
+    "SELECT count(*) FROM default.MOCK_DATA",
+    "SELECT count(*) FROM default.MOCK_DATA WHERE is_active = true AND (age > 30 OR country IN ('China', 'Peru'))",
+    "SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractHours(now(), 720)",
+    "SELECT * FROM default.MOCK_DATA WHERE name ILIKE 'A%' LIMIT 10",
+    "SELECT country, count(*) AS cnt FROM default.MOCK_DATA GROUP BY country ORDER BY cnt DESC",
+    "SELECT subscription_plane, avg(balance) AS avg_balance FROM default.MOCK_DATA "
+    "GROUP BY subscription_plane ORDER BY avg_balance DESC",
+    "SELECT country, subscription_plane, min(age), max(last_login) FROM default.MOCK_DATA "
+    "GROUP BY country, subscription_plane HAVING count(*) > 10",
+    "SELECT name, balance FROM default.MOCK_DATA ORDER BY balance DESC LIMIT 10",
+]
+
+def synthetic_table(rows: int, seed: int = 0) -> Table:
+    """``rows`` rows from the ingest generator (the data ``scripts/init_clickhouse.py --synthetic`` loads)."""
+    return Table.from_columns(next(synthetic_batches(rows, max(rows, 1), seed), {}), source=f"synthetic:{rows}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    start = time.perf_counter()
+    engine = MockEngine(synthetic_table(args.rows))
+    print(f"rows: {args.rows}  build: {time.perf_counter() - start:.2f}s")
+    for sql in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            result = engine.execute(sql)
+            timings.append(time.perf_counter() - t0)
+        print(f"{min(timings) * 1000:8.1f} ms  {len(result):4d} rows  {sql[:90]}")
+
+
+if __name__ == "__main__":
+    main()
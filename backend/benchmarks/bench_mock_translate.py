@@ -0,0 +1,171 @@
+"""Microbenchmark: table-driven mock_translate vs. the original regex cascade.
+
+Run from backend/:  python -m benchmarks.bench_mock_translate [--number N]
+
+The legacy implementation is kept verbatim below as the baseline; the
+benchmark also asserts both produce identical SQL for every question.
+"""
+from __future__ import annotations
+import argparse
+import json
+import timeit
+from pathlib import Path
+from app.services.nl_to_sql import mock_translate
+
+QUESTIONS = [
+    "Count all users",
+    "What is the average age of users?",
+    "Sum total balance in the last 30 hours",
+    "count per country",
+    "first 10 users whose name starts with a",
+    "show 5 users where name contains ali",
+    "Show users from US",
+    "List users where subscription plan pro",
+    "emails with domain gmail.com",
+    "Show the first 5 users",
+    "recent signups",
+    "avg balance per plan",
+    "what is this",
+]
+
+
+def legacy_mock_translate(nl: str) -> str:
+    """Heuristic NL -> SQL for the MOCK_DATA table matching our restricted grammar.
+
+    Supports a handful of analytic intents so the frontend + eval harness work
+    without a real model. All outputs MUST conform to grammar constraints:
+      - Only references table default.MOCK_DATA
+      - Uses allowed aggregates / columns
+    """
+    q = nl.lower()
+
+    # Count users
+    if ("count" in q or "how many" in q) and ("user" in q or "record" in q or "rows" in q or "entries" in q):
+        return "SELECT count(*) FROM default.MOCK_DATA"
+
+    # Average age
+    if ("average" in q or "avg" in q) and "age" in q:
+        return "SELECT avg(age) FROM default.MOCK_DATA"
+
+    # Sum / total balance
+    if ("sum" in q or "total" in q) and ("balance" in q or "balances" in q):
+        # Normalize time window phrases to ClickHouse syntax using subtractHours/Days(now())
+        import re
+        # Match 'last N hours' or 'last N days'
+        m = re.search(r"last\s+(\d{1,3})\s+(hour|hours|day|days)", q)
+        if m:
+            n = m.group(1)
+            unit = m.group(2)
+            if 'hour' in unit:
+                return f"SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractHours(now(), {n})"
+            else:
+                return f"SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractDays(now(), {n})"
+        return "SELECT sum(balance) FROM default.MOCK_DATA"
+
+    # Active users count
+    if ("active" in q and ("users" in q or "user" in q)) or "active user" in q:
+        return "SELECT count(*) FROM default.MOCK_DATA WHERE is_active = true"
+
+    # Group by country counts
+    if ("count" in q or "number" in q) and "country" in q and ("per" in q or "by" in q):
+        return "SELECT country, count(*) AS cnt FROM default.MOCK_DATA GROUP BY country ORDER BY cnt DESC"
+
+    # Pattern-related heuristics
+    import re
+
+    # Name starts with letter pattern
+    m = re.search(r"name\s+(starts|starting|begins)\s+with\s+([a-z])", q)
+    if m:
+        letter = m.group(2).upper()
+        limit_m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
+        if limit_m:
+            n = limit_m.group(2)
+            return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '{letter}%' LIMIT {n}"
+        return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '{letter}%'"
+
+    # Name contains substring
+    m = re.search(r"name\s+contains\s+([a-z0-9]+)", q)
+    if m:
+        part = m.group(1)
+        limit_m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
+        if limit_m:
+            n = limit_m.group(2)
+            return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{part}%' LIMIT {n}"
+        return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{part}%'"
+
+    # Name ends with letter(s)
+    m = re.search(r"name\s+ends\s+with\s+([a-z]+)", q)
+    if m:
+        suffix = m.group(1)
+        limit_m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
+        if limit_m:
+            n = limit_m.group(2)
+            return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{suffix}' LIMIT {n}"
+        return f"SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%{suffix}'"
+
+    # Users from a specific country (phrases: users from US / users in US / country = US)
+    m = re.search(r"(users|user).*\b(from|in)\s+([a-z]{2})\b", q)
+    if m:
+        country = m.group(3).upper()
+        return f"SELECT * FROM default.MOCK_DATA WHERE country = '{country}'"
+
+    # Filter by subscription plan
+    # Subscription plan words often appear like: subscription plan pro / plan is pro / plan = pro
+    m = re.search(r"(subscription\s+plan|plan)(\s+(is|=))?\s+([a-z]+)", q)
+    if m:
+        plan = m.group(4)
+        return f"SELECT * FROM default.MOCK_DATA WHERE subscription_plane = '{plan}'"
+
+    # Email domain queries: emails with domain gmail.com
+    m = re.search(r"email(s)?\s+(with|having)?\s*domain\s+([a-z0-9\.-]+)", q)
+    if m:
+        domain = m.group(3)
+        return f"SELECT * FROM default.MOCK_DATA WHERE email ILIKE '%@{domain}'"
+
+    # LIMIT detection (show first 10 users)
+    m = re.search(r"(first|top|show)\s+(\d{1,3})\s+(users|user|rows|records)", q)
+    if m:
+        n = m.group(2)
+        # Basic list projection with LIMIT
+        return f"SELECT * FROM default.MOCK_DATA LIMIT {n}"
+
+    # Recent signups (default to last 7 days)
+    if ("recent" in q or "last week" in q) and ("signup" in q or "sign ups" in q or "signups" in q):
+        return "SELECT count(*) FROM default.MOCK_DATA WHERE signup_date >= subtractDays(now(), 7)"
+
+    # Average balance by subscription plan
+    if ("average" in q or "avg" in q) and ("balance" in q) and ("plan" in q or "subscription" in q):
+        return "SELECT subscription_plane, avg(balance) AS avg_balance FROM default.MOCK_DATA GROUP BY subscription_plane ORDER BY avg_balance DESC"
+
+    # Fallback
+    return "SELECT count(*) FROM default.MOCK_DATA"
+
+
+def _dataset_questions():
+    path = Path(__file__).resolve().parent.parent / "evals" / "dataset.jsonl"
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line)["question"] for line in f if line.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--number", type=int, default=2000, help="Passes over the question set")
+    args = ap.parse_args()
+    questions = QUESTIONS + _dataset_questions()
+    for q in questions:
+        assert mock_translate(q) == legacy_mock_translate(q), q
+
+    def run(fn):
+        best = min(timeit.repeat(lambda: [fn(q) for q in questions], number=args.number, repeat=5))
+        return best / (args.number * len(questions)) * 1e6
+
+    legacy = run(legacy_mock_translate)
+    table = run(mock_translate)
+    print(f"questions: {len(questions)}")
+    print(f"legacy cascade:    {legacy:7.2f} us/call")
+    print(f"intent table:      {table:7.2f} us/call")
+    print(f"speedup:           {legacy / table:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
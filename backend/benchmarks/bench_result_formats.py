@@ -0,0 +1,56 @@
+"""Encode time and payload size of the /nl-query result formats.
+
+Run from backend/:  python -m benchmarks.bench_result_formats [--rows 1000 10000 100000]
+
+Each format is produced the way the endpoint does it: ``rows`` through FastAPI's
+encoder + json.dumps, ``columnar`` as compact JSON lists, ``arrow`` as an IPC
+stream straight from the engine's NumPy columns.
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from app.main import _json_default
+from app.services.mock_engine import MockEngine
+from app.services.result_formats import arrow_ipc, arrow_table
+from benchmarks.bench_mock_engine import synthetic_table
+
+
+def _best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        timings.append(time.perf_counter() - t0)
+    return min(timings), out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    engine = MockEngine(synthetic_table(max(args.rows)))
+    print(f"{'rows':>8} {'format':>9} {'encode ms':>10} {'bytes':>12}")
+    for n in args.rows:
+        sql = f"SELECT * FROM default.MOCK_DATA LIMIT {n}"
+
+        def rows():
+            return json.dumps(jsonable_encoder({"sql": sql, "rows": engine.execute(sql)})).encode()
+
+        def columnar():
+            names, data = engine.execute_lists(sql)
+            payload = {"sql": sql, "columns": names, "data": data}
+            return json.dumps(payload, default=_json_default, separators=(",", ":")).encode()
+
+        def arrow():
+            return arrow_ipc(arrow_table(*engine.execute_columns(sql)), {"sql": sql})
+
+        for name, fn in (("rows", rows), ("columnar", columnar), ("arrow", arrow)):
+            seconds, body = _best(fn, args.repeat)
+            print(f"{n:>8} {name:>9} {seconds * 1000:>10.1f} {len(body):>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Semantic translation cache: lookup latency and memory at scale.
+
+Run from backend/:  python -m benchmarks.bench_semantic_cache [--entries 100000] [--lookups 2000]
+
+Fills the index with ``--entries`` distinct generated questions (each a
+random phrasing around one of the mock intents), then times lookups of
+paraphrases (hits, including the grammar check of the refilled SQL) and of
+unrelated questions (misses).
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+import resource
+from typing import List, Tuple
+from app.services.semantic_cache import SemanticCache
+
+TABLE = "default.MOCK_DATA"
+BASES: List[Tuple[str, str]] = [
+    ("show the first {n} users", f"SELECT * FROM {TABLE} LIMIT {{n}}"),
+    ("users from {c}", f"SELECT * FROM {TABLE} WHERE country = '{{C}}'"),
+    ("sum balance in the last {n} hours", f"SELECT sum(balance) FROM {TABLE} WHERE signup_date >= subtractHours(now(), {{n}})"),
+    ("users whose name starts with {w}", f"SELECT * FROM {TABLE} WHERE name ILIKE '{{W}}%'"),
+    ("count users older than {n}", f"SELECT count(*) FROM {TABLE} WHERE age > {{n}}"),
+]
+FILLER = (
+    "active inactive premium basic free recent old new loyal churned vip trial monthly yearly european asian "
+    "american mobile desktop verified unverified flagged internal external beta legacy enterprise small large"
+).split()
+TOPICS = "balance age signup login plan country email name status region cohort segment tier".split()
+
+
+def _question(rng: random.Random) -> Tuple[str, str]:
+    template, sql = rng.choice(BASES)
+    extra = " ".join(rng.sample(FILLER, rng.randint(1, 3)) + rng.sample(TOPICS, rng.randint(1, 2)))
+    n, c, w = str(rng.randint(1, 999)), rng.choice(["us", "fr", "de", "cn"]), rng.choice("abcdefg")
+    question = f"{extra} {template.format(n=n, c=c, w=w)}"
+    return question, sql.format(n=n, C=c.upper(), W=w.upper())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--entries", type=int, default=100_000)
+    ap.add_argument("--lookups", type=int, default=2000)
+    args = ap.parse_args()
+    rng = random.Random(0)
+    cache = SemanticCache(max_entries=args.entries)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    added: List[str] = []
+    while len(cache._entries) < args.entries:
+        question, sql = _question(rng)
+        if cache.add(question, sql):
+            added.append(question)
+    build = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+    print(f"entries: {len(cache._entries)}  build: {build:.1f}s  peak RSS growth: {rss / 1024:.0f} MiB")
+
+    hits = [q.replace("show", "list").replace("users", "customers") for q in rng.sample(added, args.lookups)]
+    misses = [f"{rng.choice(TOPICS)} histogram for {rng.choice(FILLER)} accounts" for _ in range(args.lookups)]
+    for label, questions in (("paraphrase", hits), ("unrelated", misses)):
+        found = 0
+        t0 = time.perf_counter()
+        for q in questions:
+            found += cache.lookup(q) is not None
+        per_call = (time.perf_counter() - t0) / len(questions)
+        print(f"{label:<11} {per_call * 1e6:8.1f} us/lookup  hits {found}/{len(questions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""End-to-end load generator for a running backend.
+
+Run from backend/:
+
+    # start a stub LLM + uvicorn (mock ClickHouse engine) and drive them
+    python -m benchmarks.loadgen --spawn --llm-latency-ms 300 --concurrency 32 --duration 20
+    # or an already running server (CPU/memory need its pid)
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --server-pid 1234 --rps 200
+
+``--concurrency`` keeps N requests in flight (closed loop). ``--rps`` sends on a
+fixed schedule (open loop). In that mode latency is measured from the scheduled
+send time, so a stalled server is not hidden by the generator waiting for it.
+Questions cycle through ``evals/dataset.jsonl``. The report has throughput, a
+latency histogram and percentiles, status counts, and (Linux ``/proc``) the
+server's CPU time and RSS per request. ``--spawn`` needs no network: the LLM is
+``benchmarks.stub_llm`` and queries run on the in-process mock engine
+(``MOCK_CLICKHOUSE=true``).
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import httpx
+from evals.run_evals import load_cases, summarize
+
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+# --- server process stats (Linux /proc) ---------------------------------------------
+
+def process_stats(pid: int) -> Optional[Dict[str, float]]:
+    """CPU seconds (user + system) and RSS / peak RSS in MiB, or None off Linux."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    fields = stat.rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    mem = {line.split(":")[0]: int(line.split()[1]) for line in status.splitlines() if line.startswith(("VmRSS", "VmHWM"))}
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / ticks,  # utime, stime
+        "rss_mib": mem.get("VmRSS", 0) / 1024,
+        "peak_rss_mib": mem.get("VmHWM", 0) / 1024,
+    }
+
+
+# --- spawning the stack ---------------------------------------------------------------
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+@contextmanager
+def spawn_stack(args) -> Iterator[subprocess.Popen]:
+    """Stub LLM plus one uvicorn worker; yields the server process."""
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    procs = []
+    try:
+        procs.append(subprocess.Popen([
+            sys.executable, "-m", "benchmarks.stub_llm", "--port", str(args.llm_port),
+            "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+        ]))
+        _wait_ready(f"{llm_url}/stats")
+        env = {
+            **os.environ,
+            "MOCK_MODE": "false",
+            "MOCK_CLICKHOUSE": "true",
+            "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-stub"),
+            "OPENAI_BASE_URL": f"{llm_url}/v1",
+            "LOG_LEVEL": "WARNING",
+        }
+        env.update(kv.split("=", 1) for kv in args.server_env)
+        server = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning",
+        ], env=env)
+        procs.append(server)
+        _wait_ready(f"http://127.0.0.1:{args.port}/health")
+        yield server
+    finally:
+        for p in reversed(procs):
+            p.terminate()
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+# --- load ---------------------------------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+
+    def record(self, started: float, status: str) -> None:
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        self.statuses[status] += 1
+
+
+async def _request(ac: httpx.AsyncClient, endpoint: str, question: str, started: float, rec: Recorder) -> None:
+    try:
+        r = await ac.post(endpoint, json={"question": question})
+        status = str(r.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    rec.record(started, status)
+
+
+async def closed_loop(ac, endpoint: str, questions: Iterator[str], concurrency: int, duration: float, rec: Recorder):
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await _request(ac, endpoint, next(questions), time.perf_counter(), rec)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(ac, endpoint: str, questions: Iterator[str], rps: float, duration: float, rec: Recorder):
+    start = time.perf_counter()
+    tasks = []
+    for i in itertools.count():
+        scheduled = start + i / rps
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(_request(ac, endpoint, next(questions), scheduled, rec)))
+    await asyncio.gather(*tasks)
+
+
+def histogram(latencies_ms: List[float]) -> List[Dict[str, float]]:
+    counts = [0] * len(BUCKETS_MS)
+    for v in latencies_ms:
+        counts[next(i for i, edge in enumerate(BUCKETS_MS) if v <= edge)] += 1
+    return [{"le_ms": edge, "count": c} for edge, c in zip(BUCKETS_MS, counts)]
+
+
+async def run_load(args, url: str, pid: Optional[int]) -> dict:
+    questions = itertools.cycle([c["question"] for c in load_cases()])
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100), max_keepalive_connections=max(args.concurrency, 100))
+    rec = Recorder()
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as ac:
+        before = process_stats(pid) if pid else None
+        start = time.perf_counter()
+        if args.rps:
+            await open_loop(ac, args.endpoint, questions, args.rps, args.duration, rec)
+        else:
+            await closed_loop(ac, args.endpoint, questions, args.concurrency, args.duration, rec)
+        wall = time.perf_counter() - start
+        after = process_stats(pid) if pid else None
+    total = len(rec.latencies_ms)
+    report = {
+        "config": {
+            "url": url, "endpoint": args.endpoint, "duration": args.duration,
+            "mode": "open" if args.rps else "closed",
+            "rps_target": args.rps, "concurrency": None if args.rps else args.concurrency,
+        },
+        "requests": total,
+        "statuses": dict(rec.statuses),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "latency_ms": summarize(rec.latencies_ms),
+        "histogram": histogram(rec.latencies_ms),
+    }
+    if before and after and total:
+        report["server"] = {
+            "cpu_ms_per_request": round((after["cpu_seconds"] - before["cpu_seconds"]) * 1000 / total, 3),
+            "rss_mib": round(after["rss_mib"], 1),
+            "rss_growth_kib_per_request": round((after["rss_mib"] - before["rss_mib"]) * 1024 / total, 3),
+            "peak_rss_mib": round(after["peak_rss_mib"], 1),
+        }
+    return report
+
+
+def print_report(report: dict) -> None:
+    lat = report["latency_ms"]
+    print(f"requests: {report['requests']}  statuses: {report['statuses']}")
+    print(f"throughput: {report['throughput_rps']} req/s over {report['wall_seconds']}s")
+    print("latency ms: " + "  ".join(f"{k} {v}" for k, v in lat.items()))
+    peak = max((b["count"] for b in report["histogram"]), default=0) or 1
+    for b in report["histogram"]:
+        label = "inf" if b["le_ms"] == float("inf") else f"{b['le_ms']:g}"
+        print(f"  <= {label:>5} ms {b['count']:>8}  {'#' * round(40 * b['count'] / peak)}")
+    if "server" in report:
+        print("server: " + "  ".join(f"{k} {v}" for k, v in report["server"].items()))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--endpoint", default="/nl-query")
+    ap.add_argument("--server-pid", type=int, help="pid of the server, for CPU/memory per request")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=16, help="requests in flight (closed loop, default)")
+    mode.add_argument("--rps", type=float, help="target request rate (open loop)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--report", type=Path, help="write the JSON report here")
+    ap.add_argument("--spawn", action="store_true", help="start the stub LLM and a uvicorn server first")
+    ap.add_argument("--port", type=int, default=8765, help="server port with --spawn")
+    ap.add_argument("--llm-port", type=int, default=9100)
+    ap.add_argument("--llm-latency-ms", type=float, default=300.0)
+    ap.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    ap.add_argument("--server-env", nargs="*", default=[], metavar="KEY=VALUE",
+                    help="extra server settings with --spawn, e.g. TRANSLATION_CACHE_SIZE=0")
+    args = ap.parse_args()
+
+    if args.spawn:
+        with spawn_stack(args) as server:
+            report = asyncio.run(run_load(args, f"http://127.0.0.1:{args.port}", server.pid))
+    else:
+        report = asyncio.run(run_load(args, args.url, args.server_pid))
+    print_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Local stand-in for the OpenAI chat completions API, for load tests without network.
+
+Run from backend/:  python -m benchmarks.stub_llm --port 9100 --latency-ms 300 --jitter-ms 100
+
+Point the backend at it with ``OPENAI_BASE_URL=http://127.0.0.1:9100/v1`` and any
+``OPENAI_API_KEY``. Each completion sleeps ``latency ± jitter`` (asyncio, so
+concurrent calls overlap like a real API) and answers with ``mock_translate``
+of the last user message. ``--error-rate`` makes a share of calls return 500.
+With ``"stream": true`` the answer is sent as server-sent events, one word per
+chunk, ``--token-ms`` apart after the first.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.nl_to_sql import mock_translate
+
+
+async def _sse(content: str, model: str, token_ms: float):
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+    for i, piece in enumerate(re.findall(r"\s*\S+", content)):
+        if i and token_ms:
+            await asyncio.sleep(token_ms / 1000)
+        choice = {"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}
+        yield f"data: {json.dumps({**base, 'choices': [choice]})}\n\n"
+    yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def create_app(
+    latency_ms: float = 300.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0, token_ms: float = 0.0,
+) -> FastAPI:
+    app = FastAPI(title="stub LLM")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "stub failure", "type": "server_error"}}, status_code=500)
+        question = next((m["content"] for m in reversed(body["messages"]) if m["role"] == "user"), "")
+        sql = mock_translate(question)
+        if body.get("stream"):
+            return StreamingResponse(_sse(sql, body.get("model", "stub"), token_ms), media_type="text/event-stream")
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": sql}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency-ms", type=float, default=300.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--token-ms", type=float, default=0.0, help="delay between streamed chunks")
+    args = ap.parse_args()
+    import uvicorn
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.error_rate, token_ms=args.token_ms),
+        host=args.host, port=args.port, log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
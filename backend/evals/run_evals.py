@@ -1,39 +1,161 @@
-import json, re, sys
+"""Eval runner: correctness plus latency for every case in ``dataset.jsonl``.
+
+Cases run concurrently against ``/nl-query`` (in-process by default, or a live
+server with ``--base-url``). Stage timings come from the ``Server-Timing``
+header; ``total`` is measured by the client. The JSON report can be saved with
+``--report`` and later passed as ``--baseline`` to fail on latency regressions.
+
+    python -m evals.run_evals --parallelism 16 --repeat 5 --report evals/report.json
+    python -m evals.run_evals --baseline evals/report.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
 from pathlib import Path
-from fastapi.testclient import TestClient
-from app.main import app
-
-client = TestClient(app)
-
-def run():
-    dataset_path = Path(__file__).parent / 'dataset.jsonl'
-    cases = [json.loads(l) for l in dataset_path.read_text().splitlines() if l.strip()]
-    results = []
-    passed = 0
-    for case in cases:
-        r = client.post('/nl-query', json={'question': case['question']})
-        if r.status_code != 200:
-            results.append({"id": case['id'], "status": "error", "detail": r.text})
-            continue
-        data = r.json()
-        sql = data['sql']
-        ok = re.search(case['expect_sql_regex'], sql, re.IGNORECASE) is not None
-        row_ok = isinstance(data.get('rows'), list)
-        status = 'pass' if ok and row_ok else 'fail'
-        if status == 'pass':
-            passed += 1
-        results.append({
-            'id': case['id'],
-            'status': status,
-            'sql': sql,
-            'rows': data.get('rows'),
-            'mocked': data.get('mocked'),
-        })
-    print(json.dumps({
-        'summary': {'total': len(cases), 'passed': passed, 'failed': len(cases)-passed},
-        'results': results
-    }, indent=2))
-    return 0 if passed == len(cases) else 1
+from typing import Dict, List, Optional
+import httpx
+from app.services.timing import parse_server_timing
+
+DATASET = Path(__file__).parent / 'dataset.jsonl'
+STAGES = ('translate', 'validate', 'execute', 'serialize', 'total')
+PERCENTILES = (50, 95, 99)
+
+
+def load_cases(path: Path = DATASET) -> List[dict]:
+    return [json.loads(l) for l in path.read_text().splitlines() if l.strip()]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Linear interpolation between closest ranks (numpy's default method)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lo = int(rank)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    out = {f'p{p}': round(percentile(values, p), 3) for p in PERCENTILES}
+    out['mean'] = round(sum(values) / len(values), 3) if values else 0.0
+    out['max'] = round(max(values), 3) if values else 0.0
+    return out
+
+
+async def _run_case(ac: httpx.AsyncClient, case: dict) -> dict:
+    start = time.perf_counter()
+    r = await ac.post('/nl-query', json={'question': case['question']})
+    timings = parse_server_timing(r.headers.get('server-timing', ''))
+    timings['total'] = (time.perf_counter() - start) * 1000
+    if r.status_code != 200:
+        return {'id': case['id'], 'status': 'error', 'detail': r.text, 'timings': timings}
+    data = r.json()
+    sql = data['sql']
+    ok = re.search(case['expect_sql_regex'], sql, re.IGNORECASE) is not None
+    row_ok = isinstance(data.get('rows'), list)
+    return {
+        'id': case['id'],
+        'status': 'pass' if ok and row_ok else 'fail',
+        'sql': sql,
+        'row_count': len(data['rows']) if row_ok else None,
+        'mocked': data.get('mocked'),
+        'cached': data.get('cached'),
+        'timings': timings,
+    }
+
+
+async def run_cases(cases: List[dict], parallelism: int = 8, repeat: int = 1, base_url: Optional[str] = None) -> dict:
+    """Run every case ``repeat`` times with at most ``parallelism`` requests in flight."""
+    if base_url:
+        ac = httpx.AsyncClient(base_url=base_url, timeout=60)
+    else:
+        from app.main import _warmup, app
+        _warmup()  # what the lifespan hook does; ASGITransport does not run it
+        ac = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://evals', timeout=60)
+    gate = asyncio.Semaphore(max(1, parallelism))
+
+    async def bounded(case):
+        async with gate:
+            return await _run_case(ac, case)
+
+    async with ac:
+        start = time.perf_counter()
+        runs = await asyncio.gather(*(bounded(c) for _ in range(repeat) for c in cases))
+        wall = time.perf_counter() - start
+
+    latency = {stage: summarize([r['timings'][stage] for r in runs if stage in r['timings']]) for stage in STAGES}
+    # One result per case: the first run decides pass/fail (repeats may be cache hits).
+    results = runs[:len(cases)]
+    for i, result in enumerate(results):
+        result['timings'] = {
+            stage: round(percentile([r['timings'][stage] for r in runs[i::len(cases)] if stage in r['timings']], 50), 3)
+            for stage in STAGES if stage in result['timings']
+        }
+    passed = sum(r['status'] == 'pass' for r in results)
+    return {
+        'summary': {
+            'total': len(cases),
+            'passed': passed,
+            'failed': len(cases) - passed,
+            'requests': len(runs),
+            'parallelism': parallelism,
+            'repeat': repeat,
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(len(runs) / wall, 2) if wall else 0.0,
+        },
+        'latency_ms': latency,
+        'results': results,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float = 0.2, min_delta_ms: float = 1.0) -> List[dict]:
+    """Stage percentiles that got slower than ``baseline`` by more than ``max_regression``
+    (a fraction) and by more than ``min_delta_ms``, which keeps sub-millisecond noise out."""
+    regressions = []
+    for stage, stats in baseline.get('latency_ms', {}).items():
+        current = report['latency_ms'].get(stage, {})
+        for p in PERCENTILES:
+            key = f'p{p}'
+            before, after = stats.get(key), current.get(key)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + max_regression) and after - before > min_delta_ms:
+                regressions.append({
+                    'stage': stage, 'percentile': key, 'baseline_ms': before, 'current_ms': after,
+                    'change': round(after / before - 1, 3) if before else None,
+                })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', type=Path, default=DATASET)
+    parser.add_argument('--parallelism', type=int, default=8, help='requests in flight (default 8)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case, for steadier percentiles')
+    parser.add_argument('--base-url', help='test a running server instead of the in-process app')
+    parser.add_argument('--report', type=Path, help='write the JSON report here')
+    parser.add_argument('--baseline', type=Path, help='earlier report to compare latencies against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='allowed slowdown fraction (default 0.2)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='ignore slowdowns below this (default 1ms)')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_cases(load_cases(args.dataset), args.parallelism, args.repeat, args.base_url))
+    status = 0 if report['summary']['failed'] == 0 else 1
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.max_regression, args.min_delta_ms)
+        report['regressions'] = regressions
+        if regressions:
+            status = 1
+    text = json.dumps(report, indent=2)
+    if args.report:
+        args.report.write_text(text + '\n')
+    print(text)
+    return status
+
 
 if __name__ == '__main__':
-    sys.exit(run())
+    sys.exit(main())
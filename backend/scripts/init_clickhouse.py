@@ -1,8 +1,22 @@
 #!/usr/bin/env python
-"""Bootstrap ClickHouse: create MOCK_DATA table & insert sample rows.
+"""Bootstrap ClickHouse: create MOCK_DATA table & bulk load it.
 
 Usage:
-  python scripts/init_clickhouse.py
+  python scripts/init_clickhouse.py                        # sample_files/MOCK_DATA.csv
+  python scripts/init_clickhouse.py --csv export.csv
+  python scripts/init_clickhouse.py --synthetic 100000000  # 100M generated rows
+  python scripts/init_clickhouse.py --synthetic 1000000000 --replace --seed 7
+
+Rows are streamed in typed batches (``--batch-rows``) and sent as
+column-oriented inserts, so memory stays flat for any size. The CSV header is
+mapped (``subscription_planve``) and its MM/DD/YYYY dates parsed. Synthetic
+rows are deterministic for a given ``--seed`` and ``--anchor`` (the date the
+five years of signups run up to). Without ``--replace`` a table that already
+has rows is left alone.
+
+The rollup tables and materialized views of ``app.services.rollups`` (and the
+base table's projections) are created too. The views aggregate rows as they
+are inserted; rows loaded before a view existed are backfilled once.
 
 Reads environment variables (same as backend):
   CLICKHOUSE_HOST (default localhost)
@@ -14,9 +28,18 @@ Reads environment variables (same as backend):
 Requires clickhouse-connect (already in requirements.txt)
 """
 from __future__ import annotations
+import argparse
 import os
 import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # backend/, for `app`
+
 from clickhouse_connect import get_client
+from app.services.ingest import TABLE, insert_batches, iter_csv, synthetic_batches
+from app.services.mock_engine import default_data_path
+from app.services.rollups import PROJECTIONS, ROLLUPS
 
 HOST = os.getenv("CLICKHOUSE_HOST", "localhost")
 PORT = int(os.getenv("CLICKHOUSE_PORT", "8123"))
@@ -39,16 +62,19 @@ CREATE TABLE IF NOT EXISTS default.MOCK_DATA (
 ) ENGINE = MergeTree ORDER BY id
 """
 
-INSERT_SQL = """
-INSERT INTO default.MOCK_DATA (id,name,email,age,signup_date,country,is_active,subscription_plane,last_login,balance) VALUES
-  (1,'Alice','alice@example.com',34, now()-interval 10 day,'US',1,'basic',       now()-interval 1 hour,   500),
-  (2,'Bob','bob@example.com',41,   now()-interval 20 day,'DE',0,'pro',         now()-interval 5 hour,  1250),
-  (3,'Cara','cara@example.com',29,  now()-interval  2 day,'US',1,'enterprise',  now()-interval 30 minute,3000),
-  (4,'Dan','dan@example.com',50,    now()-interval 40 day,'FR',1,'basic',       now()-interval 2 hour,   150),
-  (5,'Eve','eve@example.com',22,    now()-interval  5 day,'IN',1,'pro',         now()-interval 15 minute,850)
-"""
+def parse_args(argv=None):
+  ap = argparse.ArgumentParser(description="Create default.MOCK_DATA and bulk load it")
+  source = ap.add_mutually_exclusive_group()
+  source.add_argument("--csv", type=Path, help="CSV export with a header row (default: sample_files/MOCK_DATA.csv)")
+  source.add_argument("--synthetic", type=int, metavar="ROWS", help="generate ROWS rows instead of reading a CSV")
+  ap.add_argument("--batch-rows", type=int, default=1_000_000, help="rows per insert")
+  ap.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+  ap.add_argument("--anchor", help="synthetic data end date, YYYY-MM-DD (default today)")
+  ap.add_argument("--replace", action="store_true", help="truncate the table before loading")
+  return ap.parse_args(argv)
 
-def main():
+def main(argv=None):
+  args = parse_args(argv)
   logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "INFO").upper(),
     format="%(asctime)s %(levelname)s %(name)s - %(message)s",
@@ -56,15 +82,44 @@ def main():
   log = logging.getLogger("cfg_evals.init_clickhouse")
   client = get_client(host=HOST, port=PORT, username=USER, password=PASSWORD, database=DATABASE)
   client.command(SCHEMA_SQL)
-  # Insert only if empty
-  result = client.query("SELECT count() FROM default.MOCK_DATA")
-  count = result.result_rows[0][0]
-  if count == 0:
-    client.command(INSERT_SQL)
-    log.info("Inserted sample rows into default.MOCK_DATA")
+  create_table = client.command(f"SHOW CREATE TABLE {TABLE}")
+  new_projections = [name for name in PROJECTIONS if f"PROJECTION {name}" not in create_table]
+  for name in new_projections:
+    client.command(f"ALTER TABLE {TABLE} ADD PROJECTION IF NOT EXISTS {name} ({PROJECTIONS[name]})")
+  new_rollups = [rollup for rollup in ROLLUPS if not int(client.command(f"EXISTS TABLE {rollup.view}"))]
+  for rollup in ROLLUPS:
+    for statement in rollup.ddl():
+      client.command(statement)
+  if args.replace:
+    client.command(f"TRUNCATE TABLE {TABLE}")
+    for rollup in ROLLUPS:
+      client.command(f"TRUNCATE TABLE {rollup.table}")
+  # Load only if empty
+  count = client.query(f"SELECT count() FROM {TABLE}").result_rows[0][0]
+  if count:
+    for rollup in new_rollups:
+      log.info(f"Backfilling rollup {rollup.table} from {count:,} rows")
+      client.command(f"TRUNCATE TABLE {rollup.table}")
+      client.command(rollup.backfill_sql())
+    for name in new_projections:
+      log.info(f"Materializing projection {name}")
+      client.command(f"ALTER TABLE {TABLE} MATERIALIZE PROJECTION {name}")
+    log.info(f"Table already has {count} rows; skipping load (use --replace to reload)")
+    return
+  if args.synthetic:
+    batches = synthetic_batches(args.synthetic, args.batch_rows, args.seed, args.anchor)
+    source = f"{args.synthetic} synthetic rows (seed {args.seed})"
   else:
-    log.info(f"Table already has {count} rows; skipping insert")
-  log.info("Bootstrap complete.")
+    path = args.csv or default_data_path()
+    batches = iter_csv(path, args.batch_rows)
+    source = str(path)
+
+  def progress(rows, seconds):
+    log.info(f"{rows:,} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+
+  log.info(f"Loading {source} into {TABLE}")
+  total = insert_batches(client, batches, progress=progress)
+  log.info(f"Bootstrap complete: {total:,} rows.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import httpx
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services import clickhouse_client, metrics, nl_to_sql
+from app.services.result_cache import get_result_cache
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import get_translation_cache
+
+client = TestClient(app)
+
+
+def test_batch_mock_mode_keeps_order_and_dedupes():
+    questions = ['Show the first 5 users', 'show the FIRST 5 users!', 'Count all users', 'How many users are there']
+    resp = client.post('/nl-query/batch', json={'questions': questions})
+    assert resp.status_code == 200, resp.text
+    body = resp.json()
+    assert [r['question'] for r in body['results']] == questions
+    assert body['unique_questions'] == 3
+    assert body['unique_sql'] == 2  # both count questions map to the same SQL
+    first, again, count, how_many = body['results']
+    assert first['sql'].endswith('LIMIT 5') and len(first['rows']) == 5
+    assert again['rows'] == first['rows']
+    assert count['rows'] == how_many['rows']
+    assert all(r['status'] == 200 and r['error'] is None for r in body['results'])
+
+
+def test_batch_keeps_operator_pairs_apart(monkeypatch):
+    def fake_translate(question):
+        op = '<' if '<' in question else '>'
+        return f'SELECT * FROM default.MOCK_DATA WHERE age {op} 30 LIMIT 3'
+
+    monkeypatch.setattr(nl_to_sql, 'mock_translate', fake_translate)
+    written = metrics.RESPONSE_BYTES.value(endpoint='/nl-query/batch', format='rows')
+    resp = client.post('/nl-query/batch', json={'questions': ['users with age > 30', 'users with age < 30']})
+    body = resp.json()
+    assert body['unique_questions'] == 2 and body['unique_sql'] == 2
+    older, younger = body['results']
+    assert older['sql'].endswith('age > 30 LIMIT 3') and all(r['age'] > 30 for r in older['rows'])
+    assert younger['sql'].endswith('age < 30 LIMIT 3') and all(r['age'] < 30 for r in younger['rows'])
+    assert metrics.RESPONSE_BYTES.value(endpoint='/nl-query/batch', format='rows') == written + len(resp.content)
+
+
+def test_batch_item_errors_do_not_fail_batch(monkeypatch):
+    def fake_translate(question):
+        if 'drop' in question.lower():
+            return 'DROP TABLE default.MOCK_DATA'
+        return 'SELECT count(*) FROM default.MOCK_DATA'
+
+    monkeypatch.setattr(nl_to_sql, 'mock_translate', fake_translate)
+    body = client.post('/nl-query/batch', json={'questions': ['Count all users', 'Drop everything']}).json()
+    ok, bad = body['results']
+    assert ok['status'] == 200 and ok['rows']
+    assert bad['status'] == 400 and 'not allowed' in bad['error'] and bad['rows'] is None
+
+
+def test_batch_size_limit(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'batch_max_questions', 2)
+    resp = client.post('/nl-query/batch', json={'questions': ['Count all users'] * 3})
+    assert resp.status_code == 422
+    assert client.post('/nl-query/batch', json={'questions': []}).status_code == 422
+
+
+def test_batch_runs_questions_concurrently(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    monkeypatch.setattr(settings, 'batch_concurrency', 8)
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    get_result_cache().invalidate()
+    executed = []
+
+    async def slow_llm(question):
+        await asyncio.sleep(0.1)
+        return f"SELECT * FROM default.MOCK_DATA LIMIT {question.split()[-2]}", False
+
+    def slow_db(sql):
+        executed.append(sql)
+        time.sleep(0.05)
+        return [{'id': 1}]
+
+    monkeypatch.setattr(nl_to_sql, '_allm_translate', slow_llm)
+    monkeypatch.setattr(clickhouse_client, '_execute_uncached', slow_db)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as ac:
+            start = time.perf_counter()
+            questions = [f'show first {n % 4 + 1} users' for n in range(8)]
+            resp = await ac.post('/nl-query/batch', json={'questions': questions})
+            return resp, time.perf_counter() - start
+
+    resp, elapsed = asyncio.run(run())
+    assert resp.status_code == 200, resp.text
+    assert len(executed) == 4  # duplicates share one execution
+    assert elapsed < 8 * 0.15 / 2
@@ -0,0 +1,61 @@
+import os
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.services import clickhouse_client
+from benchmarks.loadgen import histogram, process_stats
+from benchmarks.stub_llm import create_app
+
+
+def test_stub_llm_speaks_chat_completions():
+    client = TestClient(create_app(latency_ms=0))
+    resp = client.post('/v1/chat/completions', json={
+        'model': 'gpt-5',
+        'messages': [{'role': 'system', 'content': 'grammar...'}, {'role': 'user', 'content': 'Show the first 5 users'}],
+    })
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body['object'] == 'chat.completion'
+    assert body['choices'][0]['message']['content'] == 'SELECT * FROM default.MOCK_DATA LIMIT 5'
+    assert client.get('/stats').json() == {'requests': 1, 'errors': 0}
+
+
+def test_stub_llm_streams_to_the_translator(monkeypatch):
+    from openai import OpenAI
+    from app.services import nl_to_sql
+    from app.services.semantic_cache import get_semantic_cache
+    from app.services.translation_cache import get_translation_cache
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-stub')
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    stub = TestClient(create_app(latency_ms=0))
+    llm = OpenAI(api_key='sk-stub', base_url='http://testserver/v1', http_client=stub)
+    monkeypatch.setattr(nl_to_sql, 'get_llm_client', lambda: llm)
+    t = nl_to_sql.translate('Show the first 5 users')
+    assert (t.sql, t.mocked) == ('SELECT * FROM default.MOCK_DATA LIMIT 5', False)
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+
+
+def test_stub_llm_error_rate():
+    client = TestClient(create_app(latency_ms=0, error_rate=1.0))
+    resp = client.post('/v1/chat/completions', json={'messages': [{'role': 'user', 'content': 'x'}]})
+    assert resp.status_code == 500
+
+
+def test_mock_clickhouse_uses_engine_outside_mock_mode(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'mock_clickhouse', True)
+    rows = clickhouse_client._execute_uncached('SELECT * FROM default.MOCK_DATA LIMIT 3')
+    assert [r['id'] for r in rows] == [1, 2, 3]
+
+
+def test_histogram_and_process_stats():
+    buckets = histogram([0.5, 3, 3, 700, 9000])
+    counts = {b['le_ms']: b['count'] for b in buckets}
+    assert counts[1] == 1 and counts[5] == 2 and counts[1000] == 1 and counts[float('inf')] == 1
+    stats = process_stats(os.getpid())
+    if stats is not None:  # Linux only
+        assert stats['cpu_seconds'] > 0 and stats['rss_mib'] > 0
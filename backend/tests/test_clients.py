@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.clients import ConnectionPool, PoolTimeout
+
+
+class FakeConn:
+    created = 0
+
+    def __init__(self):
+        FakeConn.created += 1
+        self.healthy = True
+        self.closed = False
+
+
+def test_pool_reuses_connections():
+    pool = ConnectionPool(FakeConn, size=2)
+    with pool.connection() as a:
+        assert pool.stats()['in_use'] == 1
+    with pool.connection() as b:
+        assert b is a
+    assert pool.stats()['open'] == 1
+
+
+def test_pool_warm_and_timeout():
+    pool = ConnectionPool(FakeConn, size=2, timeout=0.01)
+    assert pool.warm() == 2
+    with pool.connection(), pool.connection():
+        assert pool.stats()['utilization'] == 1.0
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+
+
+def test_pool_reconnects_unhealthy_and_failed():
+    pool = ConnectionPool(
+        FakeConn, size=1, health_interval=0, health_check=lambda c: c.healthy,
+        close=lambda c: setattr(c, 'closed', True),
+    )
+    with pool.connection() as first:
+        first.healthy = False
+    with pool.connection() as second:
+        assert second is not first and first.closed
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            raise RuntimeError('connection reset')
+    stats = pool.stats()
+    assert stats['reconnects'] == 2 and stats['open'] == 0 and stats['in_use'] == 0
+
+
+def test_pool_releases_on_generator_close():
+    pool = ConnectionPool(FakeConn, size=1, timeout=0.01)
+
+    def rows():
+        with pool.connection():
+            yield 1
+            yield 2
+
+    stream = rows()
+    assert next(stream) == 1 and pool.stats()['in_use'] == 1
+    stream.close()
+    stats = pool.stats()
+    assert stats['in_use'] == 0 and stats['idle'] == 1 and stats['reconnects'] == 0
+    with pool.connection():
+        pass
+
+
+def test_startup_warmup_runs():
+    with TestClient(app) as c:
+        assert c.get('/health').json()['pools']['clickhouse']['in_use'] == 0
@@ -0,0 +1,71 @@
+"""Load test: concurrent /nl-query requests overlap instead of serializing."""
+import asyncio
+import re
+import time
+import httpx
+from app.config import get_settings
+from app.main import app
+from app.services import clickhouse_client, nl_to_sql
+from app.services.result_cache import get_result_cache
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import get_translation_cache
+
+LLM_LATENCY = 0.1
+DB_LATENCY = 0.05
+
+
+def _install_fakes(monkeypatch, in_flight=None):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    get_result_cache().invalidate()
+
+    async def slow_llm(question):
+        if in_flight is not None:
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(LLM_LATENCY)
+        if in_flight is not None:
+            in_flight['now'] -= 1
+        n = re.search(r'\d+', question).group()
+        return f'SELECT * FROM default.MOCK_DATA LIMIT {n}', False
+
+    def slow_db(sql):
+        time.sleep(DB_LATENCY)  # blocking driver call
+        return [{'id': 1}]
+
+    monkeypatch.setattr(nl_to_sql, '_allm_translate', slow_llm)
+    monkeypatch.setattr(clickhouse_client, '_execute_uncached', slow_db)
+
+
+async def _fire(n_clients, offset):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as ac:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            ac.post('/nl-query', json={'question': f'show first {offset + i} users'}) for i in range(n_clients)
+        ])
+        elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+    return elapsed
+
+
+def test_throughput_scales_with_concurrent_clients(monkeypatch):
+    _install_fakes(monkeypatch)
+    single = asyncio.run(_fire(1, 100))
+    eight = asyncio.run(_fire(8, 200))
+    serial = 8 * (LLM_LATENCY + DB_LATENCY)
+    # Eight clients finish in roughly one request's latency, far below the serialized total.
+    assert eight < serial / 2
+    assert eight < single * 3
+
+
+def test_llm_concurrency_limit(monkeypatch):
+    in_flight = {'now': 0, 'max': 0}
+    _install_fakes(monkeypatch, in_flight)
+    monkeypatch.setattr(get_settings(), 'llm_concurrency', 2)
+    elapsed = asyncio.run(_fire(6, 300))
+    assert in_flight['max'] == 2
+    assert elapsed >= 3 * LLM_LATENCY
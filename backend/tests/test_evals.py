@@ -0,0 +1,42 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.timing import parse_server_timing
+from evals.run_evals import compare, load_cases, percentile, run_cases
+
+client = TestClient(app)
+
+
+def test_server_timing_header():
+    resp = client.post('/nl-query', json={'question': 'Show the first 5 users'})
+    stages = parse_server_timing(resp.headers['server-timing'])
+    assert set(stages) == {'translate', 'validate', 'execute', 'serialize'}
+    assert all(v >= 0 for v in stages.values())
+
+
+def test_parse_server_timing():
+    assert parse_server_timing('db;dur=53.2, app;desc="x";dur=4, cache;desc=hit') == {'db': 53.2, 'app': 4.0}
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.5
+    assert round(percentile(values, 99), 2) == 99.01
+    assert percentile([], 95) == 0.0
+
+
+def test_run_cases_reports_latency():
+    cases = load_cases()[:6]
+    report = asyncio.run(run_cases(cases, parallelism=3, repeat=2))
+    assert report['summary']['passed'] == 6
+    assert report['summary']['requests'] == 12
+    assert set(report['latency_ms']) >= {'translate', 'execute', 'total'}
+    assert all('total' in r['timings'] for r in report['results'])
+
+
+def test_compare_flags_regressions_above_threshold_and_noise_floor():
+    baseline = {'latency_ms': {'total': {'p50': 10.0, 'p95': 20.0, 'p99': 0.2}}}
+    report = {'latency_ms': {'total': {'p50': 11.0, 'p95': 30.0, 'p99': 0.6}}}
+    regressions = compare(report, baseline, max_regression=0.2, min_delta_ms=1.0)
+    assert [(r['stage'], r['percentile']) for r in regressions] == [('total', 'p95')]
+    assert regressions[0]['change'] == 0.5
@@ -0,0 +1,97 @@
+import os
+from app.services.grammar import GrammarRegistry, Literal, Repeat, get_grammar, parse_grammar, prune_grammar, render_expr
+from app.services.nl_to_sql import build_system_prompt, estimate_tokens, prompt_features, system_prompt_for
+
+
+def test_default_grammar_structure():
+    g = get_grammar()
+    assert g.name == 'clickhouse_sql'
+    assert g.start == 'query'
+    assert 'select_stmt' in g.productions
+    assert 'subscription_plane' in g.columns
+    assert set(g.functions) >= {'count', 'sum', 'avg', 'min', 'max', 'toHour'}
+    assert 'SELECT' in g.terminals
+    # Inline comments after ';' are not part of the rule
+    assert '#' not in g.productions['limit_clause'].source
+
+
+def test_parse_repeat_and_escapes():
+    g = parse_grammar('a ::= "x" [0-9]{4} b? ;\nb ::= "\\\\" . ;')
+    seq = g.productions['a'].expr
+    assert seq.items[0] == Literal('x')
+    assert seq.items[1] == Repeat(seq.items[1].item, 4, 4)
+    assert g.references('a') == ['b']
+
+
+def test_system_prompt_keeps_whole_rules():
+    prompt = build_system_prompt(get_grammar())
+    for line in prompt.splitlines():
+        if '::=' in line:
+            assert line.endswith(';')
+
+
+def test_render_expr_round_trips():
+    g = get_grammar()
+    text = "\n".join(f"{name} ::= {render_expr(p.expr)} ;" for name, p in g.productions.items())
+    again = parse_grammar(text)
+    assert all(again.productions[name].expr == p.expr for name, p in g.productions.items())
+
+
+def test_prune_grammar_is_closed():
+    g = get_grammar()
+    pruned = prune_grammar(g, ['case_expr', 'date_trunc_expr', 'arithmetic_expr'])
+    for name in ('case_expr', 'case_when_clause', 'date_trunc_expr', 'date_trunc_func', 'dt_column', 'arithmetic_expr'):
+        assert name not in pruned.productions
+    for name in pruned.productions:
+        assert all(ref in pruned.productions for ref in pruned.references(name))
+    assert pruned.productions['projection'].source == 'named_projection | column_ref | aggregate_expr | "*"'
+    assert pruned.productions['where_clause'] is g.productions['where_clause']
+    assert 'toHour' not in pruned.functions
+    # The pruned rules still parse as BNF
+    parse_grammar(pruned.render())
+
+
+def test_prompt_features():
+    assert prompt_features('Count all users') == frozenset()
+    assert prompt_features('Avg balance per plan') == {'grouping'}
+    assert 'date_trunc' in prompt_features('Signups per day this month')
+    assert 'pattern' in prompt_features('Find users whose name starts with A')
+
+
+def test_pruned_prompt_drops_unneeded_rules():
+    g = get_grammar()
+    full = build_system_prompt(g)
+    simple = build_system_prompt(g, prompt_features('Count all users'))
+    assert 'case_expr' in full and 'date_trunc_expr' in full
+    assert 'case_expr' not in simple and 'date_trunc_expr' not in simple
+    assert 'group_clause' not in simple
+    assert build_system_prompt(g, prompt_features('Bucket users into age tiers')).count('case_expr ::=') == 1
+    assert build_system_prompt(g, frozenset()) is simple  # cached per intent class
+
+    prompt, saved = system_prompt_for('Count all users')
+    assert prompt == simple
+    assert saved == estimate_tokens(full) - estimate_tokens(simple) > 0
+
+
+def test_registry_reloads_only_on_change(tmp_path):
+    path = tmp_path / 'g.bnf'
+    path.write_text('q ::= "A" ;\n')
+    other = tmp_path / 'h.bnf'
+    other.write_text('q ::= "B" ;\n')
+    reg = GrammarRegistry(check_interval=0)
+    reg.register('g', str(path))
+    reg.register('h', str(other))
+
+    first = reg.get('g')
+    assert reg.get('g') is first
+    assert reg.get('h').terminals == {'B'}
+
+    # Touch without content change: same object, no re-parse
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 5))
+    assert reg.get('g') is first
+
+    path.write_text('q ::= "C" ;\n')
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+    assert reg.get('g').terminals == {'C'}
+    assert reg.loads == 3
@@ -0,0 +1,67 @@
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services.guardrails import apply_guardrails, query_settings, truncate
+from app.services.result_formats import ColumnarResult
+
+client = TestClient(app)
+
+
+def test_limit_injected_on_row_listing():
+    g = apply_guardrails("SELECT * FROM default.MOCK_DATA WHERE country = 'US'", max_rows=100)
+    assert g.sql.endswith('LIMIT 100')
+    assert g.execute_sql.endswith('LIMIT 101')
+    assert g.row_cap == 100
+
+
+def test_large_limit_clamped(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'query_max_rows', 10000)
+    g = apply_guardrails('SELECT * FROM default.MOCK_DATA ORDER BY balance DESC LIMIT 50000')
+    assert g.sql == 'SELECT * FROM default.MOCK_DATA ORDER BY balance DESC LIMIT 10000'
+    assert g.execute_sql.endswith('LIMIT 10001')
+
+
+def test_small_limit_and_scalar_aggregate_untouched():
+    for sql in ('SELECT * FROM default.MOCK_DATA LIMIT 5', 'SELECT count(*) FROM default.MOCK_DATA'):
+        g = apply_guardrails(sql)
+        assert g == (sql, sql, None)
+
+
+def test_group_by_uses_result_row_budget(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'query_max_rows', 10)
+    monkeypatch.setattr(settings, 'query_max_result_rows', 500)
+    g = apply_guardrails('SELECT country, count(*) FROM default.MOCK_DATA GROUP BY country')
+    assert g.sql.endswith('LIMIT 500')
+
+
+def test_zero_cap_disables(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'query_max_rows', 0)
+    sql = 'SELECT * FROM default.MOCK_DATA'
+    assert apply_guardrails(sql).sql == sql
+
+
+def test_truncate_shapes():
+    assert truncate([1, 2, 3], 2) == ([1, 2], True)
+    assert truncate([1, 2], 2) == ([1, 2], False)
+    result, cut = truncate(ColumnarResult(['id'], [[1, 2, 3]]), 2)
+    assert cut and result.data == [[1, 2]]
+
+
+def test_nl_query_reports_truncation(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'query_max_rows', 3)
+    body = client.post('/nl-query', json={'question': 'Find all users whose name starts with A'}).json()
+    assert body['sql'].endswith('LIMIT 3')
+    assert len(body['rows']) == 3
+    assert body['truncated'] is True
+
+
+def test_query_settings(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'query_max_memory_usage', 0)
+    out = query_settings()
+    assert out['readonly'] == 2
+    assert out['result_overflow_mode'] == 'break'
+    assert 'max_execution_time' in out
+    assert 'max_memory_usage' not in out
+    assert query_settings(max_rows=25)['max_result_rows'] == 26
+    assert 'max_result_rows' not in query_settings(max_rows=0)
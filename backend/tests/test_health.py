@@ -6,7 +6,9 @@ client = TestClient(app)
 def test_health():
     r = client.get("/health")
     assert r.status_code == 200
-    assert r.json() == {"status": "ok"}
+    data = r.json()
+    assert data["status"] == "ok"
+    assert data["pools"]["clickhouse"]["utilization"] == 0
 
 def test_root():
     r = client.get("/")
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from app.services.ingest import IngestError, insert_batches, insert_columns, iter_csv, synthetic_batches
+from app.services.mock_engine import SCHEMA, MockEngine, Table, default_data_path
+
+ANCHOR = np.datetime64('2025-06-01')
+
+
+def test_iter_csv_maps_header_and_parses_dates():
+    batches = list(iter_csv(default_data_path(), batch_rows=300))
+    assert [len(b['id']) for b in batches] == [300, 300, 300, 100]
+    first = batches[0]
+    assert list(first) == list(SCHEMA)
+    assert first['subscription_plane'][0] == 'Premium'
+    assert first['signup_date'][0] == np.datetime64('2021-12-12T00:00:00')
+    assert first['is_active'].dtype == bool and first['age'].dtype == np.int64
+
+
+def test_iter_csv_rejects_missing_columns(tmp_path):
+    path = tmp_path / 'bad.csv'
+    path.write_text('id,name\n1,x\n')
+    with pytest.raises(IngestError, match='missing columns'):
+        next(iter_csv(path))
+
+
+def test_synthetic_batches_are_deterministic():
+    small = list(synthetic_batches(150_000, batch_rows=40_000, seed=3, anchor=ANCHOR))
+    whole = next(synthetic_batches(150_000, batch_rows=1_000_000, seed=3, anchor=ANCHOR))
+    assert [len(b['id']) for b in small] == [40_000, 40_000, 40_000, 30_000]
+    for column in SCHEMA:
+        assert np.array_equal(np.concatenate([b[column] for b in small]), whole[column])
+    assert np.array_equal(whole['id'], np.arange(1, 150_001))
+    assert (whole['last_login'] >= whole['signup_date']).all() and (whole['last_login'] <= ANCHOR).all()
+    other = next(synthetic_batches(1000, seed=4, anchor=ANCHOR))
+    assert not np.array_equal(other['balance'], whole['balance'][:1000])
+
+
+def test_synthetic_rows_query_like_the_sample():
+    engine = MockEngine(Table.from_columns(next(synthetic_batches(20_000, anchor=ANCHOR))))
+    top = engine.execute('SELECT country, count(*) AS c FROM default.MOCK_DATA GROUP BY country ORDER BY c DESC LIMIT 1')
+    assert top[0]['country'] == 'China'
+    assert engine.execute("SELECT count(*) FROM default.MOCK_DATA WHERE email LIKE '%@%'")[0]['count()'] == 20_000
+
+
+def test_insert_batches_sends_column_oriented_inserts():
+    class Client:
+        def __init__(self):
+            self.inserts = []
+
+        def insert(self, table, data, column_names, column_oriented):
+            self.inserts.append((table, data, column_names, column_oriented))
+
+    client = Client()
+    seen = []
+    total = insert_batches(client, iter_csv(default_data_path(), 400), progress=lambda rows, s: seen.append(rows))
+    assert total == 1000 and seen == [400, 800, 1000]
+    table, data, names, column_oriented = client.inserts[0]
+    assert table == 'default.MOCK_DATA' and column_oriented and names == list(SCHEMA)
+    assert len(data) == len(SCHEMA) and len(data[0]) == 400
+    signup = data[names.index('signup_date')]
+    assert signup[0] == 1639267200  # 2021-12-12 as epoch seconds
+    assert insert_columns(next(synthetic_batches(5, anchor=ANCHOR)))[0] == [1, 2, 3, 4, 5]
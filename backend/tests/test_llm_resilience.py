@@ -0,0 +1,139 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services import metrics, nl_to_sql
+from app.services.circuit_breaker import CircuitBreaker, get_llm_breaker
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import get_translation_cache
+
+client = TestClient(app)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_cools_down_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker('t', threshold=2, cooldown=10, clock=clock)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    clock.now += 10
+    assert breaker.allow() and breaker.state == 'half_open'  # the trial call
+    assert not breaker.allow()
+    breaker.failure()  # trial failed: open again
+    assert breaker.state == 'open' and breaker.retry_after() == 10
+    clock.now += 10
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == 'closed' and breaker.allow()
+    assert breaker.stats()['opened'] == 2 and breaker.stats()['rejected'] == 2
+
+
+def test_breaker_trial_that_never_reports():
+    clock = Clock()
+    breaker = CircuitBreaker('t', threshold=1, cooldown=5, clock=clock)
+    breaker.failure()
+    clock.now += 5
+    assert breaker.allow() and not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+
+
+class FakeCompletions:
+    def __init__(self, delay=0.0, error=None, sql='SELECT avg(age) FROM default.MOCK_DATA'):
+        self.delay = delay
+        self.error = error
+        self.sql = sql
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.sql))])
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    monkeypatch.setattr(settings, 'llm_stream', False)
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    get_llm_breaker.cache_clear()
+
+    def use(completions):
+        fake = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        monkeypatch.setattr(nl_to_sql, 'get_async_llm_client', lambda: fake)
+        return completions
+
+    yield use
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    get_llm_breaker.cache_clear()
+
+
+def test_breaker_stops_calling_after_quota_errors(llm, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'llm_breaker_threshold', 2)
+    completions = llm(FakeCompletions(error='Error code: 429 - insufficient_quota'))
+    rejected = metrics.LLM_BREAKER_REJECTIONS.value()
+    for q in ('Count all users', 'Average age', 'Active users', 'Show active users'):
+        assert client.post('/nl-query', json={'question': q}).status_code == 503
+    assert completions.calls == 2
+    assert metrics.LLM_BREAKER_REJECTIONS.value() == rejected + 2
+    assert client.get('/health').json()['llm_breaker']['state'] == 'open'
+
+
+def test_failed_trial_call_does_not_close_the_breaker(llm, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'llm_breaker_threshold', 1)
+    monkeypatch.setattr(get_settings(), 'llm_breaker_cooldown', 0)
+    monkeypatch.setattr(get_settings(), 'mock_clickhouse', True)
+    completions = llm(FakeCompletions(error='Error code: 429 - insufficient_quota'))
+    assert client.post('/nl-query', json={'question': 'Count all users'}).status_code == 503
+    assert get_llm_breaker().state == 'open'
+    completions.error = 'Connection reset by peer'  # the half-open trial fails, but not on quota
+    resp = client.post('/nl-query', json={'question': 'Average age'})
+    assert resp.status_code == 200 and resp.json()['mocked'] is True
+    assert completions.calls == 2
+    assert get_llm_breaker().state != 'closed'
+    completions.error = None
+    assert client.post('/nl-query', json={'question': 'Active users'}).json()['mocked'] is False
+    assert get_llm_breaker().state == 'closed'
+
+
+def test_deadline_hedges_and_warms_the_cache(llm, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'llm_deadline', 0.05)
+    completions = llm(FakeCompletions(delay=0.2))
+    hedged = metrics.LLM_DEADLINES.value(action='hedged')
+
+    async def scenario():
+        first = await nl_to_sql.atranslate('What is the average age of users?')
+        await asyncio.sleep(0.3)  # the LLM call finishes in the background
+        return first, await nl_to_sql.atranslate('What is the average age of users?')
+
+    first, second = asyncio.run(scenario())
+    assert first.mocked and first.sql == nl_to_sql.mock_translate('What is the average age of users?')
+    assert second == nl_to_sql.Translation('SELECT avg(age) FROM default.MOCK_DATA', False, cached=True)
+    assert completions.calls == 1
+    assert metrics.LLM_DEADLINES.value(action='hedged') == hedged + 1
+
+
+def test_deadline_without_hedge_is_504(llm, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'llm_deadline', 0.05)
+    monkeypatch.setattr(get_settings(), 'llm_hedge', False)
+    llm(FakeCompletions(delay=0.2))
+    resp = client.post('/nl-query', json={'question': 'Count all users'})
+    assert resp.status_code == 504
+    assert 'did not answer within 0.05s' in resp.json()['detail']
@@ -0,0 +1,146 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from app.config import get_settings
+from app.services import metrics, nl_to_sql
+from app.services.sql_parser import SqlSyntaxError, StreamingSqlCheck, get_parser
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import get_translation_cache
+
+
+@pytest.mark.parametrize('text', [
+    '', 'SEL', 'select', 'SELECT count(', "SELECT * FROM default.MOCK_DATA WHERE name ILIKE 'A",
+    'SELECT * FROM default.MOCK_DATA WHERE age >', 'SELECT * FROM default.MOCK_DATA WHERE age !',
+    'SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractH',
+    'SELECT count(*) FROM default.MOCK_DATA L',
+])
+def test_viable_prefixes(text):
+    assert get_parser().check_prefix(text).viable
+
+
+@pytest.mark.parametrize('text', ['Sure! Here', '```sql', 'DROP', 'SELECT * FROM users', 'SELECT * FROM default.MOCK_DATA WHERE age > foo'])
+def test_dead_prefixes(text):
+    check = get_parser().check_prefix(text)
+    assert not check.viable and check.complete is None
+
+
+def test_complete_query_followed_by_commentary():
+    text = 'SELECT count(*) FROM default.MOCK_DATA WHERE age > 5\n\nThis counts'
+    check = get_parser().check_prefix(text)
+    assert not check.viable
+    assert text[:check.complete] == 'SELECT count(*) FROM default.MOCK_DATA WHERE age > 5'
+    assert get_parser().check_prefix('SELECT * FROM default.MOCK_DATA LIMIT 10, 20').final
+
+
+def test_streaming_check():
+    check = StreamingSqlCheck()
+    assert check.feed('SELECT count(*) FROM') is None
+    assert check.feed(' default.MOCK_DATA;') == 'SELECT count(*) FROM default.MOCK_DATA'
+    check = StreamingSqlCheck()
+    with pytest.raises(SqlSyntaxError):
+        check.feed('I cannot')
+
+
+# --- translator over a fake streaming client ------------------------------------------
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            self.sent += 1
+            yield _chunk(piece)
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+
+class FakeCompletions:
+    """Answers each call with the next scripted completion, split into word chunks."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.streams = []
+
+    def create(self, stream=False, **kwargs):
+        assert stream
+        answer = self.answers.pop(0)
+        self.streams.append(FakeStream([w + ' ' for w in answer.split(' ')]))
+        return self.streams[-1]
+
+
+class AsyncFakeCompletions(FakeCompletions):
+    async def create(self, stream=False, **kwargs):
+        return FakeCompletions.create(self, stream=stream, **kwargs)
+
+
+def _client(completions):
+    return lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    monkeypatch.setattr(settings, 'llm_stream_retries', 1)
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    yield monkeypatch
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+
+
+def test_stream_stops_after_the_query(llm):
+    completions = FakeCompletions('SELECT count(*) FROM default.MOCK_DATA\n\nThis query counts every row in the table.')
+    llm.setattr(nl_to_sql, 'get_llm_client', _client(completions))
+    stopped = metrics.LLM_STREAMS.value(result='stopped')
+    t = nl_to_sql.translate('Count every row in the table')
+    assert (t.sql, t.mocked) == ('SELECT count(*) FROM default.MOCK_DATA', False)
+    stream = completions.streams[0]
+    assert stream.closed and stream.sent < len(stream.pieces)
+    assert metrics.LLM_STREAMS.value(result='stopped') == stopped + 1
+
+
+def test_stream_aborts_then_retries(llm):
+    completions = AsyncFakeCompletions(
+        'I am sorry, but I can only describe the query in words.',
+        'SELECT avg(age) FROM default.MOCK_DATA',
+    )
+    llm.setattr(nl_to_sql, 'get_async_llm_client', _client(completions))
+    aborted = metrics.LLM_STREAMS.value(result='aborted')
+    t = asyncio.run(nl_to_sql.atranslate('Mean age over all users'))
+    assert (t.sql, t.mocked) == ('SELECT avg(age) FROM default.MOCK_DATA', False)
+    first = completions.streams[0]
+    assert first.closed and first.sent == 1  # 'I' already rules out a query
+    assert metrics.LLM_STREAMS.value(result='aborted') == aborted + 1
+
+
+def test_stream_falls_back_after_retries(llm):
+    completions = FakeCompletions('DROP TABLE default.MOCK_DATA', 'SELECT * FROM users')
+    llm.setattr(nl_to_sql, 'get_llm_client', _client(completions))
+    fallbacks = metrics.LLM_FALLBACKS.value(reason='invalid_sql')
+    t = nl_to_sql.translate('Count all users please')
+    assert t.mocked and t.sql == nl_to_sql.mock_translate('Count all users please')
+    assert [s.sent for s in completions.streams] == [1, 4]
+    assert metrics.LLM_FALLBACKS.value(reason='invalid_sql') == fallbacks + 1
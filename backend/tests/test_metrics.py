@@ -0,0 +1,100 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services import metrics, nl_to_sql
+from app.services.metrics import Counter, Histogram
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import get_translation_cache
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram('t_seconds', 'test', ('stage',), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, stage='llm')
+    lines = h.render()
+    assert 't_seconds_bucket{stage="llm",le="0.1"} 2' in lines
+    assert 't_seconds_bucket{stage="llm",le="1"} 3' in lines
+    assert 't_seconds_bucket{stage="llm",le="+Inf"} 4' in lines
+    assert 't_seconds_sum{stage="llm"} 3.65' in lines
+    assert 't_seconds_count{stage="llm"} 4' in lines
+
+
+def test_counter_label_escaping():
+    c = Counter('t_total', 'test', ('reason',))
+    c.inc(reason='a "b"')
+    assert 't_total{reason="a \\"b\\""} 1' in c.render()
+
+
+def test_metrics_endpoint_has_stage_histograms():
+    before = metrics.STAGE_SECONDS.count(stage='execute', mocked='true', outcome='ok')
+    rows_before = metrics.ROWS_RETURNED.value(endpoint='/nl-query')
+    assert client.post('/nl-query', json={'question': 'Show the first 5 users'}).status_code == 200
+    assert metrics.STAGE_SECONDS.count(stage='execute', mocked='true', outcome='ok') == before + 1
+    assert metrics.ROWS_RETURNED.value(endpoint='/nl-query') == rows_before + 5
+    resp = client.get('/metrics')
+    assert resp.headers['content-type'].startswith('text/plain; version=0.0.4')
+    text = resp.text
+    for stage in ('translate', 'validate', 'execute', 'serialize'):
+        assert f'cfg_evals_stage_seconds_count{{stage="{stage}",mocked="true",outcome="ok"}}' in text
+    assert 'cfg_evals_response_bytes_total{endpoint="/nl-query",format="rows"}' in text
+    assert '# TYPE cfg_evals_result_cache_hit_rate gauge' in text
+    assert 'cfg_evals_coalescing_coalesced{call="execution"}' in text
+
+
+def test_stream_is_observed():
+    requests = metrics.REQUEST_SECONDS.count(endpoint='/nl-query/stream', mocked='true', outcome='ok')
+    translated = metrics.STAGE_SECONDS.count(stage='translate', mocked='true', outcome='ok')
+    executed = metrics.STAGE_SECONDS.count(stage='execute', mocked='true', outcome='ok')
+    rows = metrics.ROWS_RETURNED.value(endpoint='/nl-query/stream')
+    with client.stream('POST', '/nl-query/stream', json={'question': 'Show the first 5 users', 'max_rows': 3}) as resp:
+        assert resp.status_code == 200
+        resp.read()
+    assert metrics.REQUEST_SECONDS.count(endpoint='/nl-query/stream', mocked='true', outcome='ok') == requests + 1
+    assert metrics.STAGE_SECONDS.count(stage='translate', mocked='true', outcome='ok') == translated + 1
+    assert metrics.STAGE_SECONDS.count(stage='execute', mocked='true', outcome='ok') == executed + 1
+    assert metrics.ROWS_RETURNED.value(endpoint='/nl-query/stream') == rows + 3
+
+
+def test_safety_rejection_outcome(monkeypatch):
+    monkeypatch.setattr(nl_to_sql, 'mock_translate', lambda q: 'DROP TABLE default.MOCK_DATA')
+    rejected = metrics.SAFETY_REJECTIONS.value(stage='validate')
+    requests = metrics.REQUEST_SECONDS.count(endpoint='/nl-query', mocked='true', outcome='rejected')
+    assert client.post('/nl-query', json={'question': 'Drop everything'}).status_code == 400
+    assert metrics.SAFETY_REJECTIONS.value(stage='validate') == rejected + 1
+    assert metrics.REQUEST_SECONDS.count(endpoint='/nl-query', mocked='true', outcome='rejected') == requests + 1
+
+
+def test_llm_fallback_and_quota_counters(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+
+    class FailingCompletions:
+        def __init__(self, message):
+            self.message = message
+
+        async def create(self, **kwargs):
+            raise RuntimeError(self.message)
+
+    def client_raising(message):
+        fake = type('Client', (), {})()
+        fake.chat = type('Chat', (), {})()
+        fake.chat.completions = FailingCompletions(message)
+        return lambda: fake
+
+    fallbacks = metrics.LLM_FALLBACKS.value(reason='error')
+    monkeypatch.setattr(nl_to_sql, 'get_async_llm_client', client_raising('connection reset'))
+    assert asyncio.run(nl_to_sql.atranslate('Count all users')).mocked
+    assert metrics.LLM_FALLBACKS.value(reason='error') == fallbacks + 1
+
+    quota = metrics.LLM_QUOTA_ERRORS.value()
+    monkeypatch.setattr(nl_to_sql, 'get_async_llm_client', client_raising('insufficient_quota'))
+    resp = client.post('/nl-query', json={'question': 'How many users are there'})
+    assert resp.status_code == 503
+    assert metrics.LLM_QUOTA_ERRORS.value() == quota + 1
+    assert metrics.REQUEST_SECONDS.count(endpoint='/nl-query', mocked='false', outcome='quota') >= 1
@@ -0,0 +1,97 @@
+from datetime import datetime
+import numpy as np
+import pytest
+from app.services import clickhouse_client
+from app.services.mock_engine import MockEngine, MockEngineError, Table, get_mock_engine, load_csv
+
+NOW = np.datetime64('2025-06-01T12:00:00')
+
+
+def _engine():
+    table = Table.from_columns({
+        'id': [1, 2, 3, 4, 5],
+        'name': ['Alice', 'Bob', 'Cara', 'alan', 'Dan'],
+        'email': ['a@x.com', 'b@y.org', 'c@x.com', 'd@x.com', 'e@z.net'],
+        'age': [34, 41, 29, 50, 22],
+        'signup_date': ['2025-05-31 20:00:00', '2025-05-20 00:00:00', '2025-06-01 10:00:00',
+                        '2025-01-01 00:00:00', '2025-05-29 00:00:00'],
+        'country': ['US', 'DE', 'US', 'FR', 'US'],
+        'is_active': [True, False, True, True, False],
+        'subscription_plane': ['basic', 'pro', 'pro', 'basic', 'free'],
+        'last_login': ['2025-06-01 11:00:00'] * 5,
+        'balance': [500, 1250, 3000, 150, 850],
+    })
+    return MockEngine(table, clock=lambda: NOW)
+
+
+def test_aggregates_and_filters():
+    e = _engine()
+    assert e.execute("SELECT count(*) FROM default.MOCK_DATA") == [{'count()': 5}]
+    assert e.execute("SELECT sum(balance) FROM MOCK_DATA WHERE country = 'US' AND is_active = true") == \
+        [{'sum(balance)': 3500}]
+    assert e.execute("SELECT count(*) FROM MOCK_DATA WHERE (age > 40 OR country = 'US') AND balance < 1000") == \
+        [{'count()': 3}]
+    assert e.execute("SELECT id FROM MOCK_DATA WHERE country IN ('DE', 'FR') ORDER BY id") == [{'id': 2}, {'id': 4}]
+    assert e.execute("SELECT avg(age) FROM MOCK_DATA WHERE age > 100") == [{'avg(age)': None}]
+
+
+def test_like_and_relative_time():
+    e = _engine()
+    assert e.execute("SELECT name FROM MOCK_DATA WHERE name ILIKE 'a%' ORDER BY name") == \
+        [{'name': 'Alice'}, {'name': 'alan'}]
+    assert e.execute("SELECT name FROM MOCK_DATA WHERE name LIKE 'a%'") == [{'name': 'alan'}]
+    assert e.execute("SELECT name FROM MOCK_DATA WHERE email ILIKE '%@x.com' AND name ILIKE '_ar%'") == \
+        [{'name': 'Cara'}]
+    assert e.execute("SELECT count(*) FROM MOCK_DATA WHERE signup_date >= subtractHours(now(), 24)") == \
+        [{'count()': 2}]
+    assert e.execute("SELECT count(*) FROM MOCK_DATA WHERE signup_date >= 7 DAYS AGO") == [{'count()': 3}]
+
+
+def test_group_by_having_order_limit():
+    e = _engine()
+    rows = e.execute(
+        "SELECT country, count(*) AS cnt, max(balance) FROM MOCK_DATA GROUP BY country ORDER BY cnt DESC, country"
+    )
+    assert rows == [
+        {'country': 'US', 'cnt': 3, 'max(balance)': 3000},
+        {'country': 'DE', 'cnt': 1, 'max(balance)': 1250},
+        {'country': 'FR', 'cnt': 1, 'max(balance)': 150},
+    ]
+    rows = e.execute(
+        "SELECT subscription_plane, min(name) FROM MOCK_DATA GROUP BY subscription_plane HAVING count(*) > 1"
+    )
+    assert rows == [{'subscription_plane': 'basic', 'min(name)': 'Alice'}, {'subscription_plane': 'pro', 'min(name)': 'Bob'}]
+    assert e.execute("SELECT id FROM MOCK_DATA ORDER BY balance DESC LIMIT 1, 2") == [{'id': 2}, {'id': 5}]
+
+
+def test_projections():
+    e = _engine()
+    row = e.execute(
+        "SELECT sum(balance) / count(*) AS per_user, CASE WHEN age > 40 THEN 'old' ELSE 'young' END AS bucket "
+        "FROM MOCK_DATA GROUP BY age ORDER BY age LIMIT 1"
+    )
+    assert row == [{'per_user': 850.0, 'bucket': 'young'}]
+    assert e.execute("SELECT * FROM MOCK_DATA LIMIT 1")[0]['subscription_plane'] == 'basic'
+    with pytest.raises(MockEngineError):
+        e.execute("SELECT name, count(*) FROM MOCK_DATA GROUP BY country")
+
+
+def test_sample_csv_and_execute_sql():
+    engine = get_mock_engine()
+    assert engine.table.n_rows == 1000
+    assert set(engine.table.columns) >= {'subscription_plane', 'signup_date'}
+    clickhouse_client.invalidate_result_cache()
+    rows = clickhouse_client.execute_sql("SELECT count(*) FROM default.MOCK_DATA WHERE is_active = true")
+    assert rows == engine.execute("SELECT count(*) FROM default.MOCK_DATA WHERE is_active = true")
+    assert 0 < rows[0]['count()'] < 1000
+
+
+def test_load_csv_header_alias(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text(
+        'id,name,email,age,signup_date,country,is_active,subscription_planve,last_login,balance\n'
+        '1,Ann,a@x.com,30,12/12/2021,US,true,Free,03/26/2025,10\n'
+    )
+    table = load_csv(path)
+    assert MockEngine(table).execute("SELECT subscription_plane, signup_date FROM MOCK_DATA")[0] == \
+        {'subscription_plane': 'Free', 'signup_date': datetime(2021, 12, 12)}
@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services.mock_engine import get_mock_engine
+from app.services.pagination import InvalidCursor, first_page, next_page
+
+client = TestClient(app)
+T = 'default.MOCK_DATA'
+
+
+def _pages(first, **extra):
+    body = client.post('/nl-query', json={**first, **extra}).json()
+    pages = [body]
+    while body['next_cursor']:
+        body = client.post('/nl-query/next', json={'cursor': body['next_cursor'], **extra}).json()
+        pages.append(body)
+    return pages
+
+
+def test_pages_cover_the_listing_once(monkeypatch):
+    expected = get_mock_engine().execute(f"SELECT * FROM {T} WHERE name ILIKE 'A%' ORDER BY id")
+    pages = _pages({'question': 'Find all users whose name starts with A', 'page_size': 7})
+    assert [row['id'] for page in pages for row in page['rows']] == [row['id'] for row in expected]
+    assert all(len(page['rows']) == 7 for page in pages[:-1]) and 0 < len(pages[-1]['rows']) <= 7
+    last_id = pages[-2]['rows'][-1]['id']
+    assert 'OFFSET' not in pages[-1]['sql'] and f'AND id > {last_id} ORDER BY id' in pages[-1]['sql']
+
+    async def no_translation(question):
+        raise AssertionError('follow-up pages must not translate')
+
+    monkeypatch.setattr('app.main.atranslate', no_translation)
+    cursor = pages[0]['next_cursor']
+    assert client.post('/nl-query/next', json={'cursor': cursor}).json()['rows'] == pages[1]['rows']
+
+
+def test_listing_limit_and_hidden_id():
+    sql = f"SELECT name, email FROM {T} WHERE name ILIKE 'A%' LIMIT 7"
+    page = first_page(sql, 3)
+    rows, seen = [], 0
+    while page is not None:
+        batch, truncated = page.trim(get_mock_engine().execute(page.execute_sql))
+        assert not truncated and all(set(r) == {'name', 'email'} for r in batch)
+        rows += batch
+        seen += 1
+        page = next_page(page.next_cursor) if page.next_cursor else None
+    assert len(rows) == 7 and seen == 3
+    assert first_page(f'SELECT * FROM {T} ORDER BY name', 3) is None
+    assert first_page(f'SELECT * FROM {T} LIMIT 10, 5', 3) is None
+    assert first_page(f'SELECT country, count(*) FROM {T} GROUP BY country', 3) is None
+
+
+def test_columnar_pages():
+    pages = _pages({'question': 'Show the first 12 users', 'page_size': 5}, format='columnar')
+    assert [len(p['data'][0]) for p in pages] == [5, 5, 2]
+    assert pages[0]['columns'][0] == 'id' and pages[1]['data'][0][0] > pages[0]['data'][0][-1]
+
+
+def test_tampered_or_foreign_cursors_are_rejected(monkeypatch):
+    body = client.post('/nl-query', json={'question': 'Show the first 20 users', 'page_size': 5}).json()
+    cursor = body['next_cursor']
+    payload, signature = cursor.split('.')
+    forged = ('A' if payload[0] != 'A' else 'B') + payload[1:] + '.' + signature
+    assert client.post('/nl-query/next', json={'cursor': forged}).status_code == 400
+    assert client.post('/nl-query/next', json={'cursor': 'not-a-cursor'}).status_code == 400
+    monkeypatch.setattr(get_settings(), 'cursor_secret', 'rotated')
+    with pytest.raises(InvalidCursor):
+        next_page(cursor)
+
+
+def test_aggregates_ignore_page_size():
+    body = client.post('/nl-query', json={'question': 'Count per country', 'page_size': 2}).json()
+    assert body['next_cursor'] is None and len(body['rows']) > 2
@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import clickhouse_client
+from app.services.result_cache import ResultCache, get_result_cache, query_shape
+from app.services.sql_parser import canonicalize_sql
+
+client = TestClient(app)
+
+
+def test_canonicalize_sql():
+    a = canonicalize_sql("select  count(*)\n from default.MOCK_DATA;")
+    assert a == canonicalize_sql("SELECT count(*) FROM default.MOCK_DATA")
+    # Literals keep their case
+    assert canonicalize_sql("SELECT * FROM MOCK_DATA WHERE country = 'us'") != \
+        canonicalize_sql("SELECT * FROM MOCK_DATA WHERE country = 'US'")
+
+
+def test_query_shape():
+    assert query_shape("SELECT count(*) FROM default.MOCK_DATA") == 'aggregate'
+    assert query_shape("SELECT country, count(*) AS c FROM MOCK_DATA GROUP BY country") == 'aggregate'
+    assert query_shape("SELECT * FROM default.MOCK_DATA LIMIT 5") == 'rows'
+
+
+def test_byte_budget_and_shape_ttl():
+    now = [0.0]
+    row = [{'name': 'x' * 100}]
+    cache = ResultCache(max_bytes=1000, ttls={'aggregate': 60, 'rows': 1}, clock=lambda: now[0])
+    for i in range(10):
+        cache.put(f'q{i}', row, shape='rows')
+    stats = cache.stats()
+    assert stats['bytes'] <= 1000 and stats['evictions'] > 0
+    assert cache.get('q0') is None
+    cache.put('agg', [{'count()': 1}], shape='aggregate')
+    now[0] += 2
+    assert cache.get('q9') is None
+    assert cache.get('agg') == [{'count()': 1}]
+
+
+def test_version_probe_invalidates():
+    version = [1]
+    cache = ResultCache(version_probe=lambda: version[0], version_interval=0)
+    cache.put('k', [{'a': 1}], shape='aggregate')
+    assert cache.get('k') is not None
+    version[0] = 2
+    assert cache.get('k') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_execute_sql_hits_cache_in_mock_mode(monkeypatch):
+    calls = []
+    monkeypatch.setattr(clickhouse_client, '_execute_uncached', lambda sql: calls.append(sql) or [{'count()': 7}])
+    clickhouse_client.invalidate_result_cache()
+    assert clickhouse_client.execute_sql("SELECT count(*) FROM default.MOCK_DATA") == [{'count()': 7}]
+    assert clickhouse_client.execute_sql("select count(*)  from default.MOCK_DATA") == [{'count()': 7}]
+    assert len(calls) == 1
+    clickhouse_client.invalidate_result_cache("SELECT count(*) FROM default.MOCK_DATA")
+    clickhouse_client.execute_sql("SELECT count(*) FROM default.MOCK_DATA")
+    assert len(calls) == 2
+
+
+def test_cache_endpoints():
+    get_result_cache().put('x', [{'a': 1}], shape='aggregate')
+    assert client.post('/cache/invalidate').status_code == 200
+    stats = client.get('/cache/stats').json()
+    assert stats['result']['entries'] == 0
+    assert 'hits' in stats['translation']
@@ -0,0 +1,54 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import clickhouse_client
+from app.services.result_formats import ARROW_MEDIA_TYPE, COLUMNAR_MEDIA_TYPE, negotiate_format
+
+client = TestClient(app)
+
+QUESTION = 'Show the first 5 users'
+
+
+def test_negotiate_format():
+    assert negotiate_format(None, None) == 'rows'
+    assert negotiate_format(None, '*/*') == 'rows'
+    assert negotiate_format(None, f'{ARROW_MEDIA_TYPE}, application/json;q=0.5') == 'arrow'
+    assert negotiate_format(None, f'{COLUMNAR_MEDIA_TYPE}; charset=utf-8') == 'columnar'
+    assert negotiate_format('rows', ARROW_MEDIA_TYPE) == 'rows'
+
+
+def test_columnar_matches_rows():
+    rows = client.post('/nl-query', json={'question': QUESTION}).json()['rows']
+    resp = client.post('/nl-query', json={'question': QUESTION, 'format': 'columnar'})
+    assert resp.status_code == 200, resp.text
+    assert resp.headers['content-type'].startswith(COLUMNAR_MEDIA_TYPE)
+    body = resp.json()
+    assert body['sql'].endswith('LIMIT 5')
+    assert body['columns'] == list(rows[0])
+    assert len(body['data']) == len(body['columns'])
+    assert body['data'][0] == [r['id'] for r in rows]
+
+
+def test_arrow_via_accept_header():
+    pa = pytest.importorskip('pyarrow')
+    resp = client.post('/nl-query', json={'question': QUESTION}, headers={'Accept': ARROW_MEDIA_TYPE})
+    assert resp.status_code == 200, resp.text
+    assert resp.headers['content-type'] == ARROW_MEDIA_TYPE
+    table = pa.ipc.open_stream(resp.content).read_all()
+    assert table.num_rows == 5
+    assert table.column('id').to_pylist() == [1, 2, 3, 4, 5]
+    assert table.schema.metadata[b'sql'].decode().endswith('LIMIT 5')
+    assert pa.types.is_timestamp(table.schema.field('signup_date').type)
+
+
+def test_formats_are_cached_separately(monkeypatch):
+    calls = []
+    real = clickhouse_client._execute_columnar_uncached
+    monkeypatch.setattr(clickhouse_client, '_execute_columnar_uncached', lambda sql: calls.append(sql) or real(sql))
+    clickhouse_client.invalidate_result_cache()
+    for _ in range(2):
+        client.post('/nl-query', json={'question': 'Count all users', 'format': 'columnar'})
+    assert len(calls) == 1
+    clickhouse_client.invalidate_result_cache('SELECT count(*) FROM default.MOCK_DATA')
+    client.post('/nl-query', json={'question': 'Count all users', 'format': 'columnar'})
+    assert len(calls) == 2
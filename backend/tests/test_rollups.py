@@ -0,0 +1,108 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app.config import get_settings
+from app.services import clickhouse_client, metrics, rollups
+from app.services.clients import ConnectionPool
+from app.services.ingest import synthetic_batches
+from app.services.mock_engine import MockEngine, Table
+from app.services.nl_to_sql import INTENTS, mock_translate
+
+T = 'default.MOCK_DATA'
+ANCHOR = np.datetime64('2025-06-01T00:00:00')
+EQUIVALENT = [
+    f"SELECT country, count(*) AS cnt FROM {T} WHERE is_active = true AND country IN ('US', 'FR', 'DE') "
+    "GROUP BY country HAVING count(*) > 2 ORDER BY cnt DESC LIMIT 5",
+    f"SELECT subscription_plane, is_active, avg(age), sum(balance) AS s FROM {T} WHERE country != 'US' "
+    "GROUP BY subscription_plane, is_active ORDER BY s",
+    f"SELECT count(*) FROM {T} WHERE (country ILIKE 'u%' OR subscription_plane = 'pro') AND is_active = false",
+    f"SELECT sum(balance), avg(balance) FROM {T}",
+    f"SELECT country FROM {T} GROUP BY country ORDER BY country LIMIT 3",
+    f"SELECT count(*), sum(balance) AS total FROM {T} WHERE signup_date > subtractHours(now(), 30)",
+    f"SELECT sum(balance) FROM {T} WHERE signup_date >= subtractMinutes(now(), 90)",
+]
+
+
+def _engine(now):
+    batch = next(synthetic_batches(20_000, 20_000, seed=3, anchor=ANCHOR))
+    return MockEngine(Table.from_columns(batch, source='synthetic'), clock=lambda: now)
+
+
+@pytest.mark.parametrize('minute', [0, 17, 59])
+def test_rewritten_results_match_the_originals(minute):
+    engine = _engine(ANCHOR - np.timedelta64(40, 'D') + np.timedelta64(minute, 'm'))
+    translated = [mock_translate(q) for intent in INTENTS for q in intent.examples]
+    routed = 0
+    for sql in EQUIVALENT + translated:
+        rewrite = rollups.plan(sql)
+        if rewrite is None:
+            continue
+        routed += 1
+        assert engine.execute(sql, rewrite) == engine.execute(sql), sql
+    assert routed == len(EQUIVALENT) + 7  # avg age, sum balance x2, active users, per country, avg per plan, signups
+
+
+def test_unmatched_shapes_are_left_alone():
+    for sql in (
+        f'SELECT count(*) FROM {T}',  # answered from part metadata
+        f'SELECT * FROM {T} LIMIT 5',
+        f'SELECT max(balance) FROM {T}',
+        f"SELECT count(*) FROM {T} WHERE name ILIKE 'A%'",
+        f'SELECT country, count(*) FROM {T} GROUP BY country, age',
+        f'SELECT sum(balance) / count(*) FROM {T}',
+        f'SELECT avg(balance) FROM {T} WHERE signup_date >= subtractDays(now(), 7)',
+        f'SELECT sum(balance) FROM {T} WHERE signup_date >= subtractDays(now(), 7) AND is_active = true',
+        f'SELECT sum(balance) FROM {T} WHERE signup_date >= 7 DAYS AGO',
+        f'SELECT count(*) AS row_count FROM {T} WHERE is_active = true',
+        'DROP TABLE default.MOCK_DATA',
+    ):
+        assert rollups.plan(sql) is None, sql
+
+
+def test_rewritten_sql_and_ddl():
+    rewrite = rollups.plan(f'SELECT count(*) FROM {T} WHERE is_active = true')
+    assert rewrite.rollup is rollups.DIMS
+    assert rewrite.sql == f'SELECT sum(row_count) AS `count()` FROM {T}_dims WHERE is_active = true'
+    window = rollups.plan(f'SELECT sum(balance) FROM {T} WHERE signup_date >= subtractDays(now(), 7)').sql
+    assert f'FROM {T}_signups_hourly WHERE hour > toStartOfHour(subtractDays(now(), 7))' in window
+    assert 'signup_date < toStartOfHour(subtractDays(now(), 7)) + INTERVAL 1 HOUR' in window
+    table, view = rollups.HOURLY.ddl()
+    assert 'ENGINE = SummingMergeTree ORDER BY (hour)' in table
+    assert view == (
+        f'CREATE MATERIALIZED VIEW IF NOT EXISTS {T}_signups_hourly_mv TO {T}_signups_hourly AS '
+        f'SELECT toStartOfHour(signup_date) AS hour, count() AS row_count, sum(balance) AS balance_sum '
+        f'FROM {T} GROUP BY hour'
+    )
+
+
+def test_setting_and_counter(monkeypatch):
+    sql = f'SELECT country, count(*) AS cnt FROM {T} GROUP BY country ORDER BY cnt DESC'
+    before = metrics.ROLLUP_REWRITES.value(rollup='dims')
+    original = clickhouse_client._execute_uncached(sql)
+    monkeypatch.setattr(get_settings(), 'query_rollups', False)
+    assert clickhouse_client._execute_uncached(sql) == original
+    assert metrics.ROLLUP_REWRITES.value(rollup='dims') == before + 1
+
+
+class _Client:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def query(self, sql, settings=None):
+        self.calls.append(sql)
+        if '_dims' in sql:
+            raise RuntimeError('Table default.MOCK_DATA_dims does not exist')
+        return SimpleNamespace(column_names=['count()'], result_rows=[(7,)])
+
+
+def test_missing_rollup_falls_back_to_the_base_table(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'mock_clickhouse', False)
+    calls = []
+    monkeypatch.setattr(clickhouse_client, 'get_clickhouse_pool', lambda: ConnectionPool(lambda: _Client(calls)))
+    before = metrics.ROLLUP_FALLBACKS.value(rollup='dims')
+    sql = f'SELECT count(*) FROM {T} WHERE is_active = true'
+    assert clickhouse_client._execute_uncached(sql) == [{'count()': 7}]
+    assert calls == [rollups.plan(sql).sql, sql]
+    assert metrics.ROLLUP_FALLBACKS.value(rollup='dims') == before + 1
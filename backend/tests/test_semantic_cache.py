@@ -0,0 +1,126 @@
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services import metrics, nl_to_sql
+from app.services.semantic_cache import SemanticCache, canonical_words, extract_slots, get_semantic_cache, sql_template
+from app.services.translation_cache import get_translation_cache
+
+client = TestClient(app)
+T = 'default.MOCK_DATA'
+
+
+def test_slots_and_canonical_words():
+    q = 'show users from us whose name starts with a in the last 30 days'
+    assert [(s.kind, s.value) for s in extract_slots(q)] == [('code', 'us'), ('text', 'a'), ('num', '30')]
+    assert canonical_words('how many users are there', []) == canonical_words('count all users', [])
+    assert sql_template(f"SELECT * FROM {T} WHERE country = 'US'", extract_slots('users from us')) is not None
+    # The SQL must echo every literal exactly once.
+    assert sql_template(f'SELECT * FROM {T} LIMIT 5', extract_slots('first 5 users over 5')) is None
+
+
+def test_paraphrases_reuse_sql_with_new_literals():
+    cache = SemanticCache()
+    assert cache.add('How many users are there', f'SELECT count(*) FROM {T}')
+    assert cache.add('Show the first 5 users', f'SELECT * FROM {T} LIMIT 5')
+    assert cache.add('Show users from US', f"SELECT * FROM {T} WHERE country = 'US'")
+    assert cache.add(
+        'Sum total balance in the last 30 hours',
+        f'SELECT sum(balance) FROM {T} WHERE signup_date >= subtractHours(now(), 30)',
+    )
+    assert cache.add('Find all users whose name starts with A', f"SELECT * FROM {T} WHERE name ILIKE 'A%'")
+
+    assert cache.lookup('count all users').sql == f'SELECT count(*) FROM {T}'
+    assert cache.lookup('list the top 20 users').sql == f'SELECT * FROM {T} LIMIT 20'
+    assert cache.lookup('display users in FR').sql == f"SELECT * FROM {T} WHERE country = 'FR'"
+    hit = cache.lookup('total balance over the last 12 hours')
+    assert hit.sql.endswith('subtractHours(now(), 12)')
+    assert hit.question == 'Sum total balance in the last 30 hours' and 0.8 <= hit.similarity < 1
+    assert cache.lookup('users with name beginning with b').sql == f"SELECT * FROM {T} WHERE name ILIKE 'B%'"
+    assert cache.stats()['llm_calls_avoided'] == 5
+
+
+def test_different_questions_miss():
+    cache = SemanticCache()
+    cache.add('How many users are there', f'SELECT count(*) FROM {T}')
+    cache.add('Find all users whose name starts with A', f"SELECT * FROM {T} WHERE name ILIKE 'A%'")
+    assert cache.lookup('count active users') is None
+    assert cache.lookup('average age') is None
+    assert cache.lookup('users whose name ends with a') is None
+    assert cache.lookup('how many users from us') is None  # an extra literal
+    assert cache.stats()['hits'] == 0
+
+
+def test_operators_and_direction_words_miss():
+    cache = SemanticCache()
+    assert cache.add('users with age > 30', f'SELECT * FROM {T} WHERE age > 30')
+    assert cache.add('list users ordered by balance descending', f'SELECT * FROM {T} ORDER BY balance DESC')
+    assert cache.add('users with the highest balance', f'SELECT * FROM {T} ORDER BY balance DESC LIMIT 10')
+    assert cache.add('count active users', f'SELECT count(*) FROM {T} WHERE is_active = true')
+    for question in (
+        'users with age < 25', 'users with age >= 25', 'users with age != 25', 'users with age less than 25',
+        'list users ordered by balance ascending', 'users with the lowest balance',
+        'count not active users',
+    ):
+        assert cache.lookup(question) is None, question
+    assert cache.stats()['hits'] == 0
+    assert cache.lookup('users with age greater than 25').sql == f'SELECT * FROM {T} WHERE age > 25'
+    assert cache.lookup('show users ordered by balance desc').sql == f'SELECT * FROM {T} ORDER BY balance DESC'
+
+
+def test_unechoed_literal_is_not_indexed():
+    cache = SemanticCache()
+    assert not cache.add('signups in the last 2 weeks', f'SELECT count(*) FROM {T} WHERE signup_date >= subtractDays(now(), 14)')
+    assert cache.lookup('signups in the last 3 weeks') is None
+    assert cache.stats()['skipped'] == 1
+
+
+def test_refilled_sql_is_revalidated():
+    cache = SemanticCache()
+    cache.add('Show the first 5 users', f'SELECT * FROM {T} LIMIT 5')
+    assert cache.lookup('show the first 2.5 users') is None  # LIMIT takes an integer
+    assert cache.stats()['rejected'] == 1
+
+
+def test_namespace_ttl_and_eviction():
+    now = [1000.0]
+    cache = SemanticCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.add('How many users are there', f'SELECT count(*) FROM {T}', namespace='gpt-5')
+    assert cache.lookup('count all users', namespace='gpt-4o') is None
+    cache.add('What is the average age', f'SELECT avg(age) FROM {T}', namespace='gpt-5')
+    assert cache.lookup('count all users', namespace='gpt-5') is not None
+    cache.add('Show the first 5 users', f'SELECT * FROM {T} LIMIT 5', namespace='gpt-5')
+    assert cache.stats()['evictions'] == 1
+    assert cache.lookup('average age please', namespace='gpt-5') is None  # least recently used went first
+    now[0] += 11
+    assert cache.lookup('count all users', namespace='gpt-5') is None
+
+
+def test_nl_query_paraphrase_skips_llm(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    calls = []
+
+    async def fake_llm(question):
+        calls.append(question)
+        return 'SELECT * FROM default.MOCK_DATA LIMIT 5', False
+
+    async def fake_execute(sql):
+        return [{'id': 1}]
+
+    monkeypatch.setattr(nl_to_sql, '_allm_translate', fake_llm)
+    monkeypatch.setattr('app.main.aexecute_sql', fake_execute)
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    avoided = metrics.LLM_CALLS_AVOIDED.value(cache='semantic')
+
+    first = client.post('/nl-query', json={'question': 'Show the first 5 users'}).json()
+    second = client.post('/nl-query', json={'question': 'list the top 20 users'}).json()
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert second['sql'] == 'SELECT * FROM default.MOCK_DATA LIMIT 20'
+    assert calls == ['Show the first 5 users']
+    assert metrics.LLM_CALLS_AVOIDED.value(cache='semantic') == avoided + 1
+    assert client.get('/cache/stats').json()['semantic']['llm_calls_avoided'] >= 1
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
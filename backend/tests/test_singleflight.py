@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from app.config import get_settings
+from app.main import app
+from app.services import clickhouse_client, nl_to_sql, singleflight
+from app.services.result_cache import get_result_cache
+from app.services.singleflight import SingleFlight
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import get_translation_cache
+
+
+def test_acall_shares_one_call_and_errors():
+    group = SingleFlight('test')
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return 'result'
+
+    async def boom():
+        await asyncio.sleep(0.02)
+        raise ValueError('upstream failed')
+
+    async def run():
+        results = await asyncio.gather(*[group.acall('k', work) for _ in range(5)])
+        errors = await asyncio.gather(*[group.acall('e', boom) for _ in range(3)], return_exceptions=True)
+        again = await group.acall('k', work)  # finished calls are not reused
+        return results, errors, again
+
+    results, errors, again = asyncio.run(run())
+    assert results == ['result'] * 5 and again == 'result'
+    assert len(calls) == 2
+    assert all(isinstance(e, ValueError) for e in errors)
+    stats = group.stats()
+    assert stats['leaders'] == 3 and stats['coalesced'] == 6 and stats['in_flight'] == 0
+
+
+def test_acall_leader_cancellation_does_not_cancel_followers():
+    group = SingleFlight('test')
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run():
+        leader = asyncio.ensure_future(group.acall('k', work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(group.acall('k', work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == 42
+
+
+def test_call_across_threads():
+    group = SingleFlight('test')
+    started = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.05)
+        return 'ok'
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError('nope')
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(group.call('k', work))) for _ in range(4)]
+    threads[0].start()
+    started.wait()
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert out == ['ok'] * 4 and len(calls) == 1
+
+    started.clear()
+    errors = []
+
+    def attempt():
+        try:
+            group.call('e', fail)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=attempt)
+    leader.start()
+    started.wait()
+    other = threading.Thread(target=attempt)
+    other.start()
+    leader.join()
+    other.join()
+    assert len(errors) == 2 and errors[0] is errors[1]
+
+
+def test_thundering_herd_costs_one_llm_call_and_one_query(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    get_result_cache().invalidate()
+    llm_calls, db_calls = [], []
+
+    async def slow_llm(question):
+        llm_calls.append(question)
+        await asyncio.sleep(0.05)
+        return 'SELECT * FROM default.MOCK_DATA LIMIT 3', False
+
+    def slow_db(sql):
+        db_calls.append(sql)
+        time.sleep(0.05)
+        return [{'id': 1}, {'id': 2}, {'id': 3}]
+
+    monkeypatch.setattr(nl_to_sql, '_allm_translate', slow_llm)
+    monkeypatch.setattr(clickhouse_client, '_execute_uncached', slow_db)
+    before = singleflight.coalescing_stats()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as ac:
+            questions = ['Show the first 3 users', 'show the first 3 users!'] * 5
+            return await asyncio.gather(*[ac.post('/nl-query', json={'question': q}) for q in questions])
+
+    responses = asyncio.run(run())
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()['rows'] == [{'id': 1}, {'id': 2}, {'id': 3}] for r in responses)
+    assert len(llm_calls) == 1 and len(db_calls) == 1
+    after = singleflight.coalescing_stats()
+    assert after['translation']['coalesced'] - before['translation']['coalesced'] == 9
+    assert after['execution']['coalesced'] - before['execution']['coalesced'] == 9
+
+
+def test_failed_translation_reaches_every_follower(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+
+    async def failing_llm(question):
+        await asyncio.sleep(0.02)
+        raise nl_to_sql.LLMQuotaExceeded('quota')
+
+    monkeypatch.setattr(nl_to_sql, '_allm_translate', failing_llm)
+
+    async def run():
+        return await asyncio.gather(
+            *[nl_to_sql.atranslate('Count all users') for _ in range(3)], return_exceptions=True
+        )
+
+    assert all(isinstance(e, nl_to_sql.LLMQuotaExceeded) for e in asyncio.run(run()))
+    with pytest.raises(nl_to_sql.LLMQuotaExceeded):
+        asyncio.run(nl_to_sql.atranslate('Count all users'))  # not cached: the next call retries
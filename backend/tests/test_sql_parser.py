@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import clickhouse_client
+from app.services.nl_to_sql import Translation
+from app.services.sql_parser import SqlSyntaxError, get_parser, validate_sql
+
+client = TestClient(app)
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT count(*) FROM default.MOCK_DATA",
+    "SELECT sum(balance) FROM default.MOCK_DATA WHERE signup_date >= subtractHours(now(), 24)",
+    "SELECT * FROM default.MOCK_DATA WHERE name ILIKE 'A%' LIMIT 10",
+    "SELECT * FROM default.MOCK_DATA WHERE name ILIKE '%drop%' ORDER BY id LIMIT 5",
+    "select country, count(*) as cnt from MOCK_DATA where (age > 30 or country IN ('US', 'DE')) "
+    "AND is_active = true GROUP BY country HAVING count(*) > 5 ORDER BY cnt DESC LIMIT 10",
+    "SELECT toHour(last_login) AS h, CASE WHEN age > 30 THEN 'old' ELSE 'young' END AS bucket "
+    "FROM default.MOCK_DATA WHERE signup_date BETWEEN '2024-01-01 00:00:00' AND '2024-02-01 00:00:00'",
+])
+def test_accepts_grammar_sql(sql):
+    tree = get_parser().parse(sql)
+    assert tree.name == 'query'
+    assert tree.end == len(sql)
+
+
+@pytest.mark.parametrize('sql, position', [
+    ("SELECT * FROM users", 14),
+    ("DROP TABLE default.MOCK_DATA", 0),
+    ("SELECT * FROM default.MOCK_DATA WHERE nme = 'x'", 38),
+    ("SELECT count(*) FROM default.MOCK_DATA; DROP TABLE x", 38),
+    ("SELECT * FROM default.MOCK_DATA LIMIT", 37),
+])
+def test_rejects_with_position(sql, position):
+    with pytest.raises(SqlSyntaxError) as exc:
+        get_parser().parse(sql)
+    assert exc.value.position == position
+
+
+def test_parse_tree_nodes():
+    tree = get_parser().parse("SELECT * FROM default.MOCK_DATA WHERE country = 'US' LIMIT 5")
+    cond = tree.find('comparison')
+    assert cond is not None
+    assert [t.text for t in cond.tokens()] == ['country', '=', "'US'"]
+    assert tree.find('limit_clause').find('integer').tokens()[0].text == '5'
+
+
+def test_validate_sql_strips_trailing_semicolon():
+    assert validate_sql("SELECT avg(age) FROM default.MOCK_DATA;\n") == "SELECT avg(age) FROM default.MOCK_DATA"
+
+
+def test_safety_check_uses_grammar():
+    assert clickhouse_client._safety_check("SELECT * FROM default.MOCK_DATA WHERE name = 'Dropbox'") is None
+    assert clickhouse_client._safety_check("SELECT * FROM system.tables") is not None
+
+
+def test_nl_query_rejects_invalid_translation(monkeypatch):
+    async def fake_translate(question):
+        return Translation("SELECT password FROM default.MOCK_DATA", False)
+
+    monkeypatch.setattr('app.main.atranslate', fake_translate)
+    resp = client.post('/nl-query', json={'question': 'Count all users'})
+    assert resp.status_code == 400
+    assert 'position 7' in resp.json()['detail']
@@ -0,0 +1,114 @@
+import json
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services import clickhouse_client
+from app.services.clients import ConnectionPool
+
+client = TestClient(app)
+
+
+def _lines(resp):
+    return [json.loads(line) for line in resp.iter_lines() if line]
+
+
+def test_stream_sends_sql_then_row_blocks(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'stream_block_rows', 2)
+    with client.stream('POST', '/nl-query/stream', json={'question': 'Show the first 5 users'}) as resp:
+        assert resp.status_code == 200
+        assert resp.headers['content-type'].startswith('application/x-ndjson')
+        lines = _lines(resp)
+    assert lines[0]['type'] == 'meta' and lines[0]['sql'].endswith('LIMIT 5')
+    blocks = [l['rows'] for l in lines if l['type'] == 'rows']
+    assert [len(b) for b in blocks] == [2, 2, 1]
+    assert blocks[0][0]['id'] == 1
+    assert lines[-1] == {'type': 'end', 'row_count': 5, 'truncated': False}
+
+
+def test_stream_row_cap_stops_upstream(monkeypatch):
+    state = {'produced': 0, 'closed': False}
+
+    def endless(sql, block_rows=None, max_rows=None):
+        try:
+            while True:
+                state['produced'] += 1
+                yield [{'id': i} for i in range(10)]
+        finally:
+            state['closed'] = True
+
+    monkeypatch.setattr(clickhouse_client, 'iter_rows', endless)
+    with client.stream('POST', '/nl-query/stream', json={'question': 'Show the first 5 users', 'max_rows': 25}) as resp:
+        lines = _lines(resp)
+    assert lines[-1] == {'type': 'end', 'row_count': 25, 'truncated': True}
+    assert state['produced'] == 3 and state['closed']
+
+
+def test_stream_reports_execution_error(monkeypatch):
+    def broken(sql, block_rows=None, max_rows=None):
+        yield [{'id': 1}]
+        raise RuntimeError('connection reset')
+
+    monkeypatch.setattr(clickhouse_client, 'iter_rows', broken)
+    with client.stream('POST', '/nl-query/stream', json={'question': 'Show the first 5 users'}) as resp:
+        lines = _lines(resp)
+    assert lines[-1]['type'] == 'error' and 'connection reset' in lines[-1]['detail']
+
+
+class _BlockStream:
+    def __init__(self, settings, state):
+        self.source = SimpleNamespace(column_names=['id'])
+        self.settings = settings
+        self.state = state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.state['closed'] = True
+
+    def __iter__(self):
+        for start in range(0, 1000, 10):
+            yield [(i,) for i in range(start, start + 10)]
+
+
+class _Client:
+    def __init__(self, state):
+        self.state = state
+
+    def query_row_block_stream(self, sql, settings=None):
+        self.state['settings'] = settings
+        return _BlockStream(settings, self.state)
+
+
+def _real_mode(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'mock_clickhouse', False)
+    state = {'closed': False}
+    pool = ConnectionPool(lambda: _Client(state), size=2, timeout=0.01)
+    monkeypatch.setattr(clickhouse_client, 'get_clickhouse_pool', lambda: pool)
+    return pool, state
+
+
+def test_capped_stream_returns_the_pooled_client(monkeypatch):
+    pool, state = _real_mode(monkeypatch)
+    for _ in range(3):  # more capped streams than the pool has clients
+        with client.stream('POST', '/nl-query/stream', json={'question': 'Show the first 5 users', 'max_rows': 25}) as resp:
+            lines = _lines(resp)
+        assert lines[-1] == {'type': 'end', 'row_count': 25, 'truncated': True}
+        assert state['closed'] and pool.stats()['in_use'] == 0
+    assert state['settings']['max_result_rows'] == 26
+
+
+def test_stream_budget_follows_stream_max_rows(monkeypatch):
+    pool, state = _real_mode(monkeypatch)
+    monkeypatch.setattr(get_settings(), 'stream_max_rows', 0)
+    with client.stream('POST', '/nl-query/stream', json={'question': 'Show users from US'}) as resp:
+        lines = _lines(resp)
+    assert lines[0]['max_rows'] is None
+    assert lines[-1] == {'type': 'end', 'row_count': 1000, 'truncated': False}
+    assert 'max_result_rows' not in state['settings']
+    monkeypatch.setattr(get_settings(), 'stream_max_rows', 500_000)
+    list(clickhouse_client.iter_rows('SELECT * FROM default.MOCK_DATA'))
+    assert state['settings']['max_result_rows'] == 500_001
@@ -0,0 +1,60 @@
+import random
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.suggest import SuggestionTrie, get_suggestion_trie
+
+client = TestClient(app)
+
+
+def test_most_asked_completions_first():
+    trie = SuggestionTrie()
+    trie.add('Count all users')
+    trie.add('count per country', 3)
+    trie.add('Count all users')
+    trie.add('Average age')
+    assert trie.suggest('co') == ['count per country', 'Count all users']
+    assert trie.suggest('COUNT  ALL') == ['Count all users']
+    assert trie.suggest('count ', k=1) == ['count per country']
+    assert trie.suggest('counts') == []
+    assert trie.suggest('') == ['count per country', 'Count all users', 'Average age']
+
+
+def test_eviction_keeps_heaviest_and_matches_a_scan():
+    rng = random.Random(7)
+    words = ['count', 'co', 'users', 'user', 'avg', 'a', 'by', 'country']
+    trie = SuggestionTrie(max_phrases=12)
+    for _ in range(500):
+        trie.add(' '.join(rng.choice(words) for _ in range(rng.randint(1, 3))), rng.choice([1, 2]))
+        weights = trie._weights
+        assert len(weights) <= 12
+        for prefix in ('', 'c', 'co', 'count ', 'a', 'users c'):
+            expected = sorted((k for k in weights if k.startswith(prefix)), key=lambda k: (-weights[k], k))[:5]
+            assert [p.lower() for p in trie.suggest(prefix)] == expected
+    assert trie.stats()['evictions'] > 0
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'suggest.json')
+    trie = SuggestionTrie()
+    trie.add('Show the first 5 users', 4)
+    trie.add('Show users from US')
+    assert trie.save(path)
+    assert not trie.save(path)  # unchanged since the last save
+    restored = SuggestionTrie()
+    restored.add('Show users from US', 2)
+    assert restored.load(path) == 2
+    assert restored.suggest('show') == ['Show the first 5 users', 'Show users from US']
+    assert restored._weights['show users from us'] == 2  # the larger weight wins
+
+
+def test_suggest_endpoint_learns_from_nl_query():
+    seeded = client.get('/suggest', params={'prefix': 'count'})
+    assert seeded.status_code == 200
+    assert 'Count all users' in seeded.json()['suggestions']
+    assert 'max-age' in seeded.headers['cache-control']
+
+    question = 'Show the first 17 users whose name starts with Q'
+    assert client.post('/nl-query', json={'question': question}).status_code == 200
+    assert question in client.get('/suggest', params={'prefix': 'show the first 17', 'k': 3}).json()['suggestions']
+    assert client.get('/suggest', params={'k': 50}).status_code == 422
+    assert get_suggestion_trie().stats()['phrases'] >= 1
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from fastapi.testclient import TestClient
+from app.config import get_settings
+from app.main import app
+from app.services import nl_to_sql, translation_cache
+from app.services.semantic_cache import get_semantic_cache
+from app.services.translation_cache import TranslationCache, cache_key, get_translation_cache, normalize_question
+
+client = TestClient(app)
+
+
+def test_normalize_question():
+    assert normalize_question("Count all users") == normalize_question("  count ALL users?! ")
+    assert normalize_question("Show the first five users") == "show the first 5 users"
+    assert normalize_question("top 010 users, 1,000 rows") == "top 10 users 1000 rows"
+    assert normalize_question("emails with domain gmail.com.") == "emails with domain gmail.com"
+
+
+def test_operators_keep_questions_apart():
+    for group in (
+        ("users with age > 30", "users with age < 30", "users with age != 30", "users with age = 30"),
+        ("balance >= 100", "balance <= 100", "balance > 100"),
+        ("age + 5", "age * 5", "age 5"),
+    ):
+        keys = {cache_key(q, "gpt-5", "abc") for q in group}
+        assert len(keys) == len(group), group
+    assert normalize_question("age>30") == normalize_question("age > 30") == "age gt 30"
+    assert normalize_question("age <> 30") == normalize_question("age != 30")
+
+
+def test_cache_key_includes_model_and_grammar():
+    k = cache_key("Count all users", "gpt-5", "abc")
+    assert k == cache_key("count all users!", "gpt-5", "abc")
+    assert k != cache_key("Count all users", "gpt-4o", "abc")
+    assert k != cache_key("Count all users", "gpt-5", "def")
+
+
+def test_lru_eviction_and_ttl():
+    now = [1000.0]
+    cache = TranslationCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # 'b' is now least recently used
+    cache.put('c', 'C')
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] == 1
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_sqlite_tier_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'translations.db')
+    TranslationCache(path=path).put('k', 'SELECT 1')
+    other = TranslationCache(path=path)
+    assert other.get('k') == 'SELECT 1'
+    assert other.stats()['disk_hits'] == 1
+
+
+def test_sqlite_purge_is_periodic_and_memory_hits_skip_disk_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(translation_cache, 'PURGE_EVERY', 3)
+    now = [1000.0]
+    cache = TranslationCache(ttl=10, path=str(tmp_path / 'translations.db'), clock=lambda: now[0])
+    cache.put('old', 'SELECT 1')
+    now[0] += 11
+    rows = lambda: cache._db.execute('SELECT count(*) FROM translations').fetchone()[0]
+    cache.put('a', 'SELECT 2')
+    assert rows() == 2  # no purge yet
+    cache.put('b', 'SELECT 3')
+    assert rows() == 2  # third put purged 'old'
+    with cache._db_lock:  # a slow disk write in flight
+        assert cache.get('a') == 'SELECT 2'
+
+
+def test_atranslate_reads_sqlite_tier_off_the_event_loop(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    cache = TranslationCache(path=str(tmp_path / 'translations.db'))
+    monkeypatch.setattr(nl_to_sql, 'get_translation_cache', lambda: cache)
+    cache.put(nl_to_sql._cache_key('Count all users'), 'SELECT count(*) FROM default.MOCK_DATA')
+    threads = []
+    real = nl_to_sql._from_cache
+
+    def from_cache(nl_query, key):
+        threads.append(threading.current_thread())
+        return real(nl_query, key)
+
+    monkeypatch.setattr(nl_to_sql, '_from_cache', from_cache)
+
+    async def run():
+        return threading.current_thread(), await nl_to_sql.atranslate('Count all users')
+
+    loop_thread, translation = asyncio.run(run())
+    assert translation.cached and threads and threads[0] is not loop_thread
+
+
+def test_nl_query_reports_cache_hit(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, 'mock_mode', False)
+    monkeypatch.setattr(settings, 'openai_api_key', 'sk-test')
+    calls = []
+
+    async def fake_execute(sql):
+        return [{'count()': 3}]
+
+    async def fake_llm(question):
+        calls.append(question)
+        return 'SELECT count(*) FROM default.MOCK_DATA', False
+
+    monkeypatch.setattr(nl_to_sql, '_allm_translate', fake_llm)
+    monkeypatch.setattr('app.main.aexecute_sql', fake_execute)
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+
+    first = client.post('/nl-query', json={'question': 'Count all users'}).json()
+    second = client.post('/nl-query', json={'question': 'count all users?'}).json()
+    assert first['cached'] is False
+    assert second['cached'] is True
+    assert second['sql'] == first['sql']
+    assert len(calls) == 1
@@ -60,6 +60,33 @@ const Query: React.FC = () => {
 
   const API_BASE = (process.env.REACT_APP_API_BASE || "").replace(/\/$/, "");
 
+  // Server suggestions (what all users ask), merged ahead of the local list.
+  const suggestTimer = useRef<number | null>(null);
+  const suggestAbort = useRef<AbortController | null>(null);
+  const fetchSuggestions = (prefix: string, local: string[]) => {
+    if (suggestTimer.current !== null) window.clearTimeout(suggestTimer.current);
+    suggestAbort.current?.abort();
+    suggestTimer.current = window.setTimeout(async () => {
+      const controller = new AbortController();
+      suggestAbort.current = controller;
+      try {
+        const res = await fetch(
+          `${API_BASE}/suggest?prefix=${encodeURIComponent(prefix)}&k=5`,
+          { signal: controller.signal }
+        );
+        if (!res.ok) return;
+        const data = await res.json();
+        if (textareaRef.current?.value !== prefix) return; // typed on or picked one meanwhile
+        const merged = Array.from(
+          new Set([...(data.suggestions as string[]), ...local])
+        ).slice(0, 5);
+        setSuggestions(merged);
+      } catch {
+        // aborted or offline: keep the local suggestions
+      }
+    }, 120);
+  };
+
   const performQuery = async (q: string, m: "echo" | "nl") => {
     const current = q.trim();
     if (!current) return;
@@ -226,6 +253,8 @@ const Query: React.FC = () => {
                 // Build candidate set: unique static samples + recent history queries
                 const lower = v.toLowerCase();
                 if (!lower.trim()) {
+                  if (suggestTimer.current !== null) window.clearTimeout(suggestTimer.current);
+                  suggestAbort.current?.abort();
                   setSuggestions([]);
                 } else {
                   const histQueries = history
@@ -240,6 +269,7 @@ const Query: React.FC = () => {
                     .sort((a, b) => a.localeCompare(b))
                     .slice(0, 5);
                   setSuggestions(filtered);
+                  if (mode === "nl") fetchSuggestions(v, filtered);
                 }
               }}
               onKeyDown={(e) => {